@@ -0,0 +1,85 @@
+"""
+Measure how fast jobs are read and looked up when LSF is replaced by a generated population of jobs. This covers
+reading every job into a table, counting them, looking up many jobs at once and many threads sharing one snapshot like
+the job monitors do.
+Run this with `python3 -m benchmarks.job_lookup` while in the harmony directory.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from scripts import job_backends
+from scripts import job_snapshot
+from scripts import job_status
+
+
+def create_parser():
+    """
+    Create a parser for the options of the benchmark.
+    :return: The parser.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--jobs', dest='jobs', type=int, default=50000,
+                        help='How many jobs are in LSF.')
+    parser.add_argument('-c', '--churn', dest='churn', type=float, default=0.05,
+                        help='The fraction of jobs that change status with each read.')
+    parser.add_argument('-r', '--reads', dest='reads', type=int, default=20,
+                        help='How many times every job is read.')
+    parser.add_argument('-m', '--monitors', dest='monitors', type=int, default=64,
+                        help='How many threads look up jobs at once.')
+    parser.add_argument('-b', '--bjobs', dest='bjobs', default=None,
+                        help='Replay the output of `bjobs -u all -a` in this file instead of generating jobs.')
+    return parser
+
+
+def timed(name, count, function):
+    """
+    Run a function some number of times and print how long each run took.
+
+    :param name: What is being measured.
+    :param count: How many times to run the function.
+    :param function: The function to run.
+    :return: The result of the last run.
+    """
+    start = time.perf_counter()
+    result = None
+    for _ in range(count):
+        result = function()
+    seconds = time.perf_counter() - start
+    print(name + ": " + str(round(seconds / count * 1000, 3)) + " ms each over " + str(count) + " runs")
+    return result
+
+
+def run():
+    """
+    Run the benchmark.
+    """
+    parser = create_parser()
+    args = parser.parse_args()
+
+    if args.bjobs is not None:
+        backend = job_backends.ReplayBackend.from_bjobs(args.bjobs)
+    else:
+        backend = job_backends.ReplayBackend.synthetic(args.jobs, args.churn, seed=0)
+    JS = job_status.JobStatus(backend=backend)
+
+    jobs = timed("Read every job", args.reads, JS.get_jobs)
+    print("    " + str(len(jobs)) + " jobs: " + str(dict(JS.count_type(jobs))))
+    timed("Count jobs by status", args.reads, lambda: JS.count_type(jobs))
+
+    job_ids = jobs.column('jobId')[::10]
+    timed("Look up " + str(len(job_ids)) + " jobs at once", args.reads, lambda: JS.get_statuses(job_ids))
+
+    # Every monitor asks the shared snapshot for the status of one job.
+    service = job_snapshot.JobSnapshotService(ttl=60, fetch_jobs=JS.get_jobs)
+
+    def monitor(job_id):
+        return service.get_snapshot().get_job_status(job_id)
+
+    with ThreadPoolExecutor(max_workers=args.monitors) as executor:
+        timed(str(args.monitors) + " monitors checking " + str(len(job_ids)) + " jobs", args.reads,
+              lambda: list(executor.map(monitor, job_ids)))
+    print("    LSF was read " + str(service.refreshes) + " times for " + str(service.requests) + " lookups.")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,118 @@
+"""
+Compare the memory used by parsed rgt_status.txt lines and events when they are kept as dictionaries and as records.
+Run this with `python3 -m benchmarks.record_memory` while in the harmony directory.
+"""
+import argparse
+import tracemalloc
+from scripts import parse_file
+
+
+def create_parser():
+    """
+    Create a parser for the options of the benchmark.
+    :return: The parser.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--records', dest='records', type=int, default=100000,
+                        help='How many records to create.')
+    return parser
+
+
+def status_lines(count):
+    """
+    Create the lines of a long rgt_status.txt file.
+
+    :param count: The number of lines.
+    :return: A list of lines.
+    """
+    return ["2018-10-17T00:00:{second:02d}.000000 {uid}.{i} {job_id} 0 0 {check}\n"
+            .format(second=i % 60, uid=1539734400 + i, i=i, job_id=100000 + i, check='***' if i % 3 else 1)
+            for i in range(count)]
+
+
+def event_dics(count):
+    """
+    Create the variables of many event files.
+
+    :param count: The number of events.
+    :return: A list of dictionaries like the ones from ParseEvent.parse_file.
+    """
+    return [{'test_id': str(1539734400 + i) + '.' + str(i), 'event_filename': 'Event_140_build_start.txt',
+             'event_time': '2018-10-17T00:00:' + '{:02d}'.format(i % 60), 'app': 'program', 'test': 'test',
+             'rgt_system_log_tag': 'system', 'run_archive': '/path/to/Run_Archive/' + str(i),
+             'build_directory': '/path/to/Build/' + str(i)} for i in range(count)]
+
+
+def status_dics(lines):
+    """
+    Parse rgt_status.txt lines the way they were before records, with one dictionary of text for each line.
+
+    :param lines: The lines of the file.
+    :return: A list of dictionaries.
+    """
+    job_dics = []
+    for line in lines:
+        split = line.split()
+        job_dics.append({'harness_start': split[0].replace('T', ' '), 'harness_uid': split[1], 'job_id': split[2],
+                         'build_status': split[3], 'submit_status': split[4], 'check_status': split[5]})
+    return job_dics
+
+
+def measure(function, *args):
+    """
+    Measure how much memory is still held by the result of a function.
+
+    :param function: The function to run.
+    :param args: The arguments to the function.
+    :return: A tuple containing the result and the number of bytes it holds.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def report(name, count, dict_bytes, record_bytes):
+    """
+    Print the memory used for some kind of record.
+
+    :param name: The kind of record.
+    :param count: How many records were made.
+    :param dict_bytes: The bytes held by the dictionaries.
+    :param record_bytes: The bytes held by the records.
+    """
+    scale = 100000 / count
+    print(name + ":")
+    print("    dictionaries: " + str(round(dict_bytes * scale / 2 ** 20, 1)) + " MiB per 100k ("
+          + str(dict_bytes // count) + " bytes each)")
+    print("    records:      " + str(round(record_bytes * scale / 2 ** 20, 1)) + " MiB per 100k ("
+          + str(record_bytes // count) + " bytes each)")
+
+
+def run():
+    """
+    Run the benchmark.
+    """
+    parser = create_parser()
+    args = parser.parse_args()
+    count = args.records
+
+    # The text is made first so that only the parsed values are measured.
+    lines = status_lines(count)
+    status_parser = parse_file.ParseRGTStatus()
+    dics, dict_bytes = measure(status_dics, lines)
+    records, record_bytes = measure(status_parser.parse_lines, lines)
+    report("rgt_status.txt lines", count, dict_bytes, record_bytes)
+    del dics, records
+
+    events = event_dics(count)
+    # The dictionaries are copied since ParseEvent makes a new one for each file.
+    dics, dict_bytes = measure(lambda: [dict(event) for event in events])
+    records, record_bytes = measure(lambda: [parse_file.EventRecord.from_dict(event) for event in events])
+    report("Events", count, dict_bytes, record_bytes)
+
+
+if __name__ == '__main__':
+    run()
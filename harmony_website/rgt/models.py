@@ -6,8 +6,24 @@
 #   * Remove `managed = False` lines if you wish to allow Django to create, modify, and delete the table
 # Feel free to rename the models, but don't rename db_table values or field names.
 from django.db import models
+from django.db.models.query import ModelIterable
 from django.urls import reverse
+import base64
 import os
+import zlib
+
+
+def decode_output(text, compressed):
+    """
+    Get the text of an output as it was stored by the updater.
+
+    :param text: The stored text.
+    :param compressed: Whether the output was compressed with zlib and base64.
+    :return: The text of the output.
+    """
+    if text is None or not compressed:
+        return text
+    return zlib.decompress(base64.b64decode(text)).decode('utf-8')
 
 
 class RgtCheck(models.Model):
@@ -53,6 +69,87 @@ class RgtFailure(models.Model):
         ordering = ['failure_id']
 
 
+class RgtOutputBlob(models.Model):
+    output_hash = models.CharField(primary_key=True, max_length=64)
+    body = models.BinaryField()
+    size = models.IntegerField()
+    refcount = models.IntegerField()
+    timestamp = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.output_hash} ({self.size} bytes)'
+
+    def text(self):
+        """
+        Get the text of the output.
+
+        :return: The decompressed output.
+        """
+        return zlib.decompress(bytes(self.body)).decode('utf-8')
+
+    class Meta:
+        managed = False
+        db_table = 'rgt_output_blob'
+
+
+def load_output_blobs(tests, output_types=('build', 'submit', 'check', 'report')):
+    """
+    Load the output blobs of many tests with a single query so that reading their outputs does not look up each blob
+    on its own.
+
+    :param tests: The RgtTest objects such as a page of a list.
+    :param output_types: The types of output that will be read.
+    :return: A list of the tests.
+    """
+    tests = list(tests)
+    hashes = set()
+    for test in tests:
+        hashes.update(test.blob_hashes(output_types))
+    if len(hashes) == 0:
+        return tests
+
+    texts = {blob.output_hash: blob.text() for blob in RgtOutputBlob.objects.filter(output_hash__in=hashes)}
+    for test in tests:
+        if not hasattr(test, '_blob_texts'):
+            test._blob_texts = {}
+        for output_hash in test.blob_hashes(output_types):
+            test._blob_texts[output_hash] = texts.get(output_hash)
+    return tests
+
+
+class RgtTestQuerySet(models.QuerySet):
+    """
+    Tests that can load the output blobs they reference along with the rows.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(RgtTestQuerySet, self).__init__(*args, **kwargs)
+        self._output_types = ()
+
+    def with_output_blobs(self, output_types=('build', 'submit', 'check', 'report')):
+        """
+        Load the output blobs of these tests with a single query once the tests are fetched.
+
+        :param output_types: The types of output that will be read.
+        :return: The queryset.
+        """
+        clone = self._chain()
+        clone._output_types = tuple(output_types)
+        return clone
+
+    def _clone(self):
+        clone = super(RgtTestQuerySet, self)._clone()
+        clone._output_types = self._output_types
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super(RgtTestQuerySet, self)._fetch_all()
+        # Only tests have outputs. Rows fetched with values or values_list do not.
+        if not fetched and len(self._output_types) != 0 and self._iterable_class is ModelIterable:
+            load_output_blobs(self._result_cache, self._output_types)
+
+
 class RgtTest(models.Model):
     test_id = models.AutoField(primary_key=True)
     harness_uid = models.CharField(unique=True, max_length=36)
@@ -66,18 +163,83 @@ class RgtTest(models.Model):
     submit_status = models.SmallIntegerField(blank=True, null=True)
     check_status = models.ForeignKey(RgtCheck, models.DO_NOTHING, db_column='check_status',
                                      to_field='check_uid', blank=True, null=True)
-    output_build = models.TextField(blank=True, null=True)
-    output_submit = models.TextField(blank=True, null=True)
-    output_check = models.TextField(blank=True, null=True)
-    output_report = models.TextField(blank=True, null=True)
+    # The outputs as they are stored. These may be compressed so use output_build etc. to read them.
+    stored_output_build = models.TextField(db_column='output_build', blank=True, null=True)
+    stored_output_submit = models.TextField(db_column='output_submit', blank=True, null=True)
+    stored_output_check = models.TextField(db_column='output_check', blank=True, null=True)
+    stored_output_report = models.TextField(db_column='output_report', blank=True, null=True)
+    output_build_hash = models.CharField(max_length=64, blank=True, null=True)
+    output_build_size = models.IntegerField(blank=True, null=True)
+    output_build_compressed = models.BooleanField(default=False)
+    output_submit_hash = models.CharField(max_length=64, blank=True, null=True)
+    output_submit_size = models.IntegerField(blank=True, null=True)
+    output_submit_compressed = models.BooleanField(default=False)
+    output_check_hash = models.CharField(max_length=64, blank=True, null=True)
+    output_check_size = models.IntegerField(blank=True, null=True)
+    output_check_compressed = models.BooleanField(default=False)
+    output_report_hash = models.CharField(max_length=64, blank=True, null=True)
+    output_report_size = models.IntegerField(blank=True, null=True)
+    output_report_compressed = models.BooleanField(default=False)
     system = models.CharField(max_length=64)
     previous_job_id = models.CharField(max_length=36)
     done = models.BooleanField()
     timestamp = models.DateTimeField()
 
+    objects = RgtTestQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.application} {self.testname} {self.harness_uid}'
 
+    def get_output(self, output_type):
+        """
+        Get the text of some output of this test. Outputs that are only referenced by hash are read from the output
+        blob table.
+
+        :param output_type: The type of output such as 'build' or 'report'.
+        :return: The text of the output or None if there is none.
+        """
+        stored_output = getattr(self, 'stored_output_' + output_type)
+        output_hash = getattr(self, 'output_' + output_type + '_hash')
+        if stored_output is not None or output_hash is None:
+            return decode_output(stored_output, getattr(self, 'output_' + output_type + '_compressed'))
+
+        # Only look up each blob once for this test. Blobs loaded by load_output_blobs are already here.
+        if not hasattr(self, '_blob_texts'):
+            self._blob_texts = {}
+        if output_hash not in self._blob_texts:
+            try:
+                self._blob_texts[output_hash] = RgtOutputBlob.objects.get(output_hash=output_hash).text()
+            except RgtOutputBlob.DoesNotExist:
+                self._blob_texts[output_hash] = None
+        return self._blob_texts[output_hash]
+
+    def blob_hashes(self, output_types):
+        """
+        Get the hashes of the outputs of this test that are only stored in the output blob table.
+
+        :param output_types: The types of output to look at.
+        :return: A list of the hashes.
+        """
+        return [getattr(self, 'output_' + output_type + '_hash') for output_type in output_types
+                if getattr(self, 'stored_output_' + output_type) is None
+                and getattr(self, 'output_' + output_type + '_hash') is not None]
+
+    @property
+    def output_build(self):
+        return self.get_output('build')
+
+    @property
+    def output_submit(self):
+        return self.get_output('submit')
+
+    @property
+    def output_check(self):
+        return self.get_output('check')
+
+    @property
+    def output_report(self):
+        return self.get_output('report')
+
     def failure(self):
         """
         Get the failure object for this test.
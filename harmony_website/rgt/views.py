@@ -65,6 +65,8 @@ class CustomListView(generic.ListView):
     context_filter_name = 'filter'
 
     paginate_by = 25
+    # The outputs shown for each row. Their blobs are loaded along with each page.
+    output_types = ('build', 'submit', 'check')
 
     def get_context_data(self, **kwargs):
         context = super(CustomListView, self).get_context_data(**kwargs)
@@ -75,10 +77,18 @@ class CustomListView(generic.ListView):
     def restrict_queryset(self):
         return self.model.objects.all()
 
+    def get_base_queryset(self):
+        """
+        Get the tests that can be listed with the output blobs of each page loaded in a single query.
+
+        :return: A queryset of tests.
+        """
+        return self.restrict_queryset().with_output_blobs(self.output_types)
+
     def get_queryset(self):
         filtered_qs = self.filter_class(
             self.request.GET,
-            queryset=self.restrict_queryset()
+            queryset=self.get_base_queryset()
         ).qs
         return filtered_qs
 
@@ -96,9 +106,10 @@ class TestDetailView(generic.DetailView):
     template_name = 'rgt/test_detail.html'
 
     def get_object(self):
-        return self.model.objects.filter(application__exact=self.kwargs['app'],
-                                         testname__exact=self.kwargs['testname'],
-                                         harness_uid__exact=self.kwargs['hid']).first()
+        tests = self.model.objects.with_output_blobs()
+        return tests.filter(application__exact=self.kwargs['app'],
+                            testname__exact=self.kwargs['testname'],
+                            harness_uid__exact=self.kwargs['hid']).first()
 
 
 class AppTestListView(CustomListView):
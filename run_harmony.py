@@ -1,7 +1,15 @@
 from scripts.database import update_database
+from scripts.database import async_update_database
 from scripts import config_functions
+from scripts import scheduler
+from scripts import metrics
+from scripts import job_snapshot as snapshots
+from scripts import job_backends
+from scripts import job_transitions
 import argparse
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from scripts.database import connect_database
 import traceback
 from scripts.database import create_database
@@ -18,10 +26,167 @@ def create_parser():
     parser.add_argument('-r', '--rgt-path', nargs='+', dest='rgt_paths', help='Paths to the rgt input files.', required=True)
     parser.add_argument('-u', '--user', dest='user', default=None, help='User on the database to act as.')
     parser.add_argument('-p', '--password', dest='password', default=None, help='Password for the user.')
+    parser.add_argument('-d', '--daemon', dest='daemon', action='store_true', default=False,
+                        help='Keep updating until stopped instead of updating once.')
+    parser.add_argument('-a', '--async', dest='use_async', action='store_true', default=False,
+                        help='Run the scan, parse, LSF and write stages of each update at the same time.')
 
     return parser
 
 
+def update_rgt_input(updater, job_snapshot):
+    """
+    Update the tests of a single rgt input. Any problem is printed instead of raised so that it does not stop the
+    other rgt inputs from updating.
+
+    :param updater: The UpdateDatabase for the rgt input.
+    :param job_snapshot: The LSF snapshot shared by every rgt input. None if each updater should take its own.
+    :return: A tuple containing how many seconds the update took and whether it failed.
+    """
+    start = time.time()
+    failed = False
+    try:
+        updater.update_tests(job_snapshot=job_snapshot)
+    except Exception:
+        traceback.print_exc()
+        failed = True
+    return time.time() - start, failed
+
+
+def get_shared_snapshot():
+    """
+    Get the LSF snapshot shared by every rgt input. It is only taken again once it is older than the ttl.
+
+    :return: A tuple containing the snapshot and how many seconds getting it took. The snapshot is None if LSF could not
+    be read so that each updater tries again for itself.
+    """
+    snapshot_start = time.time()
+    try:
+        job_snapshot = update_database.get_job_snapshot()
+    except Exception:
+        traceback.print_exc()
+        job_snapshot = None
+    return job_snapshot, time.time() - snapshot_start
+
+
+def report_rgt_input(updaters, input_stats, rgt_input_path, result, snapshot_time):
+    """
+    Count and print how the update of an rgt input went.
+
+    :param updaters: A dictionary from the path of each rgt input to its UpdateDatabase.
+    :param input_stats: A dictionary from the path of each rgt input to the number of updates and errors it has had.
+    This is updated with the result.
+    :param rgt_input_path: The path to the rgt input that was updated.
+    :param result: A tuple containing how many seconds its update took and whether it failed.
+    :param snapshot_time: How many seconds getting the shared look at LSF took or None if there was none.
+    """
+    update_time, failed = result
+    stats = input_stats[rgt_input_path]
+    stats['updates'] += 1
+    if failed:
+        stats['errors'] += 1
+
+    # The shared look at LSF counts towards the LSF time of every input.
+    UD = updaters[rgt_input_path]
+    if snapshot_time is not None:
+        UD.metrics.observe('lsf', snapshot_time)
+    print("Updated tests in " + rgt_input_path + " in " + str(update_time) + " seconds"
+          + (" with an error." if failed else "."))
+    print("Visited " + str(UD.change_detector.directories_visited) + " directories and skipped "
+          + str(UD.change_detector.directories_skipped) + " unchanged directories. "
+          + str(stats['errors']) + " of " + str(stats['updates']) + " updates have failed.")
+    print("Parsed " + str(UD.event_cache.misses) + " event files and reused " + str(UD.event_cache.hits)
+          + " parsed events so far.")
+
+
+def update_rgt_inputs(updaters, input_stats, rgt_input_paths=None):
+    """
+    Update rgt inputs at once with one worker for each input. LSF is only looked at once for all of them.
+
+    :param updaters: A dictionary from the path of each rgt input to its UpdateDatabase.
+    :param input_stats: A dictionary from the path of each rgt input to the number of updates and errors it has had.
+    This is updated with the results.
+    :param rgt_input_paths: The rgt inputs to update. If None, every rgt input is updated.
+    :return: A dictionary from the path of each updated rgt input to a tuple containing how many seconds its update
+    took and whether it failed.
+    """
+    if rgt_input_paths is None:
+        rgt_input_paths = list(updaters.keys())
+
+    job_snapshot, snapshot_time = get_shared_snapshot()
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(rgt_input_paths), 1)) as executor:
+        futures = {rgt_input_path: executor.submit(update_rgt_input, updaters[rgt_input_path], job_snapshot)
+                   for rgt_input_path in rgt_input_paths}
+
+        for rgt_input_path, future in futures.items():
+            results[rgt_input_path] = future.result()
+            report_rgt_input(updaters, input_stats, rgt_input_path, results[rgt_input_path],
+                             snapshot_time if job_snapshot is not None else None)
+
+    return results
+
+
+def request_finished_updates(updaters, subscription, update_scheduler):
+    """
+    Ask for an rgt input to be updated early whenever a job of one of its unfinished instances finishes. This runs until
+    the scheduler is stopped.
+
+    :param updaters: A dictionary from the path of each rgt input to its UpdateDatabase.
+    :param subscription: A Subscription to every job transition.
+    :param update_scheduler: The UpdateScheduler to ask.
+    """
+    while not update_scheduler.stop_event.is_set():
+        transition = subscription.get(timeout=1)
+        if transition is None:
+            continue
+        for rgt_input_path, UD in updaters.items():
+            if UD.wants_update(transition):
+                update_scheduler.request_update(rgt_input_path)
+
+
+def write_metrics_json(updaters, results, json_path):
+    """
+    Append a JSON line with the timings and counts of the last update of each rgt input that was just updated.
+
+    :param updaters: A dictionary from the path of each rgt input to its UpdateDatabase.
+    :param results: The results from update_rgt_inputs.
+    :param json_path: The file to append to.
+    """
+    for rgt_input_path, (update_time, failed) in results.items():
+        UD = updaters[rgt_input_path]
+        record = UD.metrics.to_dict()
+        record.update({'rgt_input': rgt_input_path, 'update_seconds': update_time, 'failed': failed,
+                       'directories_visited': UD.change_detector.directories_visited,
+                       'directories_skipped': UD.change_detector.directories_skipped})
+        try:
+            metrics.write_json_line(json_path, record)
+        except OSError:
+            traceback.print_exc()
+
+
+def write_metrics_prometheus(updaters, results, prometheus_path):
+    """
+    Write the timings and counts of the last update of each rgt input to a Prometheus textfile.
+
+    :param updaters: A dictionary from the path of each rgt input to its UpdateDatabase.
+    :param results: A dictionary from the path of each rgt input that has been updated to the result of its last
+    update from update_rgt_inputs.
+    :param prometheus_path: The textfile to write.
+    """
+    metrics_by_labels = [({'rgt_input': rgt_input_path}, updaters[rgt_input_path].metrics)
+                         for rgt_input_path in results]
+    gauges = {'harmony_update_seconds': [({'rgt_input': rgt_input_path}, update_time)
+                                         for rgt_input_path, (update_time, _) in results.items()],
+              'harmony_update_failed': [({'rgt_input': rgt_input_path}, int(failed))
+                                        for rgt_input_path, (_, failed) in results.items()]}
+    try:
+        metrics.write_prometheus_textfile(prometheus_path, metrics_by_labels, gauges)
+    except OSError:
+        traceback.print_exc()
+
+
 def run():
     """
     Run harmony.
@@ -39,6 +204,43 @@ def run():
     test_table = database['test_table']
     test_event_table = database['test_event_table']
     event_table = database['event_table']
+    # Outputs are stored once by hash in this table. If it is not set, they are stored in the test table.
+    output_blob_table = database.get('output_blob_table')
+    # How often the outputs that no test references anymore are deleted from that table.
+    output_blob_collect_interval = float(database.get('output_blob_collect_interval', 3600))
+    # How many test directories are read at once.
+    scan_workers = int(database.get('scan_workers', 1))
+    # The most rows written to the database in a single transaction.
+    commit_batch_size = int(database.get('commit_batch_size', 0))
+    # The most parsed events each updater remembers.
+    event_cache_size = int(database.get('event_cache_size', 4096))
+    # How many tests have their events parsed and their jobs looked up in LSF at once when using --async.
+    parse_workers = int(database.get('parse_workers', 2))
+    lsf_workers = int(database.get('lsf_workers', 1))
+    # How many seconds a snapshot of LSF is shared by everything in this process before LSF is asked again.
+    snapshots.get_service().set_ttl(float(database.get('lsf_snapshot_ttl', snapshots.DEFAULT_TTL)))
+    # Whether jobs are replayed or generated instead of read from LSF.
+    lsf_replay_path = database.get('lsf_replay_path')
+    lsf_synthetic_jobs = int(database.get('lsf_synthetic_jobs', 0))
+    if lsf_replay_path:
+        job_backends.set_default_backend(job_backends.ReplayBackend.from_bjobs(lsf_replay_path.split(',')))
+    elif lsf_synthetic_jobs > 0:
+        lsf_synthetic_churn = float(database.get('lsf_synthetic_churn', 0.1))
+        job_backends.set_default_backend(job_backends.ReplayBackend.synthetic(lsf_synthetic_jobs, lsf_synthetic_churn))
+    # Where the timings and counts of each update are written. They are not written if these are not set.
+    metrics_json_path = database.get('metrics_json_path')
+    metrics_prometheus_path = database.get('metrics_prometheus_path')
+    # Whether test outputs are compressed before they are stored.
+    compress_outputs = database.getboolean('compress_outputs', fallback=False)
+    # How often unfinished tests are updated, how often finished tests are checked and how far slow updates back off.
+    refresh_time = float(database.get('refresh_time', 300))
+    finished_refresh_time = float(database.get('finished_refresh_time', 0))
+    max_refresh_time = float(database.get('max_refresh_time', refresh_time))
+    refresh_jitter = float(database.get('refresh_jitter', 0))
+    # How often LSF is looked at for finished jobs while running as a daemon and the least time between the updates of
+    # an rgt input that are run early because of them. 0 turns this off.
+    lsf_feed_interval = float(database.get('lsf_feed_interval', 30))
+    min_refresh_time = float(database.get('min_refresh_time', 60))
 
     # Ignore the warnings for duplicate entries.
     with warnings.catch_warnings():
@@ -46,28 +248,111 @@ def run():
         create_database.create_db(connector)
         create_database.insert_default(connector)
 
-    # Continue updating infinitely.
-    while True:
-        print("Updating database.")
-        start = time.time()
-        for rgt_input_path in rgt_input_paths:
-            print("Updating tests in " + rgt_input_path)
-            # Update the database.
-            UD = update_database.UpdateDatabase(connector, rgt_input_path, test_table=test_table,
-                                                test_event_table=test_event_table, event_table=event_table)
+    # Create an updater for each rgt input. These are kept between updates so that they remember which tests have
+    # not changed. They all share the connection pool.
+    updaters = {}
+    for rgt_input_path in rgt_input_paths:
+        updater_options = {'test_table': test_table, 'test_event_table': test_event_table, 'event_table': event_table,
+                           'scan_workers': scan_workers, 'finished_refresh_time': finished_refresh_time,
+                           'compress_outputs': compress_outputs, 'output_blob_table': output_blob_table,
+                           'commit_batch_size': commit_batch_size, 'event_cache_size': event_cache_size}
+        if args.use_async:
+            updaters[rgt_input_path] = async_update_database.AsyncUpdateDatabase(connector, rgt_input_path,
+                                                                                 parse_workers=parse_workers,
+                                                                                 lsf_workers=lsf_workers,
+                                                                                 **updater_options)
+        else:
+            updaters[rgt_input_path] = update_database.UpdateDatabase(connector, rgt_input_path, **updater_options)
+    # How many times each rgt input has been updated and how many of those failed.
+    input_stats = {rgt_input_path: {'updates': 0, 'errors': 0} for rgt_input_path in rgt_input_paths}
+    # The result of the last update of each rgt input. Inputs that have not updated again keep their last result.
+    last_results = {}
+    # Held while recording results since inputs finish updating from different threads when running as a daemon.
+    results_lock = threading.Lock()
+    # When the output blob table was last cleaned up. It is cleaned up after the first update.
+    last_collect = float('-inf')
+    collect_lock = threading.Lock()
+
+    def record_results(results):
+        """
+        Write the timings and counts of some updates.
+
+        :param results: A dictionary from the path of each rgt input that was updated to its result.
+        """
+        with results_lock:
+            last_results.update(results)
+            if metrics_json_path:
+                write_metrics_json(updaters, results, metrics_json_path)
+            if metrics_prometheus_path:
+                write_metrics_prometheus(updaters, last_results, metrics_prometheus_path)
+        pool_stats = connector.pool_stats()
+        print("Opened " + str(pool_stats['opened']) + " database connections and reused them "
+              + str(pool_stats['reused']) + " times.")
+
+    def collect_output_blobs():
+        """
+        Delete the outputs that no test references anymore if it has been long enough since it was last done.
+        """
+        nonlocal last_collect
+        if not output_blob_table:
+            return
+        with collect_lock:
+            if time.time() - last_collect < output_blob_collect_interval:
+                return
+            last_collect = time.time()
             try:
-                UD.update_tests()
+                collected = update_database.collect_output_blobs(connector, output_blob_table)
             except Exception:
                 traceback.print_exc()
+                return
+        print("Deleted " + str(collected) + " outputs that are no longer referenced.")
+
+    def update_function(rgt_input_path):
+        """
+        Update a single rgt input on its own and report how long it took.
 
-            del UD
+        :param rgt_input_path: The path of the rgt input to update.
+        :return: A tuple containing how many seconds its update took and whether it failed.
+        """
+        job_snapshot, snapshot_time = get_shared_snapshot()
+        result = update_rgt_input(updaters[rgt_input_path], job_snapshot)
+        with results_lock:
+            report_rgt_input(updaters, input_stats, rgt_input_path, result,
+                             snapshot_time if job_snapshot is not None else None)
+        record_results({rgt_input_path: result})
+        collect_output_blobs()
+        return result
+
+    if args.daemon:
+        # Keep updating each rgt input on its own schedule until stopped. Every input has a worker that is kept for as
+        # long as the daemon runs so that a slow input never holds back when the others start.
+        with ThreadPoolExecutor(max_workers=max(len(rgt_input_paths), 1)) as executor:
+            update_scheduler = scheduler.UpdateScheduler(rgt_input_paths, update_function, refresh_time=refresh_time,
+                                                         max_refresh_time=max_refresh_time, jitter=refresh_jitter,
+                                                         min_refresh_time=min_refresh_time, executor=executor)
+            update_scheduler.handle_signals()
+            # Update an rgt input early when one of its jobs finishes.
+            if lsf_feed_interval > 0:
+                feed = job_transitions.get_feed()
+                subscription = feed.subscribe()
+                feed.start(lsf_feed_interval)
+                reactor = threading.Thread(target=request_finished_updates, name="finished_job_updates", daemon=True,
+                                           args=(updaters, subscription, update_scheduler))
+                reactor.start()
+            update_scheduler.run()
+            # Any update that is still running finishes before the executor is shut down.
+        if lsf_feed_interval > 0:
+            feed.close()
+    else:
+        # Update everything once.
+        print("Updating database.")
+        start = time.time()
+        record_results(update_rgt_inputs(updaters, input_stats, rgt_input_paths))
+        collect_output_blobs()
+        print("Done updating in " + str(time.time() - start) + " seconds.")
 
-        total_time = time.time() - start
-        print("Done updating in " + str(total_time) + " seconds.")
-        break
-        # Either immediately refresh if the time it took to update took longer than the refresh time
-        # or sleep for the remaining refresh period.
-        time.sleep(max(int(database['refresh_time']) - total_time, 0))
+    # Close all connections that are still open.
+    connector.close()
 
 
 if __name__ == '__main__':
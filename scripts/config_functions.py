@@ -78,6 +78,7 @@ def write_config(path_to_config=config_path, path_to_slack_tokens=slack_path, pa
     database['EVENT_TABLE'] = 'rgt_event'
     database['CHECK_TABLE'] = 'rgt_check'
     database['TEST_EVENT_TABLE'] = 'rgt_test_event'
+    database['OUTPUT_BLOB_TABLE'] = 'rgt_output_blob'
 
     database_tokens = ['USER', 'PASSWORD']
     with open(path_to_database_tokens, mode='r') as f:
@@ -93,8 +94,49 @@ def write_config(path_to_config=config_path, path_to_slack_tokens=slack_path, pa
     if len(database_tokens) != 0:
         warnings.warn("Could not find values for " + str(database_tokens) + " in " + path_to_database_tokens)
 
-    # Refresh the database every half hour.
-    database['REFRESH_TIME'] = '1800'
+    # Maximum number of pooled connections to the database and how many seconds an idle connection can sit before
+    # it is checked again before reuse.
+    database['MAX_CONNECTIONS'] = '4'
+    database['PING_INTERVAL'] = '30'
+
+    # How many test directories are read at once while updating.
+    database['SCAN_WORKERS'] = '4'
+    # Each test directory is written in one transaction. It is committed early after this many rows.
+    database['COMMIT_BATCH_SIZE'] = '500'
+    # The most parsed event files that are remembered by each updater.
+    database['EVENT_CACHE_SIZE'] = '4096'
+    # When updating with --async, how many tests have their events parsed and their jobs looked up in LSF at once.
+    database['PARSE_WORKERS'] = '2'
+    database['LSF_WORKERS'] = '1'
+    # How many seconds a snapshot of every job in LSF is shared before LSF is asked again.
+    database['LSF_SNAPSHOT_TTL'] = '30'
+    # Replace LSF for testing. Jobs are replayed from the output of `bjobs -u all -a` in each comma separated file or
+    # generated with this many jobs and this fraction changing status each time LSF is read. Leave the path empty and
+    # the number of jobs at 0 to use LSF.
+    database['LSF_REPLAY_PATH'] = ''
+    database['LSF_SYNTHETIC_JOBS'] = '0'
+    database['LSF_SYNTHETIC_CHURN'] = '0.1'
+
+    # Where the timings and counts of each update are written. A JSON line is appended for each rgt input after every
+    # update and the Prometheus textfile is rewritten for the node exporter. Leave these empty to not write them.
+    database['METRICS_JSON_PATH'] = ''
+    database['METRICS_PROMETHEUS_PATH'] = ''
+    # Whether test outputs are compressed before they are stored.
+    database['COMPRESS_OUTPUTS'] = 'False'
+    # How many seconds between deleting the outputs in the output blob table that no test references anymore.
+    database['OUTPUT_BLOB_COLLECT_INTERVAL'] = '3600'
+
+    # When running as a daemon, refresh unfinished tests every five minutes. Updates that run over back off to at
+    # most an hour. Each rgt input's interval is randomly changed by up to 10% so they do not all run at once.
+    database['REFRESH_TIME'] = '300'
+    database['MAX_REFRESH_TIME'] = '3600'
+    database['REFRESH_JITTER'] = '0.1'
+    # Tests whose instances are all done are only checked for changes every six hours.
+    database['FINISHED_REFRESH_TIME'] = '21600'
+    # LSF is looked at for finished jobs every 30 seconds. An rgt input with a finished job is updated early, but not
+    # within a minute of its last update. Set the interval to 0 to only update on the refresh time.
+    database['LSF_FEED_INTERVAL'] = '30'
+    database['MIN_REFRESH_TIME'] = '60'
 
     # Maximum length of a message we send.
     # Slack splits it into multiple bits when it is longer than ~4000 so this is a good limit.
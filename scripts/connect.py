@@ -1,14 +1,24 @@
-from pythonlsf import lsf
+import threading
+
+# LSF only needs to be initialized once for each process.
+connected = False
+connect_lock = threading.Lock()
 
 
 def connect(queue="batch"):
     """
     Call this to connect to lsf. The name of the queue does not have to be the
-    one you actually want to query, it just needs to be a valid queue.
+    one you actually want to query, it just needs to be a valid queue. Once connected, this does nothing.
 
     :param queue: (str) queue that exists in lsf.
     :return:
     """
-    if lsf.lsb_init(queue) > 0:
-        raise Exception("Couldn't connect.")
-
+    global connected
+    with connect_lock:
+        if connected:
+            return
+        # Only load pythonlsf when connecting so that this can be imported without it.
+        from pythonlsf import lsf
+        if lsf.lsb_init(queue) > 0:
+            raise Exception("Couldn't connect.")
+        connected = True
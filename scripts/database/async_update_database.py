@@ -0,0 +1,212 @@
+"""
+This file updates the database with the update split into stages that run at the same time. Test directories are
+scanned, their events are parsed, their jobs are looked up in LSF and they are written to the database, each in its own
+stage connected to the next by a bounded queue. This keeps the file system, LSF and the database busy at once instead
+of using them one after another.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from scripts.database.update_database import UpdateDatabase
+
+# Put in a queue after the last item so that the stage reading it knows to stop.
+STOP = object()
+
+
+class AsyncUpdateDatabase(UpdateDatabase):
+    """
+    Update the database like UpdateDatabase but with the scan, parse, LSF and write stages running at the same time.
+    The blocking work of each stage is done in its own pool of threads. Only one thread ever writes to the database.
+    """
+
+    def __init__(self, *args, parse_workers=1, lsf_workers=1, **kwargs):
+        """
+        Constructor for updating the database. Every argument of UpdateDatabase is accepted. The number of scan workers
+        is the number of test directories read at once and the scan queue size is how many results can wait between
+        each stage.
+
+        :param parse_workers: How many tests have their events parsed at once.
+        :param lsf_workers: How many tests have their jobs looked up in LSF at once.
+        """
+        super().__init__(*args, **kwargs)
+        self.parse_workers = max(parse_workers, 1)
+        self.lsf_workers = max(lsf_workers, 1)
+        # The exit status and whether it is in the queue of each job that was looked up by the LSF stage for the
+        # current update.
+        self.job_states = {}
+
+    def update_tests(self, job_snapshot=None):
+        """
+        Add all tests from the rgt.input file that are not yet in the database.
+
+        :param job_snapshot: A snapshot from get_job_snapshot to use for this update. This lets multiple updaters share
+        a single look at LSF. If None, a new snapshot is taken.
+        :return:
+        """
+        asyncio.run(self.update_tests_async(job_snapshot))
+
+    async def update_tests_async(self, job_snapshot=None):
+        """
+        Add all tests from the rgt.input file that are not yet in the database.
+
+        :param job_snapshot: A snapshot from get_job_snapshot to use for this update. If None, a new snapshot is taken.
+        """
+        loop = asyncio.get_running_loop()
+        # Get the test directories from the file.
+        test_directories, harness_tld = await loop.run_in_executor(None, self.get_test_dirs_from_rgt)
+
+        await loop.run_in_executor(None, self.start_update)
+
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as scan_executor, \
+                ThreadPoolExecutor(max_workers=self.parse_workers) as parse_executor, \
+                ThreadPoolExecutor(max_workers=self.lsf_workers) as lsf_executor, \
+                ThreadPoolExecutor(max_workers=1) as write_executor:
+            # Get every job from LSF once for this whole update.
+            if job_snapshot is None:
+                await loop.run_in_executor(lsf_executor, self.take_job_snapshot)
+            else:
+                self.job_snapshot = job_snapshot
+            try:
+                await self.run_stages(test_directories, harness_tld, scan_executor, parse_executor, lsf_executor,
+                                      write_executor)
+                # Only a complete update has seen every unfinished job.
+                self.find_unfinished_jobs()
+            finally:
+                # Do not let the snapshot or what was found in LSF go stale for anything run after the update.
+                self.job_snapshot = None
+                self.job_states = {}
+
+    async def run_stages(self, test_directories, harness_tld, scan_executor, parse_executor, lsf_executor,
+                         write_executor):
+        """
+        Run every stage until every test directory is written. If any stage fails, the others are cancelled and the
+        problem is raised.
+
+        :param test_directories: The paths to each test ending in /Status/.
+        :param harness_tld: Path in rgt input.
+        :param scan_executor: The threads that scan test directories.
+        :param parse_executor: The threads that parse events.
+        :param lsf_executor: The threads that look up jobs in LSF.
+        :param write_executor: The thread that writes to the database.
+        """
+        # The queues between each stage.
+        test_paths = asyncio.Queue(maxsize=self.scan_queue_size)
+        scanned = asyncio.Queue(maxsize=self.scan_queue_size)
+        parsed = asyncio.Queue(maxsize=self.scan_queue_size)
+        resolved = asyncio.Queue(maxsize=self.scan_queue_size)
+
+        tasks = [asyncio.ensure_future(self.feed(test_directories, test_paths)),
+                 asyncio.ensure_future(self.run_stage(self.scan_test_directory, scan_executor, self.scan_workers,
+                                                      test_paths, scanned)),
+                 asyncio.ensure_future(self.run_stage(self.parse_test_scan, parse_executor, self.parse_workers,
+                                                      scanned, parsed)),
+                 asyncio.ensure_future(self.run_stage(self.resolve_test_scan, lsf_executor, self.lsf_workers,
+                                                      parsed, resolved)),
+                 asyncio.ensure_future(self.run_stage(lambda test_scan: self.write_test_scan(test_scan, harness_tld),
+                                                      write_executor, 1, resolved, None))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop every other stage so that nothing waits forever on a queue.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    @staticmethod
+    async def feed(items, outbox):
+        """
+        Put every item into a queue followed by STOP.
+
+        :param items: The items to put in the queue.
+        :param outbox: The queue.
+        """
+        for item in items:
+            await outbox.put(item)
+        await outbox.put(STOP)
+
+    @staticmethod
+    async def run_stage(function, executor, workers, inbox, outbox):
+        """
+        Run a function on every item from a queue until STOP is found. The results that are not None are put into the
+        next queue followed by STOP once every item is done.
+
+        :param function: The blocking function to run on each item.
+        :param executor: The threads to run the function in.
+        :param workers: How many items are worked on at once.
+        :param inbox: The queue to take items from.
+        :param outbox: The queue to put results in. None if the results are not needed.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is STOP:
+                    # Leave it for the other workers.
+                    await inbox.put(STOP)
+                    return
+                result = await loop.run_in_executor(executor, function, item)
+                if result is not None and outbox is not None:
+                    await outbox.put(result)
+
+        await asyncio.gather(*[worker() for _ in range(workers)])
+        if outbox is not None:
+            await outbox.put(STOP)
+
+    def parse_test_scan(self, test_scan):
+        """
+        Parse the events of a scanned test that will be needed when it is written. They are kept in the event cache.
+
+        :param test_scan: The TestScan for the test.
+        :return: The TestScan.
+        """
+        for _, job_tuple, event_paths, events_changed in test_scan.instances:
+            # New instances and instances with new events need every event. Otherwise only the first is read.
+            if job_tuple is None or events_changed:
+                paths = event_paths
+            else:
+                paths = event_paths[:1]
+            for event_path in paths:
+                self.parse_event(event_path)
+        return test_scan
+
+    def resolve_test_scan(self, test_scan):
+        """
+        Look up the jobs of a scanned test in LSF. They are kept in job_states so that writing does not wait on LSF.
+
+        :param test_scan: The TestScan for the test.
+        :return: The TestScan.
+        """
+        for rgt_status_line, _, _, _ in test_scan.instances:
+            job_id = rgt_status_line.job_id
+            if job_id is None or job_id in self.job_states:
+                continue
+            exit_status = super().get_exit_status(job_id)
+            # Whether the job is in the queue only matters if it has not exited.
+            in_queue = super().in_queue(job_id) if exit_status is None else None
+            self.job_states[job_id] = (exit_status, in_queue)
+        return test_scan
+
+    def get_exit_status(self, job_id):
+        """
+        Get the lsf_exit_status of some job. Jobs that were already looked up by the LSF stage are not looked up again.
+
+        :param job_id: The id of the job to check.
+        :return: The exit status of the job. If 'None' is returned, that means there was no exit status found.
+        """
+        job_state = self.job_states.get(job_id)
+        if job_state is not None:
+            return job_state[0]
+        return super().get_exit_status(job_id)
+
+    def in_queue(self, job_id):
+        """
+        Get whether the job exists in LSF. Jobs that were already looked up by the LSF stage are not looked up again.
+
+        :param job_id: The id of the job.
+        :return: Whether it exists.
+        """
+        job_state = self.job_states.get(job_id)
+        if job_state is not None and job_state[1] is not None:
+            return job_state[1]
+        return super().in_queue(job_id)
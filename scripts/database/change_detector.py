@@ -0,0 +1,185 @@
+"""
+This file keeps track of whether the files and directories of a test have changed since the last time they were read.
+Stat calls are much cheaper than listing directories and reading files on GPFS, so tests that have not changed can
+be skipped.
+"""
+import os
+import threading
+import time
+
+
+def fingerprint(path):
+    """
+    Get something that changes whenever the file or directory at the path changes.
+
+    :param path: The path to the file or directory.
+    :return: A tuple containing the mtime in nanoseconds, the size and the inode. None if the path does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return fingerprint_stat(stat)
+
+
+def fingerprint_stat(stat):
+    """
+    Get the fingerprint from an already made stat.
+
+    :param stat: The result of os.stat or os.DirEntry.stat.
+    :return: A tuple containing the mtime in nanoseconds, the size and the inode.
+    """
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ChangeDetector:
+    """
+    Remember the fingerprints of each test directory and each instance directory from the last time they were read.
+    """
+
+    def __init__(self, finished_refresh_time=0):
+        """
+        Constructor. Nothing has been seen yet.
+
+        :param finished_refresh_time: How many seconds a test whose instances are all done only has its Status directory
+        and rgt_status.txt checked before its instance directories are checked again.
+        """
+        self.finished_refresh_time = finished_refresh_time
+        # The test's Status path -> (fingerprints, instance directories, whether any instance was unfinished).
+        self.tests = {}
+        # The test's Status path -> when it was last recorded.
+        self.checked_at = {}
+        # The instance's Status path -> (fingerprint, event paths).
+        self.instances = {}
+
+        # How many directories were read or skipped.
+        self.directories_visited = 0
+        self.directories_skipped = 0
+        # Directories can be counted from multiple threads.
+        self.count_lock = threading.Lock()
+
+    def reset_counts(self):
+        """
+        Reset the visited and skipped counts. This is done at the start of each update.
+        """
+        with self.count_lock:
+            self.directories_visited = 0
+            self.directories_skipped = 0
+
+    def count_visited(self):
+        """
+        Count a directory that was read.
+        """
+        with self.count_lock:
+            self.directories_visited += 1
+
+    def count_skipped(self):
+        """
+        Count a directory that was skipped.
+        """
+        with self.count_lock:
+            self.directories_skipped += 1
+
+    @staticmethod
+    def test_paths(test_path, instance_dirs):
+        """
+        Get all paths that are checked for some test.
+
+        :param test_path: Path to test ending in /Status/.
+        :param instance_dirs: The paths to each instance directory of the test.
+        :return: A list of paths.
+        """
+        return [test_path, os.path.join(test_path, 'rgt_status.txt')] + list(instance_dirs)
+
+    def test_fingerprints(self, test_path):
+        """
+        Get the current fingerprints of a test's Status directory, rgt_status.txt and the instance directories that
+        were seen last time. This should be taken before reading the test so that changes made while reading are not
+        missed.
+
+        :param test_path: Path to test ending in /Status/.
+        :return: A tuple of fingerprints.
+        """
+        entry = self.tests.get(test_path)
+        instance_dirs = [] if entry is None else entry[1]
+        return tuple(fingerprint(path) for path in self.test_paths(test_path, instance_dirs))
+
+    def test_resting(self, test_path):
+        """
+        Test whether a finished test was checked recently enough that its instance directories do not need to be
+        looked at yet. The Status directory and rgt_status.txt are always checked since a new instance changes them.
+
+        :param test_path: Path to test ending in /Status/.
+        :return: Whether the test can be skipped without checking the rest of its fingerprints.
+        """
+        entry = self.tests.get(test_path)
+        if entry is None or entry[2]:
+            return False
+        if time.time() - self.checked_at[test_path] >= self.finished_refresh_time:
+            return False
+        current = tuple(fingerprint(path) for path in self.test_paths(test_path, []))
+        return None not in current and entry[0][:2] == current
+
+    def test_unchanged(self, test_path, fingerprints):
+        """
+        Test whether a test can be skipped. This is only true if nothing has changed and every instance of the test
+        was done last time. Unfinished instances always need to be checked since LSF may have changed.
+
+        :param test_path: Path to test ending in /Status/.
+        :param fingerprints: The fingerprints from test_fingerprints.
+        :return: Whether the test can be skipped.
+        """
+        entry = self.tests.get(test_path)
+        if entry is None:
+            return False
+        old_fingerprints, _, unfinished = entry
+        return not unfinished and None not in fingerprints and old_fingerprints == fingerprints
+
+    def record_test(self, test_path, fingerprints, instance_dirs, unfinished):
+        """
+        Remember the state of a test after reading it.
+
+        :param test_path: Path to test ending in /Status/.
+        :param fingerprints: The fingerprints from test_fingerprints that were taken before reading.
+        :param instance_dirs: The paths to each instance directory of the test.
+        :param unfinished: Whether any instance of the test is not done.
+        """
+        entry = self.tests.get(test_path)
+        old_instance_dirs = [] if entry is None else entry[1]
+        # Instance directories that were not known before the read are fingerprinted now.
+        if list(instance_dirs) != list(old_instance_dirs):
+            fingerprints = fingerprints[:2] + tuple(fingerprint(path) for path in instance_dirs)
+        self.tests[test_path] = (fingerprints, list(instance_dirs), unfinished)
+        self.checked_at[test_path] = time.time()
+
+    def get_instance(self, instance_path):
+        """
+        Get the event paths of an instance directory if it has not changed since it was last listed.
+
+        :param instance_path: Path to the instance directory in Status.
+        :return: A tuple containing the event paths or None if it changed, and the current fingerprint.
+        """
+        current = fingerprint(instance_path)
+        entry = self.instances.get(instance_path)
+        if current is not None and entry is not None and entry[0] == current:
+            return entry[1], current
+        return None, current
+
+    def record_instance(self, instance_path, current, event_paths):
+        """
+        Remember the event paths of an instance directory.
+
+        :param instance_path: Path to the instance directory in Status.
+        :param current: The fingerprint from get_instance taken before listing the directory.
+        :param event_paths: The event paths found.
+        """
+        if current is not None:
+            self.instances[instance_path] = (current, list(event_paths))
+
+    def forget_instance(self, instance_path):
+        """
+        Forget the event paths of an instance directory so that it is listed again.
+
+        :param instance_path: Path to the instance directory in Status.
+        """
+        self.instances.pop(instance_path, None)
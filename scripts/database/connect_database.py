@@ -1,4 +1,8 @@
 import pymysql
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from scripts import config_functions
 
 
@@ -7,11 +11,13 @@ class DatabaseConnector:
     Class to hold info on some connection.
     """
 
-    def __init__(self, database_config, user=None, password=None):
+    def __init__(self, database_config, user=None, password=None, max_connections=None, ping_interval=None):
         """
         Class to easily connect and disconnect some database.
 
         :param database_config: The config section for the database.
+        :param max_connections: The maximum number of connections that can be checked out of the pool at once.
+        :param ping_interval: How many seconds a pooled connection can sit idle before it is checked before reuse.
         """
 
         # Get important values from the config that will be used when connecting to the database.
@@ -32,14 +38,152 @@ class DatabaseConnector:
         else:
             self.port = None
 
+        # The size of the pool and how long connections can sit before being checked.
+        if max_connections is None:
+            max_connections = int(database_config.get('max_connections', 4))
+        if ping_interval is None:
+            ping_interval = float(database_config.get('ping_interval', 30))
+        self.max_connections = max_connections
+        self.ping_interval = ping_interval
+
+        # Idle connections along with the time they were last used.
+        self.idle_connections = queue.LifoQueue()
+        # Only allow a certain number of connections to be checked out at once.
+        self.available = threading.BoundedSemaphore(self.max_connections)
+        # Lock for updating the counters.
+        self.counter_lock = threading.Lock()
+
+        # Counters for how many connections have been opened and how many checkouts reused a connection.
+        self.connections_opened = 0
+        self.connections_reused = 0
+
     def connect(self):
         """
-        Connect to some database.
+        Connect to some database. This always opens a new connection that the caller must close.
 
         :return: The database that is connected to.
         """
+        with self.counter_lock:
+            self.connections_opened += 1
         # If there is a port defined, use that. Otherwise use the default port.
         if self.port is not None:
             return pymysql.connect(self.host, self.user, self.password, self.database_name, port=self.port)
         else:
             return pymysql.connect(self.host, self.user, self.password, self.database_name)
+
+    @contextmanager
+    def checkout(self):
+        """
+        Check out a connection from the pool. The connection is returned to the pool once the block finishes.
+        Any transaction still open is committed if the block finished cleanly and rolled back otherwise.
+
+        Usage:
+            with connector.checkout() as db:
+                ...
+
+        :return: A connection to the database.
+        """
+        self.available.acquire()
+        try:
+            db = self.get_connection()
+        except Exception:
+            self.available.release()
+            raise
+
+        try:
+            yield db
+        except Exception:
+            self.release_connection(db, healthy=self.end_transaction(db, commit=False))
+            raise
+        else:
+            self.release_connection(db, healthy=self.end_transaction(db, commit=True))
+
+    def get_connection(self):
+        """
+        Get a healthy connection. Idle connections are reused before new ones are opened.
+
+        :return: A connection to the database.
+        """
+        while True:
+            try:
+                db, last_used = self.idle_connections.get_nowait()
+            except queue.Empty:
+                return self.connect()
+
+            # Drop connections that were closed while they sat in the pool.
+            if not db.open:
+                continue
+            # If the connection has been sitting for a while, make sure it still works before reusing it.
+            if time.time() - last_used > self.ping_interval:
+                try:
+                    db.ping(reconnect=True)
+                except pymysql.MySQLError:
+                    self.close_connection(db)
+                    continue
+
+            with self.counter_lock:
+                self.connections_reused += 1
+            return db
+
+    @staticmethod
+    def end_transaction(db, commit):
+        """
+        Finish whatever transaction is open on a connection so the next user starts fresh.
+
+        :param db: The connection.
+        :param commit: Whether to commit or roll back.
+        :return: Whether the connection is still usable.
+        """
+        try:
+            if commit:
+                db.commit()
+            else:
+                db.rollback()
+        except pymysql.MySQLError:
+            return False
+        return True
+
+    def release_connection(self, db, healthy=True):
+        """
+        Put a connection back in the pool. Broken connections are closed instead.
+
+        :param db: The connection to release.
+        :param healthy: Whether the connection can be reused.
+        """
+        if healthy and db.open:
+            self.idle_connections.put((db, time.time()))
+        else:
+            self.close_connection(db)
+        self.available.release()
+
+    @staticmethod
+    def close_connection(db):
+        """
+        Close a connection and ignore any problems doing so.
+
+        :param db: The connection to close.
+        """
+        try:
+            db.close()
+        except pymysql.MySQLError:
+            pass
+
+    def close(self):
+        """
+        Close every idle connection in the pool.
+        """
+        while True:
+            try:
+                db, _ = self.idle_connections.get_nowait()
+            except queue.Empty:
+                break
+            self.close_connection(db)
+
+    def pool_stats(self):
+        """
+        Get the counters for the pool.
+
+        :return: A dictionary containing how many connections were opened and reused.
+        """
+        with self.counter_lock:
+            return {'opened': self.connections_opened, 'reused': self.connections_reused}
@@ -43,11 +43,6 @@ def execute_sql_file(connector, file_path, verbose=False):
     :param file_path: Path to the file.
     :param verbose: Whether to print out what is being run.
     """
-    # Get the database from the connector.
-    database = connector.connect()
-    # Activate a cursor.
-    cursor = database.cursor()
-
     # Open the file and get the lines.
     with open(file_path, mode='r') as f:
         sql_file = ""
@@ -62,21 +57,25 @@ def execute_sql_file(connector, file_path, verbose=False):
     # Remove dead lines.
     sql_commands = [command for command in sql_commands if len(command.strip()) != 0]
 
-    for command in sql_commands:
-        # Try to execute the command and if it does not work inform the user.
-        # Otherwise commit the command to the database.
-        if verbose:
-            print("Running '" + command + "'")
-        try:
-            cursor.execute(command)
-        except pymysql.MySQLError as e:
-            print("Command skipped: " + command, e.args)
-        except Exception as e:
-            database.rollback()
-            raise e
-        else:
-            database.commit()
-
-    # Close the connection.
-    database.close()
-
+    # Get a connection to the database from the connector.
+    with connector.checkout() as database:
+        # Activate a cursor.
+        cursor = database.cursor()
+
+        for command in sql_commands:
+            # Try to execute the command and if it does not work inform the user.
+            # Otherwise commit the command to the database.
+            if verbose:
+                print("Running '" + command + "'")
+            try:
+                cursor.execute(command)
+            except pymysql.MySQLError as e:
+                print("Command skipped: " + command, e.args)
+            except Exception as e:
+                database.rollback()
+                raise e
+            else:
+                database.commit()
+
+        # The file may have switched databases with 'USE'. Switch back so the pooled connection is left as it was found.
+        database.select_db(connector.database_name)
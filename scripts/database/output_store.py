@@ -0,0 +1,81 @@
+"""
+This file prepares the output files of a test for storage in the test table.
+Each output is hashed so that it only needs to be sent to the database when it changes and can optionally be
+compressed. Compressed outputs are stored as base64 text so that they still fit in the TEXT columns.
+Outputs can also be kept once in the output blob table by their hash so identical outputs are only stored once.
+"""
+import base64
+import hashlib
+import zlib
+
+
+def hash_output(data):
+    """
+    Get the hash of some output.
+
+    :param data: The bytes of the output.
+    :return: The sha256 hex digest of the output.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def encode_output(data, compress=False):
+    """
+    Get the text that is stored in the database for some output.
+
+    :param data: The bytes of the output.
+    :param compress: Whether to compress the output.
+    :return: The text to store.
+    """
+    if compress:
+        return base64.b64encode(zlib.compress(data)).decode('ascii')
+    return data.decode('utf-8')
+
+
+def decode_output(text, compressed=False):
+    """
+    Get the output back from the text that was stored in the database.
+
+    :param text: The stored text.
+    :param compressed: Whether the output was compressed.
+    :return: The text of the output.
+    """
+    if text is None or not compressed:
+        return text
+    return zlib.decompress(base64.b64decode(text)).decode('utf-8')
+
+
+def compress_blob(data):
+    """
+    Get the body stored in the output blob table for some output.
+
+    :param data: The bytes of the output.
+    :return: The compressed bytes.
+    """
+    return zlib.compress(data)
+
+
+def decompress_blob(body):
+    """
+    Get the text of an output back from its body in the output blob table.
+
+    :param body: The compressed bytes.
+    :return: The text of the output.
+    """
+    return zlib.decompress(body).decode('utf-8')
+
+
+def output_fields(output_type, data, compress=False):
+    """
+    Get the fields that store some output in the test table.
+
+    :param output_type: The type of output such as 'build' or 'report'.
+    :param data: The bytes of the output.
+    :param compress: Whether to compress the output.
+    :return: A dictionary from each field to its value.
+    """
+    key = 'output_' + output_type
+    return {key: encode_output(data, compress),
+            key + '_hash': hash_output(data),
+            key + '_size': len(data),
+            key + '_compressed': compress}
@@ -0,0 +1,149 @@
+"""
+This file keeps the small reference tables (the event and check tables) in memory so that they do not need to be
+queried for every event file and every rgt_status line.
+"""
+import threading
+import time
+import weakref
+
+
+# The caches for each connector. Each connector holds a dictionary from (event_table, check_table) to a cache.
+caches = weakref.WeakKeyDictionary()
+caches_lock = threading.Lock()
+
+
+def get_reference_cache(connector, event_table='rgt_event', check_table='rgt_check', refresh_time=300):
+    """
+    Get the cache shared by everything in this process that uses the same connector and tables.
+
+    :param connector: The connector to the database.
+    :param event_table: The name of the event table.
+    :param check_table: The name of the check table.
+    :param refresh_time: How many seconds the cache is used before it is reloaded. Only used when creating the cache.
+    :return: The ReferenceCache for these tables.
+    """
+    with caches_lock:
+        connector_caches = caches.setdefault(connector, {})
+        key = (event_table, check_table)
+        if key not in connector_caches:
+            connector_caches[key] = ReferenceCache(connector, event_table, check_table, refresh_time)
+        return connector_caches[key]
+
+
+class ReferenceCache:
+    """
+    Hold the event uid to event id mapping and the legal check uids in memory.
+    The tables are reloaded after some amount of time or when something is looked up that is not known yet.
+    """
+
+    def __init__(self, connector, event_table='rgt_event', check_table='rgt_check', refresh_time=300):
+        """
+        Constructor for the cache. Nothing is loaded until the first lookup.
+
+        :param connector: The connector to the database.
+        :param event_table: The name of the event table.
+        :param check_table: The name of the check table.
+        :param refresh_time: How many seconds the cache is used before it is reloaded.
+        """
+        self.connector = connector
+        self.event_table = event_table
+        self.check_table = check_table
+        self.refresh_time = refresh_time
+
+        # The event_uid -> event_id mapping and the set of check_uids.
+        self.event_ids = {}
+        self.check_uids = set()
+        # When the tables were last loaded. None means never.
+        self.loaded_at = None
+        # Things that were looked up and not found since the tables were last reloaded for being stale. These do not
+        # cause another reload.
+        self.misses = set()
+
+        self.lock = threading.Lock()
+
+    def refresh(self, clear_misses=True):
+        """
+        Reload both tables from the database.
+
+        :param clear_misses: Whether keys that were not found may cause another reload. This is False for reloads
+        caused by a miss so that missing keys looked up in turn do not keep reloading for each other.
+        """
+        event_sql = "SELECT event_uid, event_id FROM {table}".format(table=self.event_table)
+        check_sql = "SELECT check_uid FROM {table}".format(table=self.check_table)
+
+        # The tables are read on their own connection so that a reload never waits on the pool while the caller is
+        # holding a pooled connection for a transaction.
+        db = self.connector.connect()
+        try:
+            cursor = db.cursor()
+            cursor.execute(event_sql)
+            event_ids = {int(event_uid): int(event_id) for event_uid, event_id in cursor.fetchall()}
+            cursor.execute(check_sql)
+            check_uids = {int(check_uid[0]) for check_uid in cursor.fetchall()}
+        finally:
+            self.connector.close_connection(db)
+
+        with self.lock:
+            self.event_ids = event_ids
+            self.check_uids = check_uids
+            self.loaded_at = time.time()
+            if clear_misses:
+                self.misses = set()
+
+    def refresh_if_stale(self):
+        """
+        Reload the tables if they were never loaded or have been held for longer than the refresh time.
+        """
+        if self.loaded_at is None or time.time() - self.loaded_at > self.refresh_time:
+            self.refresh()
+
+    def refresh_on_miss(self, key):
+        """
+        Reload the tables because something was not found. Each missing key only causes one reload until the tables
+        are reloaded for being stale.
+
+        :param key: The key that was not found.
+        :return: Whether the tables were reloaded.
+        """
+        with self.lock:
+            if key in self.misses:
+                return False
+        self.refresh(clear_misses=False)
+        with self.lock:
+            self.misses.add(key)
+        return True
+
+    def get_event_id(self, event_uid):
+        """
+        Get the id of the event from the event table based on the uid for the event.
+
+        :param event_uid: The uid of the event.
+        :return: The id in the table for the event. None if there is no such event.
+        """
+        event_uid = int(event_uid)
+        self.refresh_if_stale()
+        if event_uid not in self.event_ids:
+            self.refresh_on_miss(('event', event_uid))
+        return self.event_ids.get(event_uid)
+
+    def get_event_uids(self):
+        """
+        Get all the types of events that a test instance can output.
+
+        :return: A list of the event uids.
+        """
+        self.refresh_if_stale()
+        return list(self.event_ids.keys())
+
+    def legal_check_status(self, check_uid):
+        """
+        Find if the check status is in the check table.
+
+        :param check_uid: The status to match.
+        :return: Whether it was in the table or not.
+        """
+        check_uid = int(check_uid)
+        self.refresh_if_stale()
+        if check_uid not in self.check_uids:
+            self.refresh_on_miss(('check', check_uid))
+        return check_uid in self.check_uids
@@ -0,0 +1,112 @@
+"""
+This file holds the SQL statements used to update the test and test event tables.
+Every statement has a fixed shape and takes its values as parameters. This lets pymysql escape the values and lets
+many rows share one statement with executemany instead of building new SQL for every row.
+"""
+
+# The types of outputs that are stored for each test.
+OUTPUT_TYPES = ['build', 'submit', 'check', 'report']
+
+# The columns of the test table that are set once when a test is added.
+TEST_ADD_COLUMNS = ['harness_uid', 'harness_start', 'harness_tld', 'application', 'testname', 'system',
+                    'previous_job_id']
+
+# The columns of the test table that can change while a test runs.
+TEST_UPDATE_COLUMNS = ['job_id', 'lsf_exit_status', 'build_status', 'submit_status', 'check_status']
+for output_type in OUTPUT_TYPES:
+    TEST_UPDATE_COLUMNS += ['output_' + output_type, 'output_' + output_type + '_hash',
+                            'output_' + output_type + '_size', 'output_' + output_type + '_compressed']
+TEST_UPDATE_COLUMNS.append('done')
+
+TEST_COLUMNS = TEST_ADD_COLUMNS + TEST_UPDATE_COLUMNS
+
+# The values used for columns that can not be null when they are not given while adding a test.
+TEST_DEFAULTS = {'output_' + output_type + '_compressed': False for output_type in OUTPUT_TYPES}
+TEST_DEFAULTS['done'] = False
+
+
+class TestStatements:
+    """
+    The statements for some test table and test event table.
+    """
+
+    def __init__(self, test_table='rgt_test', test_event_table='rgt_test_event'):
+        """
+        Create the statements.
+
+        :param test_table: The name of the test table.
+        :param test_event_table: The name of the test event table.
+        """
+        self.test_table = test_table
+        self.test_event_table = test_event_table
+
+        columns = ", ".join(TEST_COLUMNS)
+        values = ", ".join(["%s"] * len(TEST_COLUMNS))
+        # Add a test with every column.
+        self.insert_test = "INSERT INTO {table} ({columns}) VALUES ({values})"\
+            .format(table=test_table, columns=columns, values=values)
+        # Add a test or, if its uid is already in the table, update the columns that can change. Like update_test, each
+        # column also takes whether to set it so that columns that were not given keep their value.
+        self.upsert_test = self.insert_test + " ON DUPLICATE KEY UPDATE " + \
+            ", ".join([column + " = IF(%s, VALUES(" + column + "), " + column + ")" for column in TEST_UPDATE_COLUMNS])
+        # Update every column that can change. Each column takes two values. The first is whether to set the column
+        # and the second is the value to set it to. Columns that are not set keep their value.
+        self.update_test = "UPDATE {table} SET {columns} WHERE test_id = %s"\
+            .format(table=test_table,
+                    columns=", ".join([column + " = IF(%s, %s, " + column + ")" for column in TEST_UPDATE_COLUMNS]))
+
+        # Add an event for a test unless it is already there.
+        self.insert_test_event = "INSERT IGNORE INTO {table} (test_id, event_id, event_time) VALUES (%s, %s, %s)"\
+            .format(table=test_event_table)
+
+        # Find tests by uid.
+        self.select_test_id = "SELECT test_id FROM {table} WHERE harness_uid = %s".format(table=test_table)
+        # Find every test that is done.
+        self.select_done_uids = "SELECT harness_uid FROM {table} WHERE done = TRUE".format(table=test_table)
+
+    @staticmethod
+    def check_fields(fields, columns):
+        """
+        Make sure every field is a column that the statement can set.
+
+        :param fields: A dictionary from each field to its value.
+        :param columns: The columns the statement sets.
+        """
+        unknown = [field for field in fields if field not in columns]
+        if len(unknown) != 0:
+            raise KeyError("These fields can not be written to the test table: " + str(unknown))
+
+    def insert_test_params(self, fields):
+        """
+        Get the values for insert_test for some test.
+
+        :param fields: A dictionary from each field to its value. Fields that are not given are null or their default.
+        :return: A tuple of values.
+        """
+        self.check_fields(fields, TEST_COLUMNS)
+        return tuple(fields.get(column, TEST_DEFAULTS.get(column)) for column in TEST_COLUMNS)
+
+    def upsert_test_params(self, fields):
+        """
+        Get the values for upsert_test for some test.
+
+        :param fields: A dictionary from each field to its value. Fields that are not given are null or their default
+        when the test is added and are not changed when it is already in the table.
+        :return: A tuple of values.
+        """
+        return self.insert_test_params(fields) + tuple(column in fields for column in TEST_UPDATE_COLUMNS)
+
+    def update_test_params(self, fields, test_id):
+        """
+        Get the values for update_test for some test.
+
+        :param fields: A dictionary from each field to update to its value. Fields that are not given are not changed.
+        :param test_id: The id of the test to update.
+        :return: A tuple of values.
+        """
+        self.check_fields(fields, TEST_UPDATE_COLUMNS)
+        params = []
+        for column in TEST_UPDATE_COLUMNS:
+            params += [column in fields, fields.get(column)]
+        params.append(test_id)
+        return tuple(params)
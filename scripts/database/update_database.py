@@ -3,57 +3,192 @@ This file updates the database using any new things in the rgt.input and all thi
 that are not yet done.
 """
 import os
-from scripts import job_status
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from scripts import job_snapshot as snapshots
 import warnings
+from scripts import metrics
 from scripts import parse_file
 from scripts import test_status
+from scripts.database import reference_cache
+from scripts.database import change_detector
+from scripts.database import output_store
+from scripts.database import statements
 
 
-def get_event_types(connector, event_table):
+def get_event_types(connector, event_table, check_table='rgt_check'):
     """
-    Get all the types of events that a test instance can output.
+    Get all the types of events that a test instance can output. These come from the reference cache shared by the
+    whole process.
 
     :param connector: The connector to the database.
     :param event_table: The name of the event table.
-    :return: A list of tuples corresponding to the event types.
+    :param check_table: The name of the check table that shares the cache with the event table.
+    :return: A list of the event uids.
     """
-    database = connector.connect()
-    cursor = database.cursor()
-    sql = "SELECT (event_uid) FROM {table}".format(table=event_table)
+    return reference_cache.get_reference_cache(connector, event_table, check_table).get_event_uids()
 
-    cursor.execute(sql)
-    database.commit()
-    database.close()
-    event_types = cursor.fetchall()
-    event_types = [event_type[0] for event_type in event_types]
 
-    return event_types
+def get_job_snapshot():
+    """
+    Get all jobs from LSF indexed by job id. The snapshot is shared by the whole process and only taken again once it
+    is older than the ttl of the snapshot service.
+
+    :return: A JobSnapshot.
+    """
+    return snapshots.get_snapshot()
+
+
+def collect_output_blobs(connector, output_blob_table):
+    """
+    Delete the output blobs that no test references anymore. A blob that is being referenced again by a transaction
+    that is still open is locked by it and is only looked at once that transaction is done.
+
+    :param connector: The connector to the database.
+    :param output_blob_table: The name of the output blob table.
+    :return: The number of blobs that were deleted.
+    """
+    with connector.checkout() as db:
+        cursor = db.cursor()
+        return cursor.execute("DELETE FROM {table} WHERE refcount = 0".format(table=output_blob_table))
 
 
 class PermissionWarning(UserWarning):
     pass
 
 
+class DatabaseWarning(Exception):
+    """
+    A warning the database gave for a statement. These are treated as errors.
+    """
+    pass
+
+
+# The warnings that are expected when INSERT IGNORE skips a row that is already in the table.
+ignored_warning_codes = frozenset([1062])
+
+
+def raise_database_warnings(cursor, db):
+    """
+    Raise a DatabaseWarning if the database gave a warning for the last statement run with a cursor. The warnings are
+    read from the connection instead of turning Python warnings into errors since the warning filters are shared by
+    every thread.
+
+    :param cursor: The cursor that ran the statement.
+    :param db: The connection of the cursor.
+    """
+    # pymysql keeps how many warnings the last result had. If it is not known, the database is asked.
+    warning_count = getattr(getattr(cursor, '_result', None), 'warning_count', None)
+    if warning_count == 0:
+        return
+    database_warnings = [warning for warning in db.show_warnings() or ()
+                         if int(warning[1]) not in ignored_warning_codes]
+    if len(database_warnings) != 0:
+        raise DatabaseWarning("; ".join(str(warning[2]) for warning in database_warnings))
+
+
+class TestScan:
+    """
+    Hold everything that was read for some test directory so that it can be written to the database later.
+    """
+    def __init__(self, test_path, fingerprints):
+        """
+        Constructor for the scan of a test.
+
+        :param test_path: Path to test ending in /Status/.
+        :param fingerprints: The fingerprints of the test taken before it was read.
+        """
+        self.test_path = test_path
+        self.rgt_status_path = os.path.join(test_path, 'rgt_status.txt')
+        self.fingerprints = fingerprints
+        # The paths to the instance directories of every instance that was checked.
+        self.instance_dirs = []
+        # A tuple of (rgt_status_line, job_tuple, event_paths, events_changed) for each instance to add or update.
+        # The job tuple is None for instances that are not in the table yet.
+        self.instances = []
+
+
 def execute_sql(sql, db):
     """
     Execute some sql on the database. Only works when not expecting a response.
 
     :param sql: SQL to execute.
     :param db: Database to execute on.
+    :return: Whether the sql ran.
     """
-    with warnings.catch_warnings():
-        warnings.filterwarnings('error')
+    cursor = db.cursor()
+    try:
+        # Execute the command.
+        cursor.execute(sql)
+        raise_database_warnings(cursor, db)
+    except Exception as e:
+        # Throw a nice warning if there was a problem.
+        warnings.warn(str(e) + '\n' + repr(sql))
+        return False
+    else:
+        # Commit it to the database.
+        db.commit()
+        return True
 
-        cursor = db.cursor()
-        try:
-            # Execute the command.
-            cursor.execute(sql)
-        except Exception as e:
-            # Throw a nice warning if there was a problem.
-            warnings.warn(str(e) + '\n' + repr(sql))
+
+# Event files are named like 'Event_<uid>_<description>.txt'. The uid is every digit after 'Event_'.
+event_file_pattern = re.compile(r'^Event_(\d+)')
+
+# An event file found in an instance directory along with its uid and the stat taken while listing the directory.
+EventFile = namedtuple('EventFile', ['path', 'event_uid', 'stat'])
+
+
+def event_uid_from_filename(file_name):
+    """
+    Get the uid of an event from the name of its file.
+
+    :param file_name: The name of the event file. This is not the full path.
+    :return: The uid of the event or None if the name is not an event file.
+    """
+    match = event_file_pattern.match(file_name)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+# Statements whose rows pymysql sends together.
+insert_pattern = re.compile(r'^\s*(INSERT|REPLACE)\b', re.IGNORECASE)
+
+# A statement that could not be run along with the rows it was run for and the problem.
+FailedStatement = namedtuple('FailedStatement', ['sql', 'rows', 'error'])
+
+
+def execute_many(sql, rows, db, failed_statements=None):
+    """
+    Execute a parameterized statement for many rows at once. Nothing is committed so the caller decides what to do
+    with the transaction. pymysql only sends the rows of an INSERT together, so other statements are run one row at a
+    time and checked for warnings after each row.
+
+    :param sql: The parameterized SQL to execute.
+    :param rows: A list with a tuple of parameters for each row.
+    :param db: Database to execute on.
+    :param failed_statements: A list that a FailedStatement is appended to if the statement does not run.
+    :return: Whether the statement ran for every row.
+    """
+    cursor = db.cursor()
+    try:
+        if insert_pattern.match(sql):
+            cursor.executemany(sql, rows)
+            raise_database_warnings(cursor, db)
         else:
-            # Commit it to the database.
-            db.commit()
+            for row in rows:
+                cursor.execute(sql, row)
+                raise_database_warnings(cursor, db)
+    except Exception as e:
+        # Keep a record of what failed.
+        if failed_statements is not None:
+            failed_statements.append(FailedStatement(sql, rows, str(e)))
+        # Throw a nice warning if there was a problem.
+        warnings.warn(str(e) + '\n' + repr(sql) + '\n' + repr(rows))
+        return False
+    return True
 
 
 class UpdateDatabase:
@@ -62,7 +197,10 @@ class UpdateDatabase:
     """
     def __init__(self, connector, rgt_input_path, test_table='rgt_test', test_event_table='rgt_test_event',
                  event_table='rgt_event', check_table='rgt_check',
-                 verbose=False, replacement_lsf_exit_function=None, replacement_in_queue_function=None):
+                 verbose=False, replacement_lsf_exit_function=None, replacement_in_queue_function=None,
+                 select_chunk_size=1000, reference_refresh_time=300, scan_workers=1, scan_queue_size=None,
+                 finished_refresh_time=0, compress_outputs=False, output_blob_table=None, commit_batch_size=0,
+                 event_cache_size=4096):
         """
         Constructor for updating the database.
 
@@ -72,6 +210,20 @@ class UpdateDatabase:
         :param test_event_table: The name of the table where test, event pairs are stored.
         :param event_table: The name of the table where event types are stored.
         :param verbose: Whether to print out what is currently happening while updating.
+        :param select_chunk_size: The most uids to search for in a single query.
+        :param reference_refresh_time: How many seconds the event and check tables are cached before being reloaded.
+        :param scan_workers: The number of threads reading test directories at once.
+        :param scan_queue_size: The most test directories that can be read but not yet written. Defaults to twice the
+        number of scan workers.
+        :param finished_refresh_time: How many seconds a test whose instances are all done only has its Status directory
+        and rgt_status.txt checked before its instance directories are checked for changes again.
+        :param compress_outputs: Whether output files are compressed before being stored in the test table.
+        :param output_blob_table: The name of the output blob table. If given, outputs are stored once in this table by
+        their hash and the test table only holds the hash. Otherwise they are stored in the test table.
+        :param commit_batch_size: The most rows written in a single transaction. Each test directory is written in its
+        own transaction which is committed early whenever this many rows have been written. 0 means each directory is
+        always a single transaction.
+        :param event_cache_size: The most parsed events that are remembered so they do not need to be parsed again.
         """
         # Set the connections to the database.
         self.connector = connector
@@ -83,19 +235,69 @@ class UpdateDatabase:
         # are not getting messed up with our tomfoolery.
         self.test_table = test_table
         self.test_event_table = test_event_table
+        # The parameterized statements for the test and test event tables.
+        self.statements = statements.TestStatements(self.test_table, self.test_event_table)
         self.event_table = event_table
         self.check_table = check_table
 
-        # Set the types of events we are prepared to handle.
-        self.event_types = get_event_types(self.connector, self.event_table)
+        # The cached event and check tables. This is shared with every other updater using the same tables.
+        self.reference_cache = reference_cache.get_reference_cache(self.connector, self.event_table, self.check_table,
+                                                                   refresh_time=reference_refresh_time)
+        # The event files found while listing instance directories by path. This holds the stat of each event so that
+        # it does not need to be taken again.
+        self.event_files = {}
+        # The timings and counts of the current update.
+        self.metrics = metrics.UpdateMetrics()
+        # The events that were already parsed. Each event file is only parsed once unless it changes.
+        self.event_cache = parse_file.EventCache(event_cache_size, metrics=self.metrics)
         # The fields within an rgt_status.txt file.
-        self.rgt_fields = ['harness_start', 'harness_uid', 'job_id', 'build_status', 'submit_status', 'check_status']
+        self.rgt_fields = list(parse_file.RgtStatusRecord._fields)
 
         # The possible output files that we are prepared to handle. They will go like "*_output.txt".
         self.possible_outputs = ['build', 'submit', 'check', 'report']
+        # Whether outputs are stored compressed.
+        self.compress_outputs = compress_outputs
+        # The table that outputs are stored in by hash and the hashes that are known to already be in it.
+        self.output_blob_table = output_blob_table
+        self.known_blobs = set()
+        # The hash of each output that is stored in the test table by test id. These are loaded along with the job
+        # tuples so that outputs that have not changed are not sent again.
+        self.output_hashes = {}
 
         self.verbose = verbose
 
+        # The most uids that are searched for in a single query when getting the state of many instances.
+        self.select_chunk_size = select_chunk_size
+
+        # How many test directories are read at once and how many can wait to be written.
+        self.scan_workers = scan_workers
+        if scan_queue_size is None:
+            scan_queue_size = 2 * scan_workers
+        self.scan_queue_size = max(scan_queue_size, 1)
+
+        # Test ids and fields waiting to be written to the test table. They are written together by flush_test_table.
+        self.test_rows = []
+        # Rows waiting to be written to the test event table. They are written together by flush_event_table.
+        self.event_rows = []
+        # The instance directories that the waiting events and the events written in the open transaction came from.
+        # If the events are not written, these directories are listed again next time so that the events are retried.
+        self.event_dirs = set()
+        self.uncommitted_event_dirs = set()
+        # How many blocks are currently holding off writes. Tests and events are only written once this is 0.
+        self.flush_depth = 0
+
+        # The connection of the transaction that is open for the current test directory. None when there is none.
+        self.transaction_db = None
+        # The most rows in each transaction and how many have been written since the last commit.
+        self.commit_batch_size = commit_batch_size
+        self.rows_since_commit = 0
+        # Blobs written in the open transaction. They are only known to exist once it is committed.
+        self.uncommitted_blobs = []
+        # The most recent statements that could not be run.
+        self.failed_statements = deque(maxlen=100)
+        # The total number of events that were actually new when written.
+        self.events_inserted = 0
+
         # This is used for testing so that fake jobs can be tested instead of getting stuff from LSF.
         self.lsf_exit_function = None
         if replacement_lsf_exit_function is not None:
@@ -104,18 +306,113 @@ class UpdateDatabase:
         if replacement_in_queue_function is not None:
             self.in_queue_function = replacement_in_queue_function
 
-    def update_tests(self):
+        # Remembers which directories have changed since they were last read so that unchanged ones can be skipped.
+        # This only helps when the same UpdateDatabase is used for multiple updates.
+        self.change_detector = change_detector.ChangeDetector(finished_refresh_time)
+
+        # Reads only the lines added to each rgt_status.txt file since the last update.
+        self.rgt_status_reader = parse_file.ParseRGTStatusTail()
+        # The lines of instances that were not done the last time they were checked for each test. These are checked
+        # again every update even if their line in rgt_status.txt has not changed.
+        self.pending_lines = {}
+        # The uids of every instance that is done. These are loaded from the test table at the start of the first
+        # update and added to as instances are marked done so that done instances are never looked at again.
+        self.done_uids = set()
+        self.done_uids_loaded = False
+        # The uids of tests that are being marked done by the waiting test updates by test id.
+        self.finishing_uids = {}
+        # Instances marked done in the open transaction. They are only known to be done once it is committed.
+        self.uncommitted_done = []
+
+        # The jobs in LSF by job id. This is taken once at the start of each update so that LSF is not asked about
+        # each job separately. When it is None, LSF is asked directly.
+        self.job_snapshot = None
+        # The job ids of the instances that were not done after the last complete update. When one of these jobs
+        # finishes, the next update may mark its instance done.
+        self.unfinished_jobs = set()
+        # The job id of each instance with a job that was checked in the current update by uid.
+        self.scanned_jobs = {}
+
+    def update_tests(self, job_snapshot=None):
         """
         Add all tests from the rgt.input file that are not yet in the database.
 
+        :param job_snapshot: A snapshot from get_job_snapshot to use for this update. This lets multiple updaters share
+        a single look at LSF. If None, a new snapshot is taken.
         :return:
         """
         # Get the test directories from the file.
         test_directories, harness_tld = self.get_test_dirs_from_rgt()
 
-        # For each test directory, add any new UIDs from that test.
-        for test_dir in test_directories:
-            self.update_test_instances(test_dir, harness_tld)
+        self.start_update()
+
+        # Get every job from LSF once for this whole update.
+        if job_snapshot is None:
+            self.take_job_snapshot()
+        else:
+            self.job_snapshot = job_snapshot
+        try:
+            # For each test directory, add any new UIDs from that test.
+            self.update_test_directories(test_directories, harness_tld)
+            # Only a complete update has seen every unfinished job.
+            self.find_unfinished_jobs()
+        finally:
+            # Do not let the snapshot go stale for anything run after the update.
+            self.job_snapshot = None
+
+    def start_update(self):
+        """
+        Reset what is only kept for a single update and load what is needed before the first update.
+        """
+        # Start counting visited and skipped directories and timing each phase for this update.
+        self.change_detector.reset_counts()
+        self.metrics.reset()
+        # Forget the event stats from the last update so that events which changed since then are stat'd again.
+        self.event_files = {}
+        # Find the unfinished jobs again.
+        self.scanned_jobs = {}
+        # Find every instance that is already done.
+        if not self.done_uids_loaded:
+            self.load_done_uids()
+
+    def load_done_uids(self):
+        """
+        Load the uids of every instance that is done from the test table.
+        """
+        with self.metrics.time('select'), self.connector.checkout() as db:
+            cursor = db.cursor()
+            cursor.execute(self.statements.select_done_uids)
+            self.done_uids.update(row[0] for row in cursor.fetchall())
+        self.done_uids_loaded = True
+        if self.verbose:
+            print("Found " + str(len(self.done_uids)) + " done instances.")
+
+    def find_unfinished_jobs(self):
+        """
+        Remember the jobs of the instances that were checked in this update and are still not done.
+        """
+        self.unfinished_jobs = {job_id for harness_uid, job_id in self.scanned_jobs.items()
+                                if harness_uid not in self.done_uids}
+
+    def wants_update(self, transition):
+        """
+        Test whether a job transition means that the next update may mark an instance done. This is true when a job of
+        an instance that was not done finishes or leaves LSF.
+
+        :param transition: A JobTransition from the job transition feed.
+        :return: Whether an update should be run soon.
+        """
+        return transition.finished and transition.job_id in self.unfinished_jobs
+
+    def take_job_snapshot(self):
+        """
+        Get all jobs from LSF and index them by job id. Nothing is taken if LSF is being replaced for testing.
+        """
+        if self.lsf_exit_function is not None and self.in_queue_function is not None:
+            return
+
+        with self.metrics.time('lsf'):
+            self.job_snapshot = get_job_snapshot()
 
     def get_test_dirs_from_rgt(self):
         """
@@ -140,111 +437,367 @@ class UpdateDatabase:
         entering any actual test instance.
         :param harness_tld: Path in rgt input.
         """
+        test_scan = self.scan_test_directory(test_path)
+        if test_scan is not None:
+            self.write_test_scan(test_scan, harness_tld)
+
+    def update_test_directories(self, test_directories, harness_tld):
+        """
+        Add or update all uids for each test. When there are multiple scan workers, the test directories are read by
+        a pool of threads while the results are written to the database one directory at a time in the order they
+        were given.
+
+        :param test_directories: The paths to each test ending in /Status/.
+        :param harness_tld: Path in rgt input.
+        """
+        if self.scan_workers <= 1:
+            for test_dir in test_directories:
+                self.update_test_instances(test_dir, harness_tld)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+            # The scans that have been started but not yet written.
+            test_scans = deque()
+            for test_dir in test_directories:
+                # If too many scans are waiting, write the oldest before starting another.
+                if len(test_scans) >= self.scan_queue_size:
+                    self.write_scan_result(test_scans.popleft(), harness_tld)
+                test_scans.append(executor.submit(self.scan_test_directory, test_dir))
+
+            # Write the rest.
+            while len(test_scans) != 0:
+                self.write_scan_result(test_scans.popleft(), harness_tld)
+
+    def write_scan_result(self, future, harness_tld):
+        """
+        Wait for a scan to finish and write it.
+
+        :param future: The future holding the TestScan.
+        :param harness_tld: Path in rgt input.
+        """
+        test_scan = future.result()
+        if test_scan is not None:
+            self.write_test_scan(test_scan, harness_tld)
+
+    def scan_test_directory(self, test_path):
+        """
+        Read everything needed to update some test without writing anything to the database. This can be run for
+        multiple tests at once.
+
+        :param test_path: Path to test ending in /Status/.
+        :return: A TestScan for the test or None if the test does not need to be updated.
+        """
         if not os.path.exists(test_path):
             warnings.warn("Could not find path to this test.\n" + test_path)
-            return
+            return None
 
-        # Create the path.
-        self.rgt_status_path = os.path.join(test_path, 'rgt_status.txt')
-        # Create the parser.
-        rgt_parser = parse_file.ParseRGTStatus()
-        # Get the dictionaries for each line in the status file.
-        rgt_status_lines = rgt_parser.parse_file(self.rgt_status_path)
+        # Skip the test if nothing in it has changed and every instance was already done. The instance directories of
+        # finished tests are only checked for changes every so often.
+        if self.change_detector.test_resting(test_path):
+            self.change_detector.count_skipped()
+            return None
+        with self.metrics.time('list_directories'):
+            fingerprints = self.change_detector.test_fingerprints(test_path)
+        if self.change_detector.test_unchanged(test_path, fingerprints):
+            self.change_detector.count_skipped()
+            return None
+        self.change_detector.count_visited()
+
+        test_scan = TestScan(test_path, fingerprints)
+        # Get the records for each line that was added to the status file since the last update.
+        with self.metrics.time('parse_files'):
+            new_lines, full = self.rgt_status_reader.parse_new_lines(test_scan.rgt_status_path)
+
+        # If the whole file was read, every line is checked again.
+        if full or test_path not in self.pending_lines:
+            self.pending_lines[test_path] = {}
+        pending_lines = self.pending_lines[test_path]
+        # Newer lines replace older lines for the same instance. Instances that are done are left out.
+        for rgt_status_line in new_lines:
+            if rgt_status_line.harness_uid not in self.done_uids:
+                pending_lines[rgt_status_line.harness_uid] = rgt_status_line
+            else:
+                self.metrics.count('instances_skipped')
+        # Check the new lines and the lines of instances that were not done.
+        rgt_status_lines = list(pending_lines.values())
+        test_scan.instance_dirs = [os.path.join(test_path, rgt_status_line.harness_uid)
+                                   for rgt_status_line in rgt_status_lines]
+
+        # Get the id and done status of every instance of this test that is already in the table in one go.
+        job_tuples = self.get_job_tuples([rgt_status_line.harness_uid for rgt_status_line in rgt_status_lines])
 
-        # For each line in the file, add it to the table if it is new.
         for rgt_status_line in rgt_status_lines:
             # Get the uid for the test.
-            harness_uid = rgt_status_line['harness_uid']
+            harness_uid = rgt_status_line.harness_uid
+            job_tuple = job_tuples.get(harness_uid)
 
-            job_tuple = self.get_job_tuple(harness_uid)
+            # If it is done, it never needs to be checked again.
+            if job_tuple is not None and bool(job_tuple[1]):
+                self.done_uids.add(harness_uid)
+                del pending_lines[harness_uid]
+                self.metrics.count('instances_skipped')
+                continue
 
+            # Get the events of the instances that will be added or updated.
             path_to_instance = os.path.join(test_path, harness_uid)
-            # Test if test instance exists in database. The job tuple is none if there was no match.
-            if job_tuple is None:
-                # If it does not, add it.
-                self.add_test_instance(path_to_instance, rgt_status_line, harness_tld)
-            # If in table but not done, update.
-            elif not bool(job_tuple[1]):
-                test_id = job_tuple[0]
-                self.update_test_instance(test_id, path_to_instance, rgt_status_line)
+            event_paths, events_changed = self.get_instance_event_paths(path_to_instance)
+            test_scan.instances.append((rgt_status_line, job_tuple, event_paths, events_changed))
+            self.metrics.count('instances_visited')
+            if rgt_status_line.job_id is not None:
+                self.scanned_jobs[harness_uid] = rgt_status_line.job_id
 
-    def get_job_tuple(self, harness_uid):
+        return test_scan
+
+    def write_test_scan(self, test_scan, harness_tld):
         """
-        Get the test id and done status for some test instance.
+        Write the instances of some scanned test to the database.
 
-        :param harness_uid: The uid of the instance to search for.
-        :return: A tuple containing it's id and done status.
+        :param test_scan: The TestScan for the test.
+        :param harness_tld: Path in rgt input.
         """
-        # Connect to the database.
-        db = self.connector.connect()
-        cursor = db.cursor()
-        # Select the test_id and done status from the test table for this test instance..
-        sql = "SELECT test_id, done FROM {table} WHERE harness_uid = '{harness_uid}'"
-        sql = sql.format(table=self.test_table, harness_uid=harness_uid)
-        # Execute and close the connection.
-        cursor.execute(sql)
-        db.commit()
-        db.close()
-        # Get the result.
-        result = cursor.fetchone()
-        return result
+        self.rgt_status_path = test_scan.rgt_status_path
+
+        # Write the tests and events for the whole directory together in one transaction.
+        with self.directory_transaction(), self.deferred_flush():
+            for rgt_status_line, job_tuple, event_paths, events_changed in test_scan.instances:
+                path_to_instance = os.path.join(test_scan.test_path, rgt_status_line.harness_uid)
+                # Test if test instance exists in database. The job tuple is none if there was no match.
+                if job_tuple is None:
+                    # If it does not, add it.
+                    self.add_test_instance(path_to_instance, rgt_status_line, harness_tld, event_paths=event_paths)
+                # If in table but not done, update.
+                else:
+                    test_id = job_tuple[0]
+                    self.update_test_instance(test_id, path_to_instance, rgt_status_line,
+                                              event_paths=event_paths, events_changed=events_changed)
+
+        # Remember what the test looked like before it was read. If any instance was added or updated, it is
+        # checked again next time.
+        self.change_detector.record_test(test_scan.test_path, test_scan.fingerprints, test_scan.instance_dirs,
+                                         len(test_scan.instances) != 0)
+
+    @contextmanager
+    def directory_transaction(self):
+        """
+        Write everything in the block in a single transaction. It is committed when the block finishes and rolled back
+        if there is an exception. If a commit batch size is set, it is also committed whenever that many rows have
+        been written. Only the thread that writes to the database can use this.
+        """
+        # Nested blocks are part of the outer transaction.
+        if self.transaction_db is not None:
+            yield
+            return
 
-    def update_test_instance(self, test_id, path_to_instance, rgt_status_line):
+        # Reload the reference tables before holding a connection for the whole directory.
+        self.reference_cache.refresh_if_stale()
+
+        with self.connector.checkout() as db:
+            self.transaction_db = db
+            self.rows_since_commit = 0
+            try:
+                yield
+                # Write anything still waiting before committing.
+                self.flush_test_table()
+                self.flush_event_table()
+                self.commit(db)
+            except Exception:
+                # The checkout rolls the transaction back.
+                self.uncommitted_blobs = []
+                self.uncommitted_done = []
+                self.forget_event_dirs(self.uncommitted_event_dirs)
+                self.uncommitted_event_dirs = set()
+                raise
+            finally:
+                self.transaction_db = None
+
+    @contextmanager
+    def write_connection(self):
+        """
+        Get the connection to write with. Inside a directory transaction, this is the connection of the transaction
+        and a savepoint is set so that a failed write can be undone with undo_write without losing the rest of the
+        transaction. Otherwise a connection is checked out and committed when the block finishes.
+        """
+        if self.transaction_db is None:
+            with self.connector.checkout() as db:
+                yield db
+        else:
+            self.transaction_db.cursor().execute("SAVEPOINT write_unit")
+            yield self.transaction_db
+
+    def undo_write(self, db):
+        """
+        Undo everything written since the last call to write_connection.
+
+        :param db: The connection that was written with.
+        """
+        if self.transaction_db is None:
+            db.rollback()
+        else:
+            db.cursor().execute("ROLLBACK TO SAVEPOINT write_unit")
+
+    def wrote_rows(self, row_count, blob_hashes, done_uids=()):
+        """
+        Record that some rows were written. If a commit batch size is set and enough rows were written in the open
+        transaction, it is committed.
+
+        :param row_count: The number of rows written.
+        :param blob_hashes: The hashes of the output blobs that the rows reference.
+        :param done_uids: The uids of the instances that the rows marked done.
+        """
+        if self.transaction_db is None:
+            # The write was committed when its connection was returned.
+            self.known_blobs.update(blob_hashes)
+            self.done_uids.update(done_uids)
+            return
+
+        self.uncommitted_blobs += blob_hashes
+        self.uncommitted_done += done_uids
+        self.rows_since_commit += row_count
+        if 0 < self.commit_batch_size <= self.rows_since_commit:
+            self.commit(self.transaction_db)
+
+    def commit(self, db):
+        """
+        Commit the open transaction.
+
+        :param db: The connection of the transaction.
+        """
+        with self.metrics.time('write'):
+            db.commit()
+        self.known_blobs.update(self.uncommitted_blobs)
+        self.uncommitted_blobs = []
+        self.done_uids.update(self.uncommitted_done)
+        self.uncommitted_done = []
+        self.uncommitted_event_dirs = set()
+        self.rows_since_commit = 0
+
+    def get_job_tuples(self, harness_uids):
+        """
+        Get the test id and done status for many test instances at once.
+
+        :param harness_uids: The uids of the instances to search for.
+        :return: A dictionary with the uid as key and a tuple containing it's id and done status as value.
+                 Instances that are not in the table are left out.
+        """
+        # Remove duplicates so that each uid is only searched for once.
+        harness_uids = list(dict.fromkeys(harness_uids))
+
+        job_tuples = {}
+        if len(harness_uids) == 0:
+            return job_tuples
+
+        with self.metrics.time('select'), self.connector.checkout() as db:
+            cursor = db.cursor()
+            # Search in chunks so that the query does not get too large for the server.
+            for i in range(0, len(harness_uids), self.select_chunk_size):
+                chunk = harness_uids[i:i + self.select_chunk_size]
+                sql = "SELECT harness_uid, test_id, done, {hashes} FROM {table} WHERE harness_uid IN ({uids})"
+                sql = sql.format(table=self.test_table, uids=", ".join(["%s"] * len(chunk)),
+                                 hashes=", ".join(['output_' + output_type + '_hash'
+                                                   for output_type in self.possible_outputs]))
+                cursor.execute(sql, chunk)
+                for row in cursor.fetchall():
+                    harness_uid, test_id, done = row[:3]
+                    job_tuples[harness_uid] = (test_id, done)
+                    # Remember the stored outputs so they are only sent again if they change.
+                    self.output_hashes[test_id] = dict(zip(self.possible_outputs, row[3:]))
+
+        return job_tuples
+
+    def update_test_instance(self, test_id, path_to_instance, rgt_status_line, event_paths=None,
+                             events_changed=True):
         """
         Update a certain job entry.
 
         :param test_id: The id of the test in the database.
         :param path_to_instance: The path to where the test is stored.
         :param rgt_status_line: The line from the rgt_status file that corresponds to this test.
+        :param event_paths: The paths to the events of this instance if they were already found.
+        :param events_changed: Whether the events may have changed since they were last written.
         :return:
         """
         # Get the paths to all events for this instance.
-        event_paths = self.get_event_paths(path_to_instance)
-        # Update the test event table with all of these events.
-        self.update_test_event_table(event_paths, test_id)
+        if event_paths is None:
+            event_paths, events_changed = self.get_instance_event_paths(path_to_instance)
+        # Update the test event table with all of these events. If the directory has not changed since the events
+        # were last written, there is nothing new to write.
+        if events_changed:
+            self.update_test_event_table(event_paths, test_id)
 
         # If there is at least one event, get the path to where outputs are stored.
         if len(event_paths) != 0:
             event_path = event_paths[0]
 
-            parser = parse_file.ParseEvent()
-            parsed_event = parser.parse_file(event_path)
-            output_path = parsed_event['run_archive']
-            build_output_path = parsed_event['build_directory']
+            parsed_event = self.parse_event(event_path)
+            output_path = parsed_event.run_archive
+            build_output_path = parsed_event.build_directory
         else:
             output_path = None
             build_output_path = None
         # Insert new information into the main table.
         self.update_test_table(test_id, output_path, build_output_path, rgt_status_line)
 
-    def add_test_instance(self, path_to_instance, rgt_status_line, harness_tld):
+    def add_test_instance(self, path_to_instance, rgt_status_line, harness_tld, event_paths=None):
         """
         Add a test instance to the test table.
 
         :param path_to_instance: The path to where this instances events are stored.
         :param rgt_status_line: The line in the rgt status file that has already been parsed.
         :param harness_tld: The path in the rgt input.
+        :param event_paths: The paths to the events of this instance if they were already found.
         """
         # Get all event paths for this instance.
-        event_paths = self.get_event_paths(path_to_instance)
+        if event_paths is None:
+            event_paths, _ = self.get_instance_event_paths(path_to_instance)
         # If there are no events for this test, we do not have enough information to add it.
         if len(event_paths) == 0:
             warnings.warn("I can't find any events for this path and thus I do not have enough information to add\n" +
                           "this test.")
             return
 
-        # Add the instance to the test table.
+        # Add the instance to the test table. If it could not be added, its events can not be either.
         event_path = event_paths[0]
-        self.add_to_test_table(event_paths[0], rgt_status_line, harness_tld)
+        if not self.add_to_test_table(event_paths[0], rgt_status_line, harness_tld):
+            return
 
         # Parse the first event and get the uid and test_id.
-        parser = parse_file.ParseEvent()
-        parsed_event = parser.parse_file(event_path)
-        harness_uid = parsed_event['test_id']
+        parsed_event = self.parse_event(event_path)
+        harness_uid = parsed_event.test_id
         test_id = self.get_test_id(harness_uid)
         # Update the test event table with all the events for this instance so far.
         self.update_test_event_table(event_paths, test_id)
 
+    def parse_event(self, event_path):
+        """
+        Parse an event file. Events that were already parsed and have not changed are taken from the event cache. The
+        stat taken when the event was found is used if there is one.
+
+        :param event_path: The path to the event file.
+        :return: A dictionary containing the variables of the event.
+        """
+        event_file = self.event_files.get(event_path)
+        stat = None if event_file is None else event_file.stat
+        return self.event_cache.parse_file(event_path, stat)
+
+    def get_instance_event_paths(self, test_instance_status_path):
+        """
+        Get the paths to all events for some test instance. The directory is only listed again if it has changed
+        since the last time it was listed.
+
+        :param test_instance_status_path: The path to where the test instance is stored.
+        :return: A list containing the paths to all events for that test and whether the directory was listed.
+        """
+        with self.metrics.time('list_directories'):
+            event_paths, current = self.change_detector.get_instance(test_instance_status_path)
+        if event_paths is not None:
+            self.change_detector.count_skipped()
+            return event_paths, False
+
+        self.change_detector.count_visited()
+        event_paths = self.get_event_paths(test_instance_status_path)
+        self.change_detector.record_instance(test_instance_status_path, current, event_paths)
+        return event_paths, True
+
     def get_event_paths(self, test_instance_status_path):
         """
         Get the paths to all events for some test instance.
@@ -252,24 +805,36 @@ class UpdateDatabase:
         :param test_instance_status_path: The path to where the test instance is stored.
         :return: A list containing the paths to all events for that test.
         """
+        return [event_file.path for event_file in self.get_event_files(test_instance_status_path)]
+
+    def get_event_files(self, test_instance_status_path):
+        """
+        Get all events for some test instance. Each one is remembered in event_files by its path.
+
+        :param test_instance_status_path: The path to where the test instance is stored.
+        :return: A list containing an EventFile for each event of that test.
+        """
         if self.verbose:
             print("Getting events in " + str(test_instance_status_path) + ".")
         # Setup a list for holding the events.
         events = []
-        # Get all immediate subfiles.
-        for file in os.listdir(test_instance_status_path):
-            # Filter to only get Events.
-            if 'Event_' in file:
+        # Get all immediate subfiles along with their stats.
+        with self.metrics.time('list_directories'), os.scandir(test_instance_status_path) as entries:
+            for entry in entries:
+                # Filter to only get Events.
+                if not entry.name.startswith('Event_'):
+                    continue
                 # Check that the event is one that we are prepared to handle.
-                for possible_event in self.event_types:
-                    if str(possible_event) in file:
-                        events.append(os.path.join(test_instance_status_path, file))
-                        break
+                event_uid = event_uid_from_filename(entry.name)
+                if self.known_event_uid(event_uid):
+                    event_file = EventFile(entry.path, event_uid, entry.stat())
+                    self.event_files[entry.path] = event_file
+                    events.append(event_file)
                 # If it is not, give a warning that we are skipping it.
                 else:
                     warnings.warn("I don't understand this event file. It is a code that I am not prepared to handle.\n"
-                                  + os.path.join(test_instance_status_path, file))
-        # Return file paths.
+                                  + entry.path)
+        # Return the events.
         return events
 
     def update_test_event_table(self, event_paths, test_id):
@@ -288,12 +853,13 @@ class UpdateDatabase:
             else:
                 print("Found " + str(len(sorted_event_paths)) + " events."
                       " The paths are " + str(sorted_event_paths) + ".")
-        # If there are events, start updating.
+        # If there are events, start updating. They are all written at once at the end.
         if len(sorted_event_paths) != 0:
-            # For each event, insert it into the event table connected to the correct event.
-            for j in range(len(sorted_event_paths)):
-                event_path = sorted_event_paths[j]
-                self.insert_into_event_table(test_id, event_path)
+            with self.deferred_flush():
+                # For each event, insert it into the event table connected to the correct event.
+                for j in range(len(sorted_event_paths)):
+                    event_path = sorted_event_paths[j]
+                    self.insert_into_event_table(test_id, event_path)
 
     def insert_into_event_table(self, test_id, event_path):
         """
@@ -303,10 +869,8 @@ class UpdateDatabase:
         :param event_path: The path to the event file.
         :return:
         """
-        # Parse the important info from the event file.
-        parser = parse_file.ParseEvent()
         # Get the dictionary for the event.
-        event_dic = parser.parse_file(event_path)
+        event_dic = self.parse_event(event_path)
         # Get the events uid.
         event_uid = self.get_event_uid(event_dic)
 
@@ -316,56 +880,134 @@ class UpdateDatabase:
 
         # Get the id of the event from the 'rgt_event' table.
         event_id = self.get_event_id(event_uid)
+        if event_id is None:
+            warnings.warn("Could not find the event " + str(event_uid) + " in the event table. " + event_path)
+            return
 
-        # If it does not already exist in the table, put it in.
-        if not self.in_event_table(test_id, event_id):
-            # Get time when event occured.
-            event_time = event_dic['event_time'].replace('T', ' ')
-
-            # Enter it into the 'rgt_test_event' table.
-            self.insert_parsed_event_into_event_table(test_id, event_id, event_time)
+        # Get time when event occured.
+        event_time = event_dic.event_time
 
-    def in_event_table(self, test_id, event_id):
-        """
-        Test if some event already exists in the table.
-
-        :param test_id: The id that this event is connected to.
-        :param event_id: The id of the event to check. Each event_id only happens once.
-        :return: Whether the event already existed.
-        """
-        db = self.connector.connect()
-        # Create a cursor for executing on the database.
-        cursor = db.cursor()
-        # Test if the test, event combo exists in the table.
-        sql = "SELECT EXISTS(SELECT 1 FROM {table} WHERE test_id = {test_id} AND event_id = {event_id})"\
-              .format(table=self.test_event_table, test_id=test_id, event_id=event_id)
-
-        # Execute the command.
-        cursor.execute(sql)
-        db.commit()
-        db.close()
-        # Return whether or not it was in the table.
-        in_table = bool(cursor.fetchone()[0])
-        return in_table
+        # Enter it into the 'rgt_test_event' table. Events that are already in the table are ignored when written.
+        self.event_dirs.add(os.path.dirname(event_path))
+        self.insert_parsed_event_into_event_table(test_id, event_id, event_time)
 
     def insert_parsed_event_into_event_table(self, test_id, event_id, event_time):
         """
-        Insert an event file after splitting into the relevant information.
+        Insert an event file after splitting into the relevant information. If events are being held off, the event
+        is written with the rest of the batch.
 
         :param test_id: The id of the test that this event is for.
         :param event_id: The id of the event.
         :param event_time: When the event occurred.
         :return:
         """
-        db = self.connector.connect()
-        # Insert the necessary info into the table.
-        sql = "INSERT INTO {table} (test_id, event_id, event_time) " \
-              "VALUES ({test_id}, {event_id}, '{event_time}')" \
-            .format(table=self.test_event_table, test_id=test_id, event_id=event_id, event_time=event_time)
+        self.event_rows.append((test_id, event_id, event_time))
 
-        execute_sql(sql, db)
+        if self.flush_depth == 0 or 0 < self.commit_batch_size <= len(self.event_rows):
+            self.flush_event_table()
 
-        db.close()
+    @contextmanager
+    def deferred_flush(self):
+        """
+        Hold off writing updated tests and events until the outermost block finishes. Then write all of the tests
+        followed by all of the events at once.
+        """
+        self.flush_depth += 1
+        try:
+            yield
+        finally:
+            self.flush_depth -= 1
+            if self.flush_depth == 0:
+                self.flush_test_table()
+                self.flush_event_table()
+
+    def flush_test_table(self):
+        """
+        Write all waiting test updates to the test table. Every row uses the same statement, but pymysql still sends
+        each update on its own.
+
+        :return: The number of tests that were written.
+        """
+        if len(self.test_rows) == 0:
+            return 0
+
+        # Take the waiting rows so that new ones can be added while writing.
+        rows = self.test_rows
+        self.test_rows = []
+
+        # The instances that will be done once the rows are written.
+        done_uids = [self.finishing_uids.pop(test_id) for test_id, _ in rows if test_id in self.finishing_uids]
+
+        with self.metrics.time('write'), self.write_connection() as db:
+            params = []
+            blob_hashes = []
+            for test_id, update_fields in rows:
+                # Move the outputs to the blob table.
+                update_fields, hashes = self.store_output_blobs(update_fields, db, test_id=test_id)
+                blob_hashes += hashes
+                params.append(self.statements.update_test_params(update_fields, test_id))
+            updated = execute_many(self.statements.update_test, params, db, self.failed_statements)
+            # Do not keep the blob references if the tests were not written.
+            if not updated:
+                self.undo_write(db)
+                return 0
+        self.wrote_rows(len(rows), blob_hashes, done_uids)
+        self.metrics.count('instances_written', len(rows))
+
+        if self.verbose:
+            print("Updated " + str(len(rows)) + " tests.")
+
+        return len(rows)
+
+    def flush_event_table(self):
+        """
+        Write all waiting events to the test event table with a single multi-row insert. Events that are already in
+        the table are ignored.
+
+        :return: The number of events that were new.
+        """
+        if len(self.event_rows) == 0:
+            return 0
+
+        # Take the waiting rows so that new ones can be added while writing.
+        rows = self.event_rows
+        self.event_rows = []
+        event_dirs = self.event_dirs
+        self.event_dirs = set()
+
+        sql = self.statements.insert_test_event
+
+        with self.metrics.time('write'), self.write_connection() as db:
+            cursor = db.cursor()
+            try:
+                # pymysql turns this into a single insert with every row.
+                inserted = cursor.executemany(sql, rows)
+            except Exception as e:
+                # Keep a record of what failed and throw a nice warning.
+                self.failed_statements.append(FailedStatement(sql, rows, str(e)))
+                warnings.warn(str(e) + '\n' + repr(sql) + '\n' + repr(rows))
+                self.undo_write(db)
+                self.forget_event_dirs(event_dirs)
+                return 0
+        if self.transaction_db is not None:
+            self.uncommitted_event_dirs |= event_dirs
+        self.wrote_rows(len(rows), [])
+
+        self.events_inserted += inserted
+        if self.verbose:
+            print("Inserted " + str(inserted) + " of " + str(len(rows)) + " events.")
+
+        return inserted
+
+    def forget_event_dirs(self, event_dirs):
+        """
+        Forget the listings of instance directories whose events were not written so that they are listed and their
+        events are written again next time.
+
+        :param event_dirs: The paths to the instance directories.
+        """
+        for event_dir in event_dirs:
+            self.change_detector.forget_instance(event_dir)
 
     def add_to_test_table(self, event_path, rgt_status_line, harness_tld):
         """
@@ -375,90 +1017,59 @@ class UpdateDatabase:
         is stored in the rgt_status file.
         :param rgt_status_line: The parsed line in the rgt status file for this test.
         :param harness_tld: The path to where this tests events are stored.
+        :return: Whether the test was added.
         """
-        # Create parser for parsing event file.
-        parser = parse_file.ParseEvent()
         # Get dictionary for the event.
-        event_dic = parser.parse_file(event_path)
+        event_dic = self.parse_event(event_path)
         # Get some fields to update that change based on time.
-        update_fields = self.get_update_fields(rgt_status_line, event_dic['run_archive'], event_dic['build_directory'])
+        update_fields = self.get_update_fields(rgt_status_line, event_dic.run_archive, event_dic.build_directory)
         # Get fields to update that are constant once the instance has been created.
         add_fields = self.get_add_fields(rgt_status_line, event_dic, harness_tld)
 
         # Concatenate the add fields and the update fields.
         all_fields = {**add_fields, **update_fields}
 
-        # Get the sql code for inserting the values into the table.
-        sql = self.get_add_sql(all_fields)
-        db = self.connector.connect()
-
-        execute_sql(sql, db)
-
-        db.close()
-
-    def get_add_sql(self, add_fields):
-        """
-        Get the sql needed to add a test to the test table.
-
-        :param add_fields: The field, value combinations for the test. This is a dictionary.
-        :return: The necessary sql.
-        """
-        # Insert into table.
-        sql = "INSERT INTO " + str(self.test_table) + " ("
-        # Get the keys set.
-        key_list = list(add_fields.keys())
-        # Variable for holding values.
-        vals = ""
-        # For each key, add the text 'key = value, ' so that each field is updated correctly.
-        for i in range(len(key_list)):
-            # Get the field being updated.
-            field = key_list[i]
-            val = add_fields[field]
-            # Change how the value should look in the sql depending on it's type.
-            if type(val) is str:
-                value = self.connector.connect().escape(val)
-            elif type(val) is int:
-                value = str(val)
-            elif type(val) is bool:
-                value = str(val).upper()
-            # Add the necessary text.
-            sql += field
-            vals += value
-            # If this is not the last key, add a comma.
-            if i < len(key_list) - 1:
-                sql += ", "
-                vals += ", "
-
-        # Finish off the command.
-        sql += ") VALUES (" + vals + ")"
-
-        if self.verbose:
-            print("Adding: " + sql)
-
-        return sql
+        with self.metrics.time('write'), self.write_connection() as db:
+            # Move the outputs to the blob table.
+            all_fields, blob_hashes = self.store_output_blobs(all_fields, db)
+            # Add the test. If it was added by something else in the meantime, it is updated instead.
+            if self.verbose:
+                print("Adding: " + str(all_fields))
+            added = execute_many(self.statements.upsert_test, [self.statements.upsert_test_params(all_fields)], db,
+                                 self.failed_statements)
+            # Do not keep the blob references if the test was not written.
+            if not added:
+                self.undo_write(db)
+        if added:
+            self.wrote_rows(1, blob_hashes, [all_fields['harness_uid']] if all_fields.get('done') else [])
+            self.metrics.count('instances_written')
+        return added
 
     def get_add_fields(self, rgt_status_line, event_dic, harness_tld):
         """
         Get the fields needed for adding a test.
 
-        :param rgt_status_line: The parsed rgt status line for the test.
-        :param event_dic: A parsed event.
+        :param rgt_status_line: The RgtStatusRecord or a dictionary for the rgt status line of the test.
+        :param event_dic: The EventRecord or a dictionary for a parsed event.
         :param harness_tld: The path to where the events for the test are stored.
         :return: A dictionary containing the field, value combinations for adding the test.
         """
+        rgt_status_line = parse_file.RgtStatusRecord.coerce(rgt_status_line)
+        event_dic = parse_file.EventRecord.coerce(event_dic)
+
         # Initialize an empty dictionary.
         add_fields = {}
 
         # Add the field, value pairs to the dictionary.
-        add_fields['harness_uid'] = rgt_status_line['harness_uid']
-        add_fields['harness_start'] = rgt_status_line['harness_start']
+        add_fields['harness_uid'] = rgt_status_line.harness_uid
+        add_fields['harness_start'] = rgt_status_line.harness_start
         add_fields['harness_tld'] = harness_tld
-        add_fields['application'] = event_dic['app']
-        add_fields['testname'] = event_dic['test']
-        add_fields['system'] = event_dic['rgt_system_log_tag']
+        add_fields['application'] = event_dic.app
+        add_fields['testname'] = event_dic.test
+        add_fields['system'] = event_dic.rgt_system_log_tag
 
         # TODO: Change this to actually put in the correct 'previous_job_id'.
-        add_fields['previous_job_id'] = rgt_status_line['harness_uid']
+        add_fields['previous_job_id'] = rgt_status_line.harness_uid
 
         return add_fields
 
@@ -473,63 +1084,109 @@ class UpdateDatabase:
         :return:
         """
         # Get field, value combinations to update.
-        update_fields = self.get_update_fields(rgt_status_line, output_path, build_output_path)
-
-        # Get the necessary sql for updating the database.
-        sql = self.get_update_sql(update_fields, test_id)
-        db = self.connector.connect()
-
-        execute_sql(sql, db)
-
-        db.close()
-
-    def get_update_sql(self, update_fields, test_id):
-        """
-        Get the sql for updating the database with some fields.
-
-        :param update_fields: A dictionary containing the field to update as key and the value to change it to.
-        :param test_id: The id of the test that this update is for.
-        :return: The sql code to run on the database.
-        """
-        # Update some file.
-        sql = "UPDATE " + self.test_table + " SET "
-        # Get the keys set.
-        key_list = list(update_fields.keys())
-        # For each key, add the text 'key = value, ' so that each field is updated correctly.
-        for i in range(len(key_list)):
-            # Get the field being updated.
-            field = key_list[i]
-            val = update_fields[field]
-            if type(val) is str:
-                value = self.connector.connect().escape(val)
-            elif type(val) is int:
-                value = str(val)
-            elif type(val) is bool:
-                value = str(val).upper()
-            # Add the necessary text.
-            sql += field + " = " + value
-            # If this is not the last key, add a comma.
-            if i < len(key_list) - 1:
-                sql += ","
-            # Put a space in.
-            sql += " "
-
-        # Finish off the command so the correct test is updated. This only needs to be done for one test and there
-        # should only be one test so this speeds it up so it doesn't have to check for more.
-        sql += "WHERE test_id = " + str(test_id) + " LIMIT 1"
-
+        update_fields = self.get_update_fields(rgt_status_line, output_path, build_output_path, test_id=test_id)
         if self.verbose:
-            print("Updating: " + sql)
+            print("Updating " + str(test_id) + ": " + str(update_fields))
+
+        # Remember which instance this is if the update marks it done.
+        if update_fields.get('done'):
+            self.finishing_uids[test_id] = parse_file.RgtStatusRecord.coerce(rgt_status_line).harness_uid
 
-        return sql
+        # Wait to write the update with the rest of the directory if writes are being held off.
+        self.test_rows.append((test_id, update_fields))
+        if self.flush_depth == 0 or 0 < self.commit_batch_size <= len(self.test_rows):
+            self.flush_test_table()
 
-    def get_update_fields(self, rgt_status_line, output_path, build_output_path):
+    def store_output_blobs(self, fields, db, test_id=None):
+        """
+        Store the outputs in some fields in the output blob table and replace them with references by hash. The body
+        of a blob is only sent if it is not already in the table. The reference count of each new blob is increased and
+        the count of the blob it replaced is decreased. This is done on the connection that writes the test so that
+        they are committed together.
+
+        :param fields: The fields that will be written to the test table.
+        :param db: The connection that the test will be written with.
+        :param test_id: The id of the test if it is already in the test table.
+        :return: A tuple containing the fields to write to the test table and the hashes of the blobs referenced.
+        """
+        if self.output_blob_table is None:
+            return fields, []
+
+        fields = dict(fields)
+        # The outputs by hash and the hashes that are gaining or losing a reference.
+        blobs = {}
+        new_references = []
+        old_references = []
+        stored_hashes = self.output_hashes.get(test_id, {}) if test_id is not None else {}
+        for output_type in self.possible_outputs:
+            key = 'output_' + output_type
+            if fields.get(key) is None:
+                continue
+            output_hash = fields[key + '_hash']
+            blobs[output_hash] = fields[key].encode('utf-8')
+            new_references.append(output_hash)
+            if stored_hashes.get(output_type) is not None:
+                old_references.append(stored_hashes[output_type])
+            # The test only keeps the hash.
+            fields[key] = None
+            fields[key + '_compressed'] = False
+
+        if len(new_references) == 0:
+            return fields, []
+
+        cursor = db.cursor()
+        # Store the blobs that are not known to exist and are not already in the table.
+        unknown = [output_hash for output_hash in blobs if output_hash not in self.known_blobs]
+        self.insert_missing_blobs(cursor, blobs, unknown)
+
+        # Count the references.
+        sql = "UPDATE {table} SET refcount = refcount + 1 WHERE output_hash = %s"
+        counted = cursor.executemany(sql.format(table=self.output_blob_table), new_references)
+        if counted < len(new_references):
+            # Some blobs that were known to exist have been collected since. Store them again and count them.
+            known = [output_hash for output_hash in blobs if output_hash in self.known_blobs]
+            self.known_blobs.difference_update(known)
+            self.insert_missing_blobs(cursor, blobs, known, new_references)
+        if len(old_references) != 0:
+            sql = "UPDATE {table} SET refcount = refcount - 1 WHERE output_hash = %s AND refcount > 0"
+            cursor.executemany(sql.format(table=self.output_blob_table), old_references)
+
+        return fields, list(blobs.keys())
+
+    def insert_missing_blobs(self, cursor, blobs, output_hashes, references=()):
+        """
+        Store the blobs that are not already in the output blob table. The blobs that are found are locked until the
+        transaction is done so that they can not be collected before they are referenced.
+
+        :param cursor: The cursor of the connection that the test will be written with.
+        :param blobs: A dictionary from the hash of each output to its bytes.
+        :param output_hashes: The hashes of the blobs to look for.
+        :param references: The references to each blob that are counted in the blobs that are stored. They are stored
+        without any otherwise.
+        """
+        if len(output_hashes) == 0:
+            return
+        sql = "SELECT output_hash FROM {table} WHERE output_hash IN ({hashes}) LOCK IN SHARE MODE"
+        sql = sql.format(table=self.output_blob_table, hashes=", ".join(["%s"] * len(output_hashes)))
+        cursor.execute(sql, output_hashes)
+        existing = {row[0] for row in cursor.fetchall()}
+        # Only send the bodies of blobs that are not stored yet.
+        rows = [(output_hash, output_store.compress_blob(blobs[output_hash]), len(blobs[output_hash]),
+                 references.count(output_hash))
+                for output_hash in output_hashes if output_hash not in existing]
+        if len(rows) != 0:
+            sql = "INSERT IGNORE INTO {table} (output_hash, body, size, refcount) VALUES (%s, %s, %s, %s)"
+            cursor.executemany(sql.format(table=self.output_blob_table), rows)
+
+    def get_update_fields(self, rgt_status_line, output_path, build_output_path, test_id=None):
         """
         Get the new values for each field.
 
-        :param rgt_status_line: The line of the rgt_status file that will be used.
+        :param rgt_status_line: The RgtStatusRecord or a dictionary for the line of the rgt_status file to use.
         :param output_path: The path to where the outputs exist.
         :param build_output_path: The path to where the build output exists.
+        :param test_id: The id of the test if it is already in the test table. Outputs that have not changed since
+        they were stored for this test are left out.
         :return: A dictionary containing the fields and values that need to be updated.
         """
         # If the length of the line and the number of fields we know how to parse are not equal, we may try to insert
@@ -539,9 +1196,10 @@ class UpdateDatabase:
                           + " fields but I got " + str(len(rgt_status_line)) + " fields. I will ignore this line.\n"
                           + str(rgt_status_line))
             return {}
+        rgt_status_line = parse_file.RgtStatusRecord.coerce(rgt_status_line)
 
         # LSF job id.
-        job_id = rgt_status_line['job_id']
+        job_id = rgt_status_line.job_id
         # Check LSF.
         lsf_exit_status = self.get_exit_status(job_id)
 
@@ -549,19 +1207,19 @@ class UpdateDatabase:
         update_fields = {}
         # The first and second index of the stat_line contain the start time and unique id, neither of which are needed.
         # The rest contain job_id, build_status, submit_status, and check_status.
-        # Each of which are either ints or '***'. Depending on this we may or may not insert it.
+        # Each of which are either ints or None for '***'. Depending on this we may or may not insert it.
         for i in range(2, len(self.rgt_fields)):
             field = self.rgt_fields[i]
-            val = rgt_status_line[field]
+            val = rgt_status_line[i]
             # Test if it is an integer. If so, put it into a field to update.
-            if type(val) == int or val.isdigit():
+            if val is not None:
                 if field == 'check_status':
                     if self.legal_check_status(val):
-                        update_fields[field] = int(val)
+                        update_fields[field] = val
                     else:
                         warnings.warn('Skipping check status ' + str(val) + ' since it was not in the check table.' + self.rgt_status_path + '\n' + str(rgt_status_line))
                 else:
-                    update_fields[field] = int(val)
+                    update_fields[field] = val
 
         # Test if it has an exit status. If so, record it and the job is now done.
         if lsf_exit_status is not None:
@@ -578,6 +1236,9 @@ class UpdateDatabase:
         else:
             update_fields['done'] = False
 
+        # The hashes of the outputs already stored for this test.
+        stored_hashes = self.output_hashes.get(test_id, {}) if test_id is not None else {}
+
         if output_path is not None:
             # For each possible output field.
             for output_field in self.possible_outputs:
@@ -587,7 +1248,8 @@ class UpdateDatabase:
                     path = output_path
                 # Try to get the text from the file.
                 try:
-                    output_text = self.output_text(path, output_field)
+                    with self.metrics.time('read_outputs'):
+                        output_text = self.output_text(path, output_field)
                 # If the file does not exist, try to get the next file.
                 except FileNotFoundError:
                     warnings.warn("Did not find file associated with '" + output_field + "' in " + path + ".")
@@ -601,11 +1263,15 @@ class UpdateDatabase:
                     if (output_field + '_status') in update_fields.keys():
                         update_fields['done'] = False
                     continue
-                # If it does exist, add it as a field to update.
+                # If it does exist and has changed, add it as a field to update.
                 else:
                     if output_text is not None:
-                        key = 'output_' + output_field
-                        update_fields[key] = output_text
+                        output_data = output_text.encode('utf-8')
+                        self.metrics.count('bytes_read', len(output_data))
+                        if stored_hashes.get(output_field) != output_store.hash_output(output_data):
+                            # Outputs going to the blob table are compressed there instead.
+                            compress = self.compress_outputs and self.output_blob_table is None
+                            update_fields.update(output_store.output_fields(output_field, output_data, compress))
 
         return update_fields
 
@@ -616,15 +1282,7 @@ class UpdateDatabase:
         :param check_status: The status to match.
         :return: Whether it was in the table or not.
         """
-        sql = "SELECT EXISTS(SELECT 1 FROM {table} WHERE check_uid = {check_status})"\
-              .format(table=self.check_table, check_status=check_status)
-        db = self.connector.connect()
-        cursor = db.cursor()
-        cursor.execute(sql)
-        result = bool(cursor.fetchone()[0])
-        db.commit()
-        db.close()
-        return result
+        return self.reference_cache.legal_check_status(check_status)
 
     def output_text(self, output_path, output_type):
         """
@@ -654,6 +1312,8 @@ class UpdateDatabase:
         :return: Whether it exists.
         """
         # Test if it is not an int. If not, return.
+        if job_id is None:
+            return None
         if type(job_id) != int:
             if not job_id.isdigit():
                 return None
@@ -665,12 +1325,13 @@ class UpdateDatabase:
         if self.in_queue_function is not None:
             return self.in_queue_function(job_id)
 
-        # Get the exit status of the job.
-        JS = job_status.JobStatus()
-        if len(JS.get_jobs(job_id)) == 0:
-            return False
-        else:
-            return True
+        # If there is a snapshot of LSF, find the job in it.
+        if self.job_snapshot is not None:
+            return job_id in self.job_snapshot
+
+        # Find the job in the shared snapshot of LSF.
+        with self.metrics.time('lsf'):
+            return job_id in get_job_snapshot()
 
     def get_exit_status(self, job_id):
         """
@@ -681,6 +1342,8 @@ class UpdateDatabase:
         """
         # TODO: Need to somehow check the exit status if this is a job being built.
         # Test if it is not an int. If not, return.
+        if job_id is None:
+            return None
         if type(job_id) != int:
             if not job_id.isdigit():
                 return None
@@ -692,48 +1355,54 @@ class UpdateDatabase:
         if self.lsf_exit_function is not None:
             return self.lsf_exit_function(job_id)
 
-        # Get the exit status of the job.
-        JS = job_status.JobStatus()
-        return JS.get_job_exit_status(job_id)
+        # If there is a snapshot of LSF, find the job in it.
+        if self.job_snapshot is not None:
+            job = self.job_snapshot.get(job_id)
+            if job is None:
+                return None
+            return job.exit_status
+
+        # Find the job in the shared snapshot of LSF.
+        with self.metrics.time('lsf'):
+            job = get_job_snapshot().get(job_id)
+        if job is None:
+            return None
+        return job.exit_status
 
     def get_event_uid(self, event_dic):
         """
         Get the type of event that some event dictionary represents.
 
-        :param event_dic: a dictionary for the event.
+        :param event_dic: The EventRecord or a dictionary for the event.
         :return: The uid for the event.
         """
         # Get the file name of the event. This is not the full path, just the name of the file.
-        file_name = event_dic['event_filename']
+        file_name = parse_file.EventRecord.coerce(event_dic).event_filename
 
         # Find which event code is in the file name.
-        for possible_event in self.event_types:
-            if str(possible_event) in file_name:
-                return possible_event
-        else:
-            return None
+        event_uid = event_uid_from_filename(file_name)
+        if self.known_event_uid(event_uid):
+            return event_uid
+        return None
+
+    def known_event_uid(self, event_uid):
+        """
+        Test whether an event is one that we are prepared to handle. An event that is not known makes the reference
+        cache reload the event table once so that events added while running are picked up.
+
+        :param event_uid: The uid of the event or None.
+        :return: Whether the event is in the event table.
+        """
+        return event_uid is not None and self.reference_cache.get_event_id(event_uid) is not None
 
     def get_event_id(self, event_uid):
         """
         Get the id of the event from the rgt_event table based on the uid for the event.
 
         :param event_uid: The uid of the event.
-        :return: The id in the table for the event.
+        :return: The id in the table for the event. None if the event is not in the table.
         """
-        db = self.connector.connect()
-        # Create a cursor for execution of commands.
-        cursor = db.cursor()
-        # Select the event_id that corresponds to the event_uid.
-        sql = "SELECT event_id FROM {table} WHERE event_uid = {event_uid}"\
-              .format(table=self.event_table, event_uid=event_uid)
-
-        # Execute the command.
-        cursor.execute(sql)
-        db.commit()
-        # Fetch the response.
-        event_id = cursor.fetchone()
-        db.close()
-        return int(event_id[0])
+        return self.reference_cache.get_event_id(event_uid)
 
     def get_test_id(self, harness_uid):
         """
@@ -742,16 +1411,15 @@ class UpdateDatabase:
         :param harness_uid: The uid for the test.
         :return: The id for the test in the database.
         """
-        # Initialize a connection.
-        db = self.connector.connect()
-        cursor = db.cursor()
-        # Select the test id that matches with the uid.
-        sql = "SELECT test_id FROM {table} WHERE harness_uid = '{harness_uid}'"\
-              .format(table=self.test_table, harness_uid=harness_uid)
-
-        # Run the command and close the connection.
-        cursor.execute(sql)
-        db.commit()
-        harness_uid = cursor.fetchone()[0]
-        db.close()
-        return harness_uid
+        # Select the test id that matches with the uid. This uses the open transaction if there is one so that tests
+        # added in it are found.
+        if self.transaction_db is not None:
+            with self.metrics.time('select'):
+                cursor = self.transaction_db.cursor()
+                cursor.execute(self.statements.select_test_id, (harness_uid,))
+                return cursor.fetchone()[0]
+        with self.metrics.time('select'), self.connector.checkout() as db:
+            cursor = db.cursor()
+            cursor.execute(self.statements.select_test_id, (harness_uid,))
+            test_id = cursor.fetchone()[0]
+        return test_id
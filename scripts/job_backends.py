@@ -0,0 +1,270 @@
+"""
+This file holds the backends that JobStatus reads jobs from. The pythonlsf backend asks LSF. The replay backend serves
+snapshots of jobs from the output of `bjobs -u all -a` or from a generated population of jobs so that anything that
+reads LSF can be tested and benchmarked without LSF.
+
+Every backend has a read_jobs method that takes the same arguments as lsf.lsb_openjobinfo_a and yields a tuple for each
+job containing its id, user, name, status, exit status and queue. The status is one of Job.possible_status.
+"""
+import random
+import threading
+import time
+
+# The status of a job in bjobs and the status given to it by harmony. Pending jobs are all treated as eligible and
+# exited jobs as killed since bjobs does not say why.
+bjobs_statuses = {'RUN': 'Running',
+                  'DONE': 'Complete',
+                  'EXIT': 'Killed',
+                  'USUSP': 'Susp_person_dispatched',
+                  'PSUSP': 'Susp_person_pend',
+                  'SSUSP': 'Susp_system',
+                  'PEND': 'Eligible'}
+
+# The exit status given to finished jobs in bjobs since it does not show them. Jobs that exited are given a non-zero
+# status like the killed jobs of a generated population.
+bjobs_exit_statuses = {'DONE': 0,
+                       'EXIT': 1}
+
+
+class PythonLSFBackend:
+    """
+    Read jobs from LSF using pythonlsf.
+    """
+
+    def __init__(self, queue='batch'):
+        """
+        Connect to LSF. pythonlsf is only loaded once this backend is made.
+
+        :param queue: (str) queue that exists in lsf.
+        """
+        from scripts import connect
+        from pythonlsf import lsf
+        connect.connect(queue)
+        self.lsf = lsf
+
+    def read_jobs(self, jobid=0, jobName=None, user="all", queue=None, hostname=None):
+        """
+        Read the jobs in LSF or that have been recently completed that match certain parameters.
+
+        :param jobid: (int) jobid to match with. 0 matches every job.
+        :param jobName: (str) Name of job to match.
+        :param user: (str) User to match.
+        :param queue: (str) LSF queue to search.
+        :param hostname: (str) Hostname to search.
+        :return: A generator of tuples containing the id, user, name, status, exit status and queue of each job.
+        """
+        from scripts.job_status import Job
+        lsf = self.lsf
+        # Get a generator that will return a job whenever querried.
+        jobinfohead = lsf.lsb_openjobinfo_a(jobid, jobName, user, queue, hostname, lsf.ALL_JOB)
+
+        # If there are some jobs that exist under certain parameters then get the number of jobs.
+        if jobinfohead is not None:
+            num_jobs = jobinfohead.numJobs
+        # Otherwise there are no jobs.
+        else:
+            num_jobs = 0
+
+        try:
+            # Repeatedly call jobinfo for how many jobs are there.
+            for _ in range(num_jobs):
+                # Once job info is closed, lsf.lsb_readjobinfo does not work again.
+                # It is also a generator and can thus only be gone through once.
+                lsf_job = lsf.lsb_readjobinfo(None)
+                # This occurs if the job pops out of queue after getting the number of lsf jobs.
+                if lsf_job is None:
+                    continue
+                yield (lsf_job.jobId, lsf_job.user, lsf_job.jName, Job.get_status(lsf_job), int(lsf_job.exitStatus),
+                       lsf_job.submit.queue)
+        finally:
+            # All done with this job info.
+            lsf.lsb_closejobinfo()
+
+
+class ReplayBackend:
+    """
+    Serve jobs from a series of snapshots instead of LSF. Each snapshot is a list of job tuples like the ones from
+    read_jobs. Once the last snapshot is reached, it keeps being served.
+    """
+
+    def __init__(self, snapshots, interval=None, clock=time.time):
+        """
+        Constructor for the backend.
+
+        :param snapshots: A list or generator of snapshots.
+        :param interval: How many seconds each snapshot is served for. If None, the next snapshot is served for each
+        read.
+        :param clock: The function that gets the current time.
+        """
+        self.snapshots = iter(snapshots)
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+
+        # Snapshots are moved through by multiple threads.
+        self.lock = threading.Lock()
+        self.current = None
+        self.index = -1
+        self.reads = 0
+
+    @classmethod
+    def from_bjobs(cls, paths, **kwargs):
+        """
+        Make a backend that serves the jobs in files holding the output of `bjobs -u all -a`. Each file is a snapshot.
+
+        :param paths: The path to each file in order.
+        :param kwargs: Any arguments for the constructor.
+        :return: The ReplayBackend.
+        """
+        if type(paths) is str:
+            paths = [paths]
+        snapshots = []
+        for path in paths:
+            with open(path) as file:
+                snapshots.append(parse_bjobs(file.read()))
+        return cls(snapshots, **kwargs)
+
+    @classmethod
+    def synthetic(cls, size, churn=0.1, seed=None, **kwargs):
+        """
+        Make a backend that serves a generated population of jobs that changes with each snapshot.
+
+        :param size: How many jobs are in each snapshot.
+        :param churn: The fraction of jobs that move to their next status with each snapshot.
+        :param seed: The seed for choosing which jobs change so that the same jobs can be made again.
+        :param kwargs: Any arguments for the constructor.
+        :return: The ReplayBackend.
+        """
+        return cls(synthetic_snapshots(size, churn, seed), **kwargs)
+
+    def get_jobs(self):
+        """
+        Get the snapshot that should be served now.
+
+        :return: The list of job tuples.
+        """
+        with self.lock:
+            self.reads += 1
+            if self.interval is None:
+                target = self.index + 1
+            else:
+                target = int((self.clock() - self.started) / self.interval)
+            while self.index < target:
+                try:
+                    self.current = next(self.snapshots)
+                except StopIteration:
+                    break
+                self.index += 1
+            return self.current if self.current is not None else []
+
+    def read_jobs(self, jobid=0, jobName=None, user="all", queue=None, hostname=None):
+        """
+        Read the jobs in the current snapshot that match certain parameters. The hostname is not known for replayed
+        jobs so it is not used.
+
+        :param jobid: (int) jobid to match with. 0 matches every job.
+        :param jobName: (str) Name of job to match.
+        :param user: (str) User to match.
+        :param queue: (str) LSF queue to search.
+        :param hostname: (str) Hostname to search.
+        :return: A generator of tuples containing the id, user, name, status, exit status and queue of each job.
+        """
+        for job in self.get_jobs():
+            if jobid and job[0] != jobid:
+                continue
+            if jobName is not None and job[2] != jobName:
+                continue
+            if user != "all" and job[1] != user:
+                continue
+            if queue is not None and job[5] != queue:
+                continue
+            yield job
+
+
+def parse_bjobs(text):
+    """
+    Parse the output of `bjobs -u all -a`. The columns are found from the positions of the names in the first line.
+
+    :param text: (str) The output of bjobs.
+    :return: A list of job tuples.
+    """
+    lines = text.splitlines()
+    if len(lines) == 0:
+        return []
+    header = lines[0]
+    names = header.split()
+    starts = [header.find(name) for name in names]
+    bounds = {name: (starts[i], starts[i + 1] if i + 1 < len(starts) else None) for i, name in enumerate(names)}
+
+    def column(line, name):
+        start, end = bounds[name]
+        return line[start:end].strip()
+
+    jobs = []
+    for line in lines[1:]:
+        if line.strip() == '':
+            continue
+        stat = column(line, 'STAT')
+        jobs.append((int(column(line, 'JOBID')), column(line, 'USER'), column(line, 'JOB_NAME'),
+                     bjobs_statuses.get(stat, 'Unknown'), bjobs_exit_statuses.get(stat), column(line, 'QUEUE')))
+    return jobs
+
+
+def synthetic_snapshots(size, churn=0.1, seed=None):
+    """
+    Generate snapshots of a population of jobs. With each snapshot some jobs move to their next status. Eligible jobs
+    start running and running jobs complete, are killed or hit their walltime. Jobs that were already done leave and
+    new eligible jobs take their place so that the size stays the same.
+
+    :param size: How many jobs are in each snapshot.
+    :param churn: The fraction of jobs that move to their next status with each snapshot.
+    :param seed: The seed for choosing which jobs change.
+    :return: A generator of lists of job tuples.
+    """
+    rng = random.Random(seed)
+    users = ['user' + str(i) for i in range(max(size // 100, 1))]
+    next_id = 1
+
+    def new_job(status):
+        nonlocal next_id
+        job = [next_id, rng.choice(users), 'job_' + str(next_id % 1000), status, None, 'batch']
+        next_id += 1
+        return job
+
+    jobs = [new_job(rng.choice(['Eligible', 'Running', 'Blocked'])) for _ in range(size)]
+    while True:
+        yield [tuple(job) for job in jobs]
+        for i in rng.sample(range(size), int(size * churn)):
+            status = jobs[i][3]
+            if status in ('Eligible', 'Blocked'):
+                jobs[i][3] = 'Running'
+            elif status == 'Running':
+                jobs[i][3], jobs[i][4] = rng.choice([('Complete', 0), ('Killed', 1), ('Walltimed', 140)])
+            else:
+                jobs[i] = new_job('Eligible')
+
+
+# The backend used by every JobStatus that is not given one. If None, pythonlsf is used.
+default_backend = None
+
+
+def set_default_backend(backend):
+    """
+    Set the backend used by every JobStatus that is not given one.
+
+    :param backend: The backend or None to use pythonlsf.
+    """
+    global default_backend
+    default_backend = backend
+
+
+def get_default_backend(queue='batch'):
+    """
+    Get the backend used by every JobStatus that is not given one.
+
+    :param queue: (str) The queue to connect to LSF with if pythonlsf is used.
+    :return: The backend.
+    """
+    if default_backend is not None:
+        return default_backend
+    return PythonLSFBackend(queue)
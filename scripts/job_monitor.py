@@ -1,6 +1,6 @@
 # This is used to monitor some job.
 from scripts import job_status
-import time
+from scripts import job_transitions
 import threading
 
 
@@ -71,76 +71,73 @@ def remove_dead_threads(thread_list):
     return [thread for thread in thread_list if thread.isAlive()]
 
 
-def monitor(job_id, watch_time, notifier, num_iterations=None, **kwargs):
+def monitor(job_id, watch_time, notifier, num_iterations=None, feed=None, **kwargs):
     """
-    Monitor some job and notify whenever the status changes.
+    Monitor some job and notify whenever the status changes. Changes come from the job transition feed that every
+    monitor shares.
 
     :param job_id: id to monitor.
     :param watch_time: How often to recheck.
     :param notifier: Method to notify.
     :param num_iterations: If a job should only be monitored a certain number of times, this should be set.
+    :param feed: The JobTransitionFeed to watch. If None, the feed shared by the whole process is used.
     :param kwargs: Any arguments needed for the notifier.
     :return:
     """
-    # Get the current status of the job.
-    JS = job_status.JobStatus()
-    # Try to get the jobs status but if it does not exist, notify and exit.
-    try:
-        status = JS.get_job_status(job_id)
-    except KeyError as e:
-        notifier(**kwargs, error_message=str(e))
-        return
-
-    # Remove class since we will have many of these threads and we want to relieve memory and not store this class.
-    del JS
+    if feed is None:
+        feed = job_transitions.get_feed()
 
     done_stats = ['complete', 'killed', 'walltimed']
     done_stats = [job_status.Job.possible_status[stat] for stat in done_stats]
 
-    if status in done_stats:
-        done_status = True
-    else:
-        done_status = False
-
-    # Notify about the current job's status.
-    notifier(**kwargs, job_id=job_id, status=status, done=done_status)
-    del done_status
-
-    # Create an iteration counter.
-    iteration = 0
-    # While the job has not been completed, keep watching.
-    while status not in done_stats:
-        # Sleep the desired time.
-        time.sleep(watch_time)
-
-        # Find the new status of the job.
-        JS = job_status.JobStatus()
-        try:
-            new_status = JS.get_job_status(job_id)
-        except KeyError as e:
-            notifier(**kwargs, job_id=job_id,
-                     error_message="Something happened while monitoring my job. It seemed to disappear!\t" + str(e))
-            return
-        if new_status is None:
-            notifier(**kwargs, job_id=job_id,
-                     error_message="Something happened while monitoring my job. It seemed to disappear!\t" + str(e))
-            return
-
-        # If the status has changed then notify.
-        if new_status != status:
-            notifier(**kwargs, job_id=job_id, status=status, new_status=new_status)
-
-            status = new_status
-
-        # If we care about how many times we check then do so.
-        if num_iterations is not None:
-            iteration += 1
-            if iteration >= num_iterations:
-                break
-
-        # Remove excess variables.
-        del new_status
-        del JS
+    # Listen for changes to the job before getting its status so that no change is missed.
+    subscription = feed.subscribe([job_id])
+    try:
+        # Get the current status of the job. Every monitor shares the same look at LSF.
+        status = feed.poll(max_age=watch_time).get_job_status(job_id)
+
+        if status in done_stats:
+            done_status = True
+        else:
+            done_status = False
+
+        # Notify about the current job's status.
+        notifier(**kwargs, job_id=job_id, status=status, done=done_status)
+        del done_status
+
+        # Create an iteration counter.
+        iteration = 0
+        # While the job has not been completed, keep watching.
+        while status not in done_stats:
+            # Wait for the job to change.
+            transition = subscription.get(timeout=watch_time)
+            if transition is None:
+                # Nothing has changed yet. Look at LSF again unless another monitor or the feed already has.
+                feed.poll(max_age=watch_time)
+                transitions = subscription.get_all()
+            else:
+                transitions = [transition]
+
+            for transition in transitions:
+                if transition.new_status is None:
+                    status = None
+                # If the status has changed then notify.
+                elif transition.new_status != status:
+                    notifier(**kwargs, job_id=job_id, status=status, new_status=transition.new_status)
+                    status = transition.new_status
+
+            if status is None:
+                notifier(**kwargs, job_id=job_id,
+                         error_message="Something happened while monitoring my job. It seemed to disappear!")
+                return
+
+            # If we care about how many times we check then do so.
+            if num_iterations is not None:
+                iteration += 1
+                if iteration >= num_iterations:
+                    break
+    finally:
+        feed.unsubscribe(subscription)
 
     if status in done_stats:
         done_status = True
@@ -149,4 +146,3 @@ def monitor(job_id, watch_time, notifier, num_iterations=None, **kwargs):
 
     # Notify that the job is all done.
     notifier(**kwargs, job_id=job_id, status=status, done=done_status)
-
@@ -0,0 +1,257 @@
+"""
+This file keeps a snapshot of every job in LSF that the whole process shares. Reading every job from LSF is slow, so
+the snapshot is only taken again once it is older than its time to live. When many threads need jobs while a new
+snapshot is being taken, they all wait for that one instead of each asking LSF.
+"""
+import threading
+import time
+import traceback
+from scripts.job_table import JobTable, status_names
+
+# How many seconds a snapshot is used for before LSF is asked again.
+DEFAULT_TTL = 30
+
+
+def fetch_all_jobs():
+    """
+    Get every job from LSF.
+
+    :return: A JobTable.
+    """
+    # Only load LSF when it is actually needed.
+    from scripts import job_status
+    return job_status.JobStatus().get_jobs()
+
+
+class JobSnapshot:
+    """
+    Every job in LSF at some time. Jobs are kept in a JobTable and only the position of each job id is indexed, so a
+    JobRow is only made for the jobs that are looked up.
+    """
+
+    # The statuses of jobs that are waiting or running.
+    queued_statuses = frozenset(['Eligible', 'Running', 'Blocked'])
+
+    def __init__(self, jobs, taken_at):
+        """
+        Index the jobs.
+
+        :param jobs: A JobTable or a list of Jobs.
+        :param taken_at: When the jobs were read from LSF.
+        """
+        self.jobs = JobTable.from_jobs(jobs)
+        self.taken_at = taken_at
+        # The position of each job in the table by its id.
+        self.index_by_id = dict(zip(self.jobs.job_ids, range(len(self.jobs))))
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __contains__(self, job_id):
+        return job_id in self.index_by_id
+
+    def get(self, job_id):
+        """
+        Get a job by its id.
+
+        :param job_id: (int) The id of the job.
+        :return: The JobRow or None if it is not in LSF.
+        """
+        index = self.index_by_id.get(job_id)
+        return None if index is None else self.jobs[index]
+
+    def get_jobs_by_user(self, user):
+        """
+        Get the jobs of some user.
+
+        :param user: (str) The name of the user.
+        :return: (list) The jobs of that user.
+        """
+        return list(self.jobs.filter(user=user))
+
+    def get_jobs_by_name(self, job_name):
+        """
+        Get the jobs with some name. There may be multiple jobs with the same name.
+
+        :param job_name: (str) The name of the job.
+        :return: (list) The jobs with that name.
+        """
+        return list(self.jobs.filter(job_name=job_name))
+
+    def get_jobs_by_status(self, status):
+        """
+        Get the jobs with a status or any of a list of statuses.
+
+        :param status: (str, list) A status such as 'Running' or a list of them.
+        :return: (list) The jobs with that status.
+        """
+        return list(self.jobs.filter(status=status))
+
+    def get_job_status(self, job_id):
+        """
+        Get the status of a job.
+
+        :param job_id: (int) The id of the job.
+        :return: (str) The status of the job or None if it is not in LSF.
+        """
+        index = self.index_by_id.get(job_id)
+        return None if index is None else status_names[self.jobs.status_codes[index]]
+
+    def in_queue(self, job_id):
+        """
+        Test if a job is waiting or running.
+
+        :param job_id: (int) The id of the job.
+        :return: (boolean) Whether the job is in the queue.
+        """
+        return self.get_job_status(job_id) in self.queued_statuses
+
+
+class JobSnapshotService:
+    """
+    Hand out snapshots of LSF that are at most some number of seconds old. Only one snapshot is taken at a time and
+    everyone asking while it is taken gets that snapshot.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, fetch_jobs=fetch_all_jobs, clock=time.time):
+        """
+        Constructor for the service. No snapshot is taken until one is asked for.
+
+        :param ttl: How many seconds a snapshot is used for.
+        :param fetch_jobs: The function that gets every job from LSF.
+        :param clock: The function that gets the current time.
+        """
+        self.ttl = ttl
+        self.fetch_jobs = fetch_jobs
+        self.clock = clock
+
+        self.snapshot = None
+        # Held while checking or replacing the snapshot.
+        self.lock = threading.Lock()
+        # Set once the snapshot being taken is done. None when no snapshot is being taken.
+        self.refreshing = None
+        # The problem from the last snapshot that could not be taken.
+        self.refresh_error = None
+        # How many snapshots were taken and how many times a snapshot was handed out.
+        self.refreshes = 0
+        self.requests = 0
+        # Functions that are given each new snapshot once it is taken.
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """
+        Give every new snapshot to a function once it is taken. The function is run by the thread that took the
+        snapshot so it should be quick.
+
+        :param listener: A function that takes a JobSnapshot.
+        """
+        with self.lock:
+            self.listeners = self.listeners + [listener]
+
+    def remove_listener(self, listener):
+        """
+        Stop giving new snapshots to a function.
+
+        :param listener: A function given to add_listener.
+        """
+        with self.lock:
+            self.listeners = [function for function in self.listeners if function != listener]
+
+    def set_ttl(self, ttl):
+        """
+        Change how long snapshots are used for.
+
+        :param ttl: The number of seconds.
+        """
+        self.ttl = ttl
+
+    def get_snapshot(self, max_age=None):
+        """
+        Get a snapshot of LSF. A new one is taken if the current one is too old.
+
+        :param max_age: The oldest in seconds that the snapshot can be. If None, the ttl is used.
+        :return: A JobSnapshot.
+        """
+        if max_age is None:
+            max_age = self.ttl
+
+        with self.lock:
+            self.requests += 1
+            snapshot = self.snapshot
+            if snapshot is not None and self.clock() - snapshot.taken_at <= max_age:
+                return snapshot
+            # If a snapshot is already being taken, wait for it instead of taking another.
+            refreshing = self.refreshing
+            if refreshing is None:
+                refreshing = self.refreshing = threading.Event()
+                taking = True
+            else:
+                taking = False
+
+        if not taking:
+            refreshing.wait()
+            with self.lock:
+                if self.refresh_error is not None and self.snapshot is snapshot:
+                    raise self.refresh_error
+                return self.snapshot
+
+        try:
+            taken_at = self.clock()
+            snapshot = JobSnapshot(self.fetch_jobs(), taken_at)
+        except Exception as e:
+            with self.lock:
+                self.refresh_error = e
+                self.refreshing = None
+            refreshing.set()
+            raise
+
+        with self.lock:
+            self.snapshot = snapshot
+            self.refresh_error = None
+            self.refreshing = None
+            self.refreshes += 1
+            listeners = self.listeners
+        refreshing.set()
+
+        # A listener that fails should not stop anyone from getting the snapshot.
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                traceback.print_exc()
+        return snapshot
+
+    def invalidate(self):
+        """
+        Make the next request take a new snapshot.
+        """
+        with self.lock:
+            self.snapshot = None
+
+
+# The service shared by the whole process.
+service = None
+service_lock = threading.Lock()
+
+
+def get_service():
+    """
+    Get the snapshot service shared by the whole process.
+
+    :return: The JobSnapshotService.
+    """
+    global service
+    with service_lock:
+        if service is None:
+            service = JobSnapshotService()
+        return service
+
+
+def get_snapshot(max_age=None):
+    """
+    Get a snapshot of LSF from the shared service.
+
+    :param max_age: The oldest in seconds that the snapshot can be. If None, the ttl of the service is used.
+    :return: A JobSnapshot.
+    """
+    return get_service().get_snapshot(max_age)
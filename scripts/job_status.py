@@ -1,9 +1,8 @@
 """ Find the status of some set of jobs."""
 
-from pythonlsf import lsf
-from scripts import connect
+from scripts import job_backends
+from scripts.job_table import JobTable
 import sys
-from collections import Counter
 
 
 class JobStatus:
@@ -11,11 +10,17 @@ class JobStatus:
     Get the status of a set of jobs in LSF according to some property they share.
     """
 
-    def __init__(self, queue='batch', verbose=False):
+    def __init__(self, queue='batch', verbose=False, backend=None):
         """
         Connect to lsf and set the verbosity.
+
+        :param queue: (str) queue that exists in lsf.
+        :param verbose: Whether to print what is searched for.
+        :param backend: Where jobs are read from. If None, the default backend from job_backends is used.
         """
-        connect.connect(queue)
+        if backend is None:
+            backend = job_backends.get_default_backend(queue)
+        self.backend = backend
         self.verbose = verbose
 
     def in_queue(self, jobID):
@@ -26,9 +31,7 @@ class JobStatus:
         :return: (boolean) Whether the job is in queue.
         """
         # Get all the jobs that match that jobID and are either eligible, current, or blocked.
-        queue_stats = ['eligible', 'running', 'blocked']
-        queue_stats = [Job.possible_status[stat] for stat in queue_stats]
-        jobs = self.get_jobs(jobid=jobID, status=queue_stats)
+        jobs = self.get_jobs(jobid=jobID, status=Job.queue_statuses)
         # If that job exists then all good.
         if len(jobs) != 0:
             return True
@@ -76,14 +79,10 @@ class JobStatus:
         """
         Input a set of jobs and count how many are of each status type.
 
-        :param jobs: (list) A set of jobs.
+        :param jobs: (JobTable, list) A set of jobs.
         :return: (Counter) Object that has occurence of each status.
         """
-        stats = []
-        for j in jobs:
-            stats.append(j.status)
-        cnt = Counter(stats)
-        return cnt
+        return JobTable.from_jobs(jobs).count_by('status')
 
     def get_job_status(self, jobid):
         """
@@ -124,6 +123,57 @@ class JobStatus:
         # Return the exit status of the job.
         return jobs[0].exit_status
 
+    def get_jobs_by_ids(self, job_ids):
+        """
+        Get the jobs for a set of ids. Every id is found by reading the jobs from LSF once.
+
+        :param job_ids: The ids of the jobs to find.
+        :return: A tuple containing a dictionary from each id that was found to its job and a frozenset of the ids
+        that are not in LSF.
+        """
+        job_ids = set(int(job_id) for job_id in job_ids)
+        if len(job_ids) == 0:
+            return {}, frozenset()
+        # LSF can find a single job by itself. Otherwise every job is read and the ones needed are kept.
+        if len(job_ids) == 1:
+            jobs = self.get_jobs(jobid=next(iter(job_ids)))
+        else:
+            jobs = self.get_jobs().filter(job_ids=job_ids)
+
+        found = {}
+        for job in jobs:
+            # If multiple jobs with this id exist then error.
+            if job.jobId in found:
+                raise KeyError("There are too many jobs with ID", job.jobId)
+            found[job.jobId] = job
+
+        missing = frozenset(job_ids.difference(found))
+        if self.verbose and len(missing) != 0:
+            print("There are no jobs with IDs " + ", ".join(str(job_id) for job_id in sorted(missing)))
+        return found, missing
+
+    def get_statuses(self, job_ids):
+        """
+        Get the status of each job in a set of ids.
+
+        :param job_ids: The ids of the jobs.
+        :return: A tuple containing a dictionary from each id that was found to its status and a frozenset of the ids
+        that are not in LSF.
+        """
+        jobs, missing = self.get_jobs_by_ids(job_ids)
+        return {job_id: job.status for job_id, job in jobs.items()}, missing
+
+    def get_exit_statuses(self, job_ids):
+        """
+        Get the exit status of each job in a set of ids.
+
+        :param job_ids: The ids of the jobs.
+        :return: A tuple containing a dictionary from each id that was found to its exit status and a frozenset of the
+        ids that are not in LSF.
+        """
+        jobs, missing = self.get_jobs_by_ids(job_ids)
+        return {job_id: job.exit_status for job_id, job in jobs.items()}, missing
+
     def get_jobs(self, jobid=0, jobName=None, user="all", queue=None, hostname=None, status='all'):
         """
         Enter certain parameters to reduce the search space of all jobs in LSF or that have been recently completed.
@@ -134,74 +184,26 @@ class JobStatus:
         :param  user: (str) User to match.
         :param  queue: (str) LSF queue to search.
         :param  hostname: (str) Hostname to search.
-        :param  status: (str, list) Group of status to match.
-        :return: (list) List of jobs that match above criteria.
+        :param  status: (str, list, set) Group of status to match.
+        :return: (JobTable) Table of jobs that match above criteria.
         """
         # Since attempting to choose job status based on options does not work, we instead filter the jobs after
         # we have found all the matches.
-        search_status = lsf.ALL_JOB
-        if status == "all":
-            status = Job.get_viable_status()
-        job_status = Job.get_viable_status()
-
-        # LSF uses numbers for each type of job so initialize the options as 0.
-        options = []
-        # Try to go through all status' set.
-        try:
-            # If the user entered a list, the options are already set. Just make sure they are all in the dictionary.
-            if type(status) is list:
-                # Using or, put that status into the possible job options.
-                for s in status:
-                    if s not in job_status:
-                        raise KeyError
-                    options.append(s)
-            # If it is a string then it is only one status to look for.
-            elif type(status) is str:
-                if status not in job_status:
-                    raise KeyError
-                options.append(status)
-        # If incorrect key was entered then print out error with correct options.
-        except KeyError:
-            status_str = ""
-            index = 0
-            for key in job_status:
-                status_str += key 
-                status_str += ", "
-                index += 1
-            status_str += "all"
-            raise KeyError("Invalid status, " + str(status) + ". Options are: " + status_str)
-
-        # Create an array for holding each job.
-        jobs = []
+        options = Job.get_status_options(status)
+
+        # Create a table for holding each job. The jobs are held in columns so that many jobs take little memory.
+        jobs = JobTable()
         if self.verbose:
-            print("jobid:", jobid, "jobName:", jobName, "user:", user, "queue:", queue, "hostname:", hostname, "options:", search_status)
-        # Get a generator that will return a job whenever querried.
-        jobinfohead = lsf.lsb_openjobinfo_a(jobid, jobName, user, queue, hostname, search_status)
-
-        # If there are some jobs that exist under certain parameters then get the number of jobs.
-        if jobinfohead is not None:
-            num_jobs = jobinfohead.numJobs
-        # Otherwise there are no jobs.
-        else:
-            num_jobs = 0
+            print("jobid:", jobid, "jobName:", jobName, "user:", user, "queue:", queue, "hostname:", hostname, "options:", options)
+
+        # Append each job from the backend to the table. A Job is not made for it since the table holds the same
+        # information.
+        for job in self.backend.read_jobs(jobid, jobName, user, queue, hostname):
+            if job[3] in options:
+                jobs.append(*job)
 
         if self.verbose:
-            print("Found " + str(num_jobs) + " job(s)")
-
-        # Repeatedly call jobinfo for how many jobs are there.
-        for _ in range(num_jobs):
-            # Append the job to the list after transforming it into a Job class.
-            # Once job info is closed, lsf.lsb_readjobinfo does not work again.
-            # It is also a generator and can thus only be gone through once.
-            lsf_job = lsf.lsb_readjobinfo(None) 
-            # This occurs if the job pops out of queue after getting the number of lsf jobs.
-            if lsf_job is None:
-                continue
-            j = Job(lsf_job)
-            if j.status in options:
-                jobs.append(j)
-        # All done with this job info.
-        lsf.lsb_closejobinfo()
+            print("Found " + str(len(jobs)) + " job(s)")
 
         # Return the list of jobs.
         return jobs
@@ -224,6 +226,10 @@ class Job:
                        'blocked': 'Blocked',
                        'unknown': 'Unknown'}
 
+    # Every possible status and the statuses of jobs that are waiting or running.
+    viable_statuses = frozenset(possible_status.values())
+    queue_statuses = frozenset([possible_status['eligible'], possible_status['running'], possible_status['blocked']])
+
     @staticmethod
     def get_viable_status():
         """
@@ -234,6 +240,26 @@ class Job:
             stats.append(Job.possible_status[key])
         return stats
 
+    @staticmethod
+    def get_status_options(status):
+        """
+        Get the set of statuses to match from a status, a group of statuses or 'all'.
+
+        :param status: (str, list, set) A single status, a group of statuses or 'all'.
+        :return: (frozenset) The statuses to match.
+        """
+        if status == "all":
+            return Job.viable_statuses
+        if type(status) is str:
+            options = frozenset([status])
+        else:
+            options = frozenset(status)
+        # If incorrect key was entered then error with correct options.
+        if not options.issubset(Job.viable_statuses):
+            raise KeyError("Invalid status, " + str(status) + ". Options are: "
+                           + ", ".join(Job.get_viable_status()) + ", all")
+        return options
+
     def __init__(self, j):
         """
         Initialize the job with its id, total allowed run time., and status.
@@ -246,36 +272,46 @@ class Job:
         self.jobName = j.jName
         # Record user who submitted job.
         self.user = j.user
-        # Set the exit status value initially to None. If it has one, it is changed later on.
+        # Record the queue the job was submitted to.
+        self.queue = j.submit.queue
+        # Record the exit status of the job.
         self.exit_status = int(j.exitStatus)
-
         # Get the status of the job.
+        self.status = Job.get_status(j)
+
+    @staticmethod
+    def get_status(j):
+        """
+        Get the status of a job from LSF.
+
+        :param j: (lsf job) The object that comes from the pythonlsf generator.
+        :return: (str) The status of the job.
+        """
+        from pythonlsf import lsf
         if j.status & lsf.JOB_STAT_RUN:
-            self.status = self.possible_status["running"]
+            return Job.possible_status["running"]
         elif j.status & lsf.JOB_STAT_DONE:
-            self.exit_status = int(j.exitStatus)
-            self.status = self.possible_status["complete"]
+            return Job.possible_status["complete"]
         elif j.status & lsf.JOB_STAT_EXIT:
-            self.exit_status = int(j.exitStatus)
             # I think that error code 140 always means runlimit exceeded and there is no other code.
             # I'm not totally sure about that though.
             if (int(j.exitStatus) % 256) == 140:
-                self.status = self.possible_status["walltimed"]
+                return Job.possible_status["walltimed"]
             else:
-                self.status = self.possible_status["killed"]
+                return Job.possible_status["killed"]
         elif j.status & lsf.JOB_STAT_USUSP:
-            self.status = self.possible_status["susp_person_dispatched"]
+            return Job.possible_status["susp_person_dispatched"]
         elif j.status & lsf.JOB_STAT_PSUSP:
-            self.status = self.possible_status["susp_person_pend"]
+            return Job.possible_status["susp_person_pend"]
         elif j.status & lsf.JOB_STAT_SSUSP:
-            self.status = self.possible_status["susp_system"]
+            return Job.possible_status["susp_system"]
         elif j.status & lsf.JOB_STAT_PEND:
             if j.pendStateJ == 0:
-                self.status = self.possible_status["eligible"]
+                return Job.possible_status["eligible"]
             else:
-                self.status = self.possible_status["blocked"]
+                return Job.possible_status["blocked"]
         else:
-            self.status = self.possible_status["unknown"]
+            return Job.possible_status["unknown"]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+"""
+This file holds many jobs from LSF in columns instead of as one object each. A busy queue can have tens of thousands of
+jobs, so each column is an array or a list of interned strings and a status is stored as a small code. Jobs are
+filtered and counted a column at a time.
+"""
+import sys
+import threading
+from array import array
+from collections import Counter, namedtuple
+
+# The code of each status that has been seen and the status of each code. New statuses are given the next code.
+codes_by_status = {}
+status_names = []
+status_lock = threading.Lock()
+
+# Stored in the exit status column for jobs that do not have an exit status.
+NO_EXIT_STATUS = -1
+
+
+def get_status_code(status):
+    """
+    Get the code that a status is stored as.
+
+    :param status: (str) A status such as 'Running'.
+    :return: (int) The code for the status.
+    """
+    code = codes_by_status.get(status)
+    if code is None:
+        with status_lock:
+            code = codes_by_status.get(status)
+            if code is None:
+                code = len(status_names)
+                status_names.append(sys.intern(status))
+                codes_by_status[status] = code
+    return code
+
+
+def intern_string(value):
+    """
+    Intern a string so that every job with the same user, name or queue shares it.
+
+    :param value: (str) The string or None.
+    :return: The interned string or None.
+    """
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+class JobRow(namedtuple('JobRow', ['jobId', 'user', 'jobName', 'status', 'exit_status', 'queue'])):
+    """
+    A single job from a JobTable. The fields have the same names as the attributes of a Job.
+    """
+    __slots__ = ()
+
+
+class JobTable:
+    """
+    Many jobs held in columns. Iterating over the table or indexing it gives JobRows so that it can be used in place
+    of a list of Jobs.
+    """
+
+    # The columns that jobs can be filtered and counted by.
+    columns = ['jobId', 'user', 'jobName', 'status', 'exit_status', 'queue']
+
+    def __init__(self):
+        """
+        Constructor for an empty table.
+        """
+        self.job_ids = array('q')
+        self.users = []
+        self.job_names = []
+        self.status_codes = array('B')
+        self.exit_statuses = array('q')
+        self.queues = []
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """
+        Make a table from Jobs or anything else with the same attributes. A JobTable is returned as it is.
+
+        :param jobs: The jobs.
+        :return: The JobTable.
+        """
+        if isinstance(jobs, cls):
+            return jobs
+        table = cls()
+        for job in jobs:
+            table.append(job.jobId, job.user, job.jobName, job.status, job.exit_status, getattr(job, 'queue', None))
+        return table
+
+    def append(self, job_id, user, job_name, status, exit_status=None, queue=None):
+        """
+        Add a job to the end of the table.
+
+        :param job_id: (int) The id of the job.
+        :param user: (str) The user that submitted the job.
+        :param job_name: (str) The name of the job.
+        :param status: (str) The status of the job such as 'Running'.
+        :param exit_status: (int) The exit status of the job or None if it does not have one.
+        :param queue: (str) The queue the job was submitted to.
+        """
+        self.job_ids.append(job_id)
+        self.users.append(intern_string(user))
+        self.job_names.append(intern_string(job_name))
+        self.status_codes.append(get_status_code(status))
+        self.exit_statuses.append(NO_EXIT_STATUS if exit_status is None else exit_status)
+        self.queues.append(intern_string(queue))
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def __getitem__(self, index):
+        exit_status = self.exit_statuses[index]
+        return JobRow(self.job_ids[index], self.users[index], self.job_names[index],
+                      status_names[self.status_codes[index]], None if exit_status == NO_EXIT_STATUS else exit_status,
+                      self.queues[index])
+
+    def __iter__(self):
+        for index in range(len(self.job_ids)):
+            yield self[index]
+
+    def column(self, name):
+        """
+        Get the values of a column for every job.
+
+        :param name: One of columns.
+        :return: A list of the values.
+        """
+        if name == 'jobId':
+            return list(self.job_ids)
+        elif name == 'user':
+            return list(self.users)
+        elif name == 'jobName':
+            return list(self.job_names)
+        elif name == 'status':
+            return [status_names[code] for code in self.status_codes]
+        elif name == 'exit_status':
+            return [None if exit_status == NO_EXIT_STATUS else exit_status for exit_status in self.exit_statuses]
+        elif name == 'queue':
+            return list(self.queues)
+        raise KeyError("Invalid column, " + str(name) + ". Options are: " + ", ".join(self.columns))
+
+    def take(self, indexes):
+        """
+        Make a table of some of the jobs.
+
+        :param indexes: The index of each job to keep in order.
+        :return: The new JobTable.
+        """
+        table = JobTable()
+        table.job_ids = array('q', [self.job_ids[i] for i in indexes])
+        table.users = [self.users[i] for i in indexes]
+        table.job_names = [self.job_names[i] for i in indexes]
+        table.status_codes = array('B', [self.status_codes[i] for i in indexes])
+        table.exit_statuses = array('q', [self.exit_statuses[i] for i in indexes])
+        table.queues = [self.queues[i] for i in indexes]
+        return table
+
+    def filter(self, job_id=None, user=None, job_name=None, status=None, queue=None, job_ids=None):
+        """
+        Get the jobs that match every criteria that is set. Each column is checked once for every job.
+
+        :param job_id: (int) Id to match.
+        :param user: (str) User to match.
+        :param job_name: (str) Name to match.
+        :param status: (str, list) Status or list of statuses to match.
+        :param queue: (str) Queue to match.
+        :param job_ids: (set) Ids of which any can match.
+        :return: A JobTable of the matching jobs.
+        """
+        indexes = range(len(self.job_ids))
+        if job_id is not None:
+            indexes = [i for i in indexes if self.job_ids[i] == job_id]
+        if user is not None:
+            indexes = [i for i in indexes if self.users[i] == user]
+        if job_name is not None:
+            indexes = [i for i in indexes if self.job_names[i] == job_name]
+        if status is not None:
+            if type(status) is str:
+                status = [status]
+            codes = set(codes_by_status[s] for s in status if s in codes_by_status)
+            indexes = [i for i in indexes if self.status_codes[i] in codes]
+        if queue is not None:
+            indexes = [i for i in indexes if self.queues[i] == queue]
+        if job_ids is not None:
+            indexes = [i for i in indexes if self.job_ids[i] in job_ids]
+        return self.take(indexes)
+
+    def count_by(self, name='status'):
+        """
+        Count how many jobs have each value of some column.
+
+        :param name: One of 'status', 'user', 'jobName' or 'queue'.
+        :return: (Counter) The number of jobs with each value.
+        """
+        if name == 'status':
+            # Count the codes and only look up the name of each status once.
+            return Counter({status_names[code]: count for code, count in Counter(self.status_codes).items()})
+        return Counter(self.column(name))
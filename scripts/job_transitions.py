@@ -0,0 +1,273 @@
+"""
+This file turns consecutive snapshots of LSF into a feed of job transitions. Whenever the shared snapshot service takes
+a new snapshot, it is compared with the last one and each job that appeared, changed status or left LSF is given to
+every subscriber that wants it. Job monitors and the updaters read this feed instead of each checking their own jobs.
+"""
+import queue
+import threading
+from collections import namedtuple
+from scripts import job_snapshot
+from scripts.job_table import NO_EXIT_STATUS, status_names
+
+# The statuses of jobs that have finished.
+finished_statuses = frozenset(['Complete', 'Killed', 'Walltimed'])
+
+
+class JobTransition(namedtuple('JobTransition', ['job_id', 'old_status', 'new_status', 'exit_status', 'timestamp'])):
+    """
+    A job that changed between two snapshots. The old status is None for a job that just appeared and the new status
+    is None for a job that left LSF.
+    """
+    __slots__ = ()
+
+    @property
+    def finished(self):
+        """
+        Whether the job finished or left LSF with this transition.
+        """
+        return self.new_status is None or self.new_status in finished_statuses
+
+
+def diff_tables(old, new, timestamp):
+    """
+    Find every job that appeared, changed status or left between two tables. Each table is only gone through once.
+
+    :param old: The JobTable from the earlier snapshot.
+    :param new: The JobTable from the later snapshot.
+    :param timestamp: When the later snapshot was taken.
+    :return: A list of JobTransitions.
+    """
+    old_codes = dict(zip(old.job_ids, old.status_codes))
+    transitions = []
+    for i, (job_id, code) in enumerate(zip(new.job_ids, new.status_codes)):
+        old_code = old_codes.pop(job_id, None)
+        if old_code == code:
+            continue
+        exit_status = new.exit_statuses[i]
+        transitions.append(JobTransition(job_id, None if old_code is None else status_names[old_code],
+                                         status_names[code], None if exit_status == NO_EXIT_STATUS else exit_status,
+                                         timestamp))
+    # Whatever is left was in the old table but not the new one.
+    for job_id, old_code in old_codes.items():
+        transitions.append(JobTransition(job_id, status_names[old_code], None, None, timestamp))
+    return transitions
+
+
+class Subscription:
+    """
+    A queue of the transitions that some subscriber wants.
+    """
+
+    def __init__(self, job_ids=None, maxsize=0):
+        """
+        Constructor for the subscription.
+
+        :param job_ids: The ids of the jobs to get transitions for. If None, every transition is wanted.
+        :param maxsize: The most transitions that can wait in the queue. Once it is full, new transitions are dropped.
+        0 means there is no limit.
+        """
+        self.job_ids = None if job_ids is None else set(job_ids)
+        self.queue = queue.Queue(maxsize=maxsize)
+        # How many transitions were dropped because the queue was full.
+        self.dropped = 0
+
+    def watch(self, job_id):
+        """
+        Start getting transitions for another job.
+
+        :param job_id: The id of the job.
+        """
+        if self.job_ids is not None:
+            self.job_ids.add(job_id)
+
+    def wants(self, transition):
+        """
+        Test whether a transition is for this subscriber.
+
+        :param transition: The JobTransition.
+        :return: Whether it should be put in the queue.
+        """
+        return self.job_ids is None or transition.job_id in self.job_ids
+
+    def put(self, transition):
+        """
+        Put a transition in the queue unless it is full.
+
+        :param transition: The JobTransition.
+        """
+        try:
+            self.queue.put_nowait(transition)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout=None):
+        """
+        Wait for the next transition.
+
+        :param timeout: The most seconds to wait. If None, wait until there is one.
+        :return: The JobTransition or None if there was none in time.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_all(self):
+        """
+        Get every transition that is waiting without waiting for more.
+
+        :return: A list of JobTransitions.
+        """
+        transitions = []
+        while True:
+            try:
+                transitions.append(self.queue.get_nowait())
+            except queue.Empty:
+                return transitions
+
+
+class JobTransitionFeed:
+    """
+    Compare each new snapshot from a snapshot service with the one before it and give the transitions to subscribers.
+    """
+
+    def __init__(self, service=None):
+        """
+        Constructor for the feed. It starts listening to the service right away.
+
+        :param service: The JobSnapshotService to read snapshots from. If None, the shared service is used.
+        """
+        if service is None:
+            service = job_snapshot.get_service()
+        self.service = service
+
+        # Held while comparing snapshots and while changing the subscribers.
+        self.lock = threading.Lock()
+        self.subscriptions = []
+        # The snapshot that the next one is compared to. This starts as the snapshot the service already has.
+        self.last_snapshot = service.snapshot
+        # How many transitions were found.
+        self.transitions_published = 0
+
+        # The thread that keeps asking for new snapshots and the event that stops it.
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        self.service.add_listener(self.publish)
+
+    def subscribe(self, job_ids=None, maxsize=0):
+        """
+        Start getting transitions.
+
+        :param job_ids: The ids of the jobs to get transitions for. If None, every transition is wanted.
+        :param maxsize: The most transitions that can wait to be read. 0 means there is no limit.
+        :return: The Subscription.
+        """
+        subscription = Subscription(job_ids, maxsize)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stop getting transitions.
+
+        :param subscription: The Subscription from subscribe.
+        """
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, snapshot):
+        """
+        Compare a snapshot with the last one and give the transitions to every subscriber that wants them. The first
+        snapshot has nothing to be compared to. Snapshots older than the last one are ignored.
+
+        :param snapshot: The new JobSnapshot.
+        :return: A list of the JobTransitions.
+        """
+        with self.lock:
+            last_snapshot = self.last_snapshot
+            if last_snapshot is snapshot or (last_snapshot is not None and snapshot.taken_at < last_snapshot.taken_at):
+                return []
+            self.last_snapshot = snapshot
+            if last_snapshot is None:
+                return []
+            transitions = diff_tables(last_snapshot.jobs, snapshot.jobs, snapshot.taken_at)
+            self.transitions_published += len(transitions)
+            # Subscribers get the transitions in the same order they were found.
+            for subscription in self.subscriptions:
+                for transition in transitions:
+                    if subscription.wants(transition):
+                        subscription.put(transition)
+        return transitions
+
+    def poll(self, max_age=None):
+        """
+        Get a snapshot at most some number of seconds old. If a new one is taken, its transitions are published.
+
+        :param max_age: The oldest in seconds that the snapshot can be. If None, the ttl of the service is used.
+        :return: The JobSnapshot.
+        """
+        return self.service.get_snapshot(max_age)
+
+    def start(self, interval):
+        """
+        Keep looking at LSF every so often in a background thread so that transitions are found even when nothing else
+        asks for a snapshot. Nothing is done if the thread is already running.
+
+        :param interval: How many seconds between each look.
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, args=(interval,), name="job_transition_feed", daemon=True)
+            self.thread.start()
+
+    def run(self, interval):
+        """
+        Look at LSF every interval until stopped.
+
+        :param interval: How many seconds between each look.
+        """
+        while not self.stop_event.is_set():
+            try:
+                self.poll(max_age=interval)
+            except Exception as e:
+                # LSF may be back next time.
+                print("Could not look at LSF for job transitions: " + str(e))
+            self.stop_event.wait(interval)
+
+    def stop(self):
+        """
+        Stop the background thread.
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        """
+        Stop the background thread and stop listening to the service.
+        """
+        self.stop()
+        self.service.remove_listener(self.publish)
+
+
+# The feed shared by the whole process.
+feed = None
+feed_lock = threading.Lock()
+
+
+def get_feed():
+    """
+    Get the transition feed shared by the whole process. It reads the shared snapshot service.
+
+    :return: The JobTransitionFeed.
+    """
+    global feed
+    with feed_lock:
+        if feed is None:
+            feed = JobTransitionFeed()
+        return feed
@@ -0,0 +1,180 @@
+"""
+This file measures where the time of each update goes. Every phase of an update is timed into a histogram and the
+work done is counted so that a slow update can be blamed on the file system, LSF or the database. The results of each
+update can be appended to a file as a JSON line and written as a Prometheus textfile for the node exporter to scrape.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# The phases of an update that are timed.
+PHASES = ['list_directories', 'parse_files', 'read_outputs', 'lsf', 'select', 'write']
+
+# The things that are counted during an update.
+COUNTERS = ['instances_visited', 'instances_skipped', 'instances_written', 'bytes_read']
+
+# The upper bound in seconds of each histogram bucket. Each bucket also holds everything in the buckets below it.
+BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, float('inf')]
+
+
+class UpdateMetrics:
+    """
+    The timings and counts of a single update.
+    """
+
+    def __init__(self):
+        """
+        Constructor. Nothing has been measured yet.
+        """
+        # Phases and counters can be measured from multiple threads.
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything measured. This is done at the start of each update.
+        """
+        with self.lock:
+            # Phase -> the number of timings in each bucket, the total seconds and the number of timings.
+            self.buckets = {phase: [0] * len(BUCKETS) for phase in PHASES}
+            self.seconds = {phase: 0.0 for phase in PHASES}
+            self.timings = {phase: 0 for phase in PHASES}
+            self.counters = {counter: 0 for counter in COUNTERS}
+            self.started = time.time()
+
+    def observe(self, phase, seconds):
+        """
+        Record how long some phase took once.
+
+        :param phase: One of PHASES.
+        :param seconds: How many seconds it took.
+        """
+        with self.lock:
+            buckets = self.buckets[phase]
+            for i in range(len(BUCKETS)):
+                if seconds <= BUCKETS[i]:
+                    buckets[i] += 1
+            self.seconds[phase] += seconds
+            self.timings[phase] += 1
+
+    @contextmanager
+    def time(self, phase):
+        """
+        Time everything in the block as one run of some phase.
+
+        :param phase: One of PHASES.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def count(self, counter, amount=1):
+        """
+        Add to some counter.
+
+        :param counter: One of COUNTERS.
+        :param amount: How much to add.
+        """
+        with self.lock:
+            self.counters[counter] += amount
+
+    def to_dict(self):
+        """
+        Get everything measured.
+
+        :return: A dictionary containing when the update started, the total seconds and number of timings of each
+        phase and each counter.
+        """
+        with self.lock:
+            return {'started': self.started,
+                    'phases': {phase: {'seconds': self.seconds[phase], 'count': self.timings[phase]}
+                               for phase in PHASES},
+                    'counters': dict(self.counters)}
+
+    def prometheus_lines(self, labels):
+        """
+        Get the Prometheus text format lines for the phases and counters.
+
+        :param labels: A dictionary of labels to add to every line.
+        :return: A list of lines without the HELP and TYPE lines.
+        """
+        lines = []
+        with self.lock:
+            for phase in PHASES:
+                phase_labels = dict(labels, phase=phase)
+                for i in range(len(BUCKETS)):
+                    bound = '+Inf' if BUCKETS[i] == float('inf') else repr(BUCKETS[i])
+                    lines.append('harmony_update_phase_seconds_bucket' + format_labels(dict(phase_labels, le=bound))
+                                 + ' ' + str(self.buckets[phase][i]))
+                lines.append('harmony_update_phase_seconds_sum' + format_labels(phase_labels) + ' '
+                             + repr(self.seconds[phase]))
+                lines.append('harmony_update_phase_seconds_count' + format_labels(phase_labels) + ' '
+                             + str(self.timings[phase]))
+            for counter in COUNTERS:
+                lines.append('harmony_update_' + counter + format_labels(labels) + ' ' + str(self.counters[counter]))
+        return lines
+
+
+def format_labels(labels):
+    """
+    Format labels for the Prometheus text format.
+
+    :param labels: A dictionary from each label to its value.
+    :return: The text such as '{phase="write"}'.
+    """
+    if len(labels) == 0:
+        return ''
+    values = []
+    for label, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        values.append(label + '="' + value + '"')
+    return '{' + ','.join(values) + '}'
+
+
+def write_json_line(path, record):
+    """
+    Append a record to a file of JSON lines.
+
+    :param path: The path to the file.
+    :param record: A dictionary that can be written as JSON.
+    """
+    with open(path, mode='a') as file:
+        file.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def write_prometheus_textfile(path, metrics_by_labels, gauges=None):
+    """
+    Write the measurements of the last update of each rgt input as a Prometheus textfile. The file is written next to
+    the path and then moved into place so that the node exporter never reads half of it.
+
+    :param path: The path to the textfile. It should end in '.prom'.
+    :param metrics_by_labels: A list of tuples containing the labels and UpdateMetrics of each rgt input.
+    :param gauges: A dictionary from the name of each extra gauge to a list of tuples containing its labels and value.
+    """
+    lines = ['# HELP harmony_update_phase_seconds How long each phase of the last update took.',
+             '# TYPE harmony_update_phase_seconds histogram']
+    counter_lines = []
+    for labels, metrics in metrics_by_labels:
+        for line in metrics.prometheus_lines(labels):
+            if line.startswith('harmony_update_phase_seconds'):
+                lines.append(line)
+            else:
+                counter_lines.append(line)
+    # Lines for the same metric need to be together.
+    for counter in COUNTERS:
+        name = 'harmony_update_' + counter
+        lines.append('# HELP ' + name + ' The ' + counter.replace('_', ' ') + ' during the last update.')
+        lines.append('# TYPE ' + name + ' gauge')
+        lines += [line for line in counter_lines if line.startswith(name + '{') or line.startswith(name + ' ')]
+    for name, values in (gauges or {}).items():
+        lines.append('# TYPE ' + name + ' gauge')
+        lines += [name + format_labels(labels) + ' ' + repr(value) for labels, value in values]
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, mode='w') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(temporary_path, path)
@@ -252,10 +252,9 @@ class MessageParser:
         :return: All jobs running by <username>.
         """
 
-        # Import JobStatus so that we can search lsf.
-        from scripts.job_status import JobStatus
-        JS = JobStatus()
-        jobs = JS.get_jobs_by_user(username)
+        # Import job_snapshot so that we can search lsf.
+        from scripts import job_snapshot
+        jobs = job_snapshot.get_snapshot().get_jobs_by_user(username)
         # Set up the start of the response.
         if len(jobs) == 1:
             response = "I found 1 job by " + username + ".\n"
@@ -348,15 +347,17 @@ class MessageParser:
         """
 
         # Get all jobs from lsf.
-        from scripts.job_status import JobStatus
-        JS = JobStatus()
-        jobs = JS.get_jobs()
+        from scripts import job_snapshot
+        jobs = job_snapshot.get_snapshot().jobs
 
         # Set up the beginning of the response.
         if len(jobs) == 1:
             response = "I found 1 job in LSF.\n"
         else:
             response = "I found " + str(len(jobs)) + " jobs in LSF.\n"
+        # Say how many jobs have each status.
+        status_counts = jobs.count_by('status')
+        response += ", ".join(status + ": " + str(status_counts[status]) for status in sorted(status_counts)) + "\n"
 
         # Create a list of jobs.
         tuple_list = [(job.jobId, job.user, job.jobName, job.status) for job in jobs]
@@ -1,4 +1,107 @@
 import copy
+import datetime
+import os
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+
+
+def parse_int(value):
+    """
+    Get an integer from a field of the harness files.
+
+    :param value: The text of the field or an int.
+    :return: The int or None if the field is not a non-negative integer such as '***'.
+    """
+    if value is None or type(value) == int:
+        return value
+    if value.isdigit():
+        return int(value)
+    return None
+
+
+def parse_time(value):
+    """
+    Get the time from a field of the harness files.
+
+    :param value: The text of the field such as '2018-10-17T00:00:00.000000' or a datetime.
+    :return: The datetime. If the text is not a time it is returned with the 'T' replaced by a ' ' so that it is
+    still ready to be entered into the database.
+    """
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return value.replace('T', ' ')
+
+
+class RgtStatusRecord(namedtuple('RgtStatusRecord', ['harness_start', 'harness_uid', 'job_id', 'build_status',
+                                                     'submit_status', 'check_status'])):
+    """
+    A test instance's line in an rgt_status.txt file. The job id and statuses are ints or None when they have not been
+    set yet.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, line_dic):
+        """
+        Create the record from a dictionary of the fields.
+
+        :param line_dic: A dictionary containing each field of the line as text or already converted.
+        :return: The record.
+        """
+        return cls(harness_start=parse_time(line_dic['harness_start']),
+                   harness_uid=line_dic['harness_uid'],
+                   job_id=parse_int(line_dic['job_id']),
+                   build_status=parse_int(line_dic['build_status']),
+                   submit_status=parse_int(line_dic['submit_status']),
+                   check_status=parse_int(line_dic['check_status']))
+
+    @classmethod
+    def coerce(cls, line):
+        """
+        Get the record for a line that may still be a dictionary.
+
+        :param line: A record or a dictionary for from_dict.
+        :return: The record.
+        """
+        if isinstance(line, cls):
+            return line
+        return cls.from_dict(line)
+
+
+class EventRecord(namedtuple('EventRecord', ['test_id', 'event_filename', 'event_time', 'app', 'test',
+                                             'rgt_system_log_tag', 'run_archive', 'build_directory'])):
+    """
+    The variables of an event file that are used. Variables that are not in the file are None.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, event_dic):
+        """
+        Create the record from the variables of an event file.
+
+        :param event_dic: A dictionary from each variable to its value. Variables that are not used are ignored.
+        :return: The record.
+        """
+        event = {field: event_dic.get(field) for field in cls._fields}
+        event['event_time'] = parse_time(event['event_time'])
+        return cls(**event)
+
+    @classmethod
+    def coerce(cls, event):
+        """
+        Get the record for an event that may still be a dictionary.
+
+        :param event: A record or a dictionary for from_dict.
+        :return: The record.
+        """
+        if isinstance(event, cls):
+            return event
+        return cls.from_dict(event)
 
 
 class ParseEvent:
@@ -7,6 +110,12 @@ class ParseEvent:
     """
 
     def parse_file(self, file_path):
+        """
+        Parse the variables of an event file.
+
+        :param file_path: Path to the event file.
+        :return: A dictionary from each variable to its value. None if the file is empty.
+        """
         with open(file_path) as file:
             file_contents = [line for line in file]
 
@@ -23,6 +132,80 @@ class ParseEvent:
                     event[var] = val
             return event
 
+    def parse_record(self, file_path):
+        """
+        Parse an event file into a record.
+
+        :param file_path: Path to the event file.
+        :return: An EventRecord. None if the file is empty.
+        """
+        event = self.parse_file(file_path)
+        if event is None:
+            return event
+        return EventRecord.from_dict(event)
+
+
+class EventCache:
+    """
+    Remember parsed event files so that each one is only parsed once. Events are found by their path, mtime and size
+    so a file that is rewritten is parsed again. Only the most recently used events are kept.
+    """
+
+    def __init__(self, max_size=4096, metrics=None):
+        """
+        Constructor. Nothing has been parsed yet.
+
+        :param max_size: The most events that are kept.
+        :param metrics: The UpdateMetrics that each parse is timed and counted in. None if they are not measured.
+        """
+        self.max_size = max_size
+        self.metrics = metrics
+        self.parser = ParseEvent()
+        # (path, mtime in nanoseconds, size) -> parsed event. The least recently used event is first.
+        self.events = OrderedDict()
+        # How many parses were found in the cache or had to be done.
+        self.hits = 0
+        self.misses = 0
+        # Events can be parsed from multiple threads.
+        self.lock = threading.Lock()
+
+    def parse_file(self, file_path, stat=None):
+        """
+        Get the parsed event for some file.
+
+        :param file_path: Path to the event file.
+        :param stat: The stat of the file if it was already taken. The file is stat'd if this is not given.
+        :return: An EventRecord for the event.
+        """
+        if stat is None:
+            stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            event = self.events.get(key)
+            if event is not None:
+                self.events.move_to_end(key)
+                self.hits += 1
+                return event
+            self.misses += 1
+
+        # Parse outside of the lock so that other threads are not held up by the file system.
+        if self.metrics is None:
+            event = self.parser.parse_record(file_path)
+        else:
+            with self.metrics.time('parse_files'):
+                event = self.parser.parse_record(file_path)
+            self.metrics.count('bytes_read', stat.st_size)
+        if event is None:
+            return event
+
+        with self.lock:
+            self.events[key] = event
+            self.events.move_to_end(key)
+            while len(self.events) > self.max_size:
+                self.events.popitem(last=False)
+        return event
+
 
 class ParseRGTStatus:
     """
@@ -34,44 +217,47 @@ class ParseRGTStatus:
         Parse the file and get the info for each test instance.
 
         :param file_path: Path to rgt_status.txt file.
-        :return: A list of dictionaries containing each test instances variables.
+        :return: A list of RgtStatusRecords for each test instance.
         """
         # Open file and get contents.
         with open(file_path) as file:
             file_contents = [line for line in file]
 
+        return self.parse_lines(file_contents)
+
+    def parse_lines(self, file_contents):
+        """
+        Parse lines from an rgt_status.txt file.
+
+        :param file_contents: The lines of the file in list format.
+        :return: A list of RgtStatusRecords for each test instance.
+        """
         # Remove the header from the file.
         file_contents = self.remove_header(file_contents)
 
-        # Create an empty list for holding job dictionaries.
-        job_dics = []
+        # Create an empty list for holding job records.
+        job_records = []
         # Go through each line and get important values. We use the index method for iteration so that we keep it in
         # order. This speeds up matching the harness_uid when updating the database.
         for i in range(len(file_contents)):
             line = file_contents[i]
             # Split the line.
             split = line.split()
-            # Get the time when the harness started recording and replace the 'T' with a ' '
-            # so that it is ready to be entered into the database.
-            harness_start = split[0].replace('T', ' ')
+            # Get the time when the harness started recording.
+            harness_start = parse_time(split[0])
             # Get the UID for the test instance.
             harness_uid = split[1]
             # Get the id for the job.
-            job_id = split[2]
-            # Get the status of each stage.
-            build_status = split[3]
-            submit_status = split[4]
-            check_status = split[5]
-
-            # Change the line into a dictionary and add it to the list.
-            job_dic = {'harness_start': harness_start,
-                       'harness_uid': harness_uid,
-                       'job_id': job_id,
-                       'build_status': build_status,
-                       'submit_status': submit_status,
-                       'check_status': check_status}
-            job_dics.append(job_dic)
-        return job_dics
+            job_id = parse_int(split[2])
+            # Get the status of each stage. Stages that have not finished are '***' and become None.
+            build_status = parse_int(split[3])
+            submit_status = parse_int(split[4])
+            check_status = parse_int(split[5])
+
+            # Change the line into a record and add it to the list.
+            job_records.append(RgtStatusRecord(harness_start, harness_uid, job_id, build_status, submit_status,
+                                               check_status))
+        return job_records
 
     def remove_header(self, file_contents):
         """
@@ -90,6 +276,70 @@ class ParseRGTStatus:
         return new_contents
 
 
+class ParseRGTStatusTail(ParseRGTStatus):
+    """
+    Parse only the lines that were added to rgt_status.txt files since they were last read. The harness only appends
+    to these files so most of each file has already been seen.
+    """
+
+    def __init__(self):
+        """
+        Constructor. No files have been read yet.
+        """
+        # The path to the file -> (offset after the last complete line read, offset of the start of that line,
+        # checksum of that line).
+        self.positions = {}
+
+    def parse_new_lines(self, file_path):
+        """
+        Parse the lines that were added to the file since the last time it was read. If the file was truncated or
+        rewritten, the whole file is parsed again. A last line without a newline is only parsed once it has every
+        field. If more is later written on that line, it is parsed again.
+
+        :param file_path: Path to rgt_status.txt file.
+        :returns: job_records: (list) A list of RgtStatusRecords for each new test instance.
+                  full: (boolean) Whether the whole file was parsed instead of only the new lines.
+        """
+        with open(file_path, mode='rb') as file:
+            # Test whether the part of the file that was already read is still the same.
+            full = True
+            state = self.positions.get(file_path)
+            if state is not None:
+                offset, last_line_start, checksum = state
+                size = file.seek(0, 2)
+                if size >= offset:
+                    file.seek(last_line_start)
+                    last_line = file.read(offset - last_line_start)
+                    if zlib.crc32(last_line) == checksum:
+                        full = False
+
+            # Read from the start or from where the last read ended. A last line that had no newline is read again if
+            # it was continued.
+            start = 0
+            if not full:
+                start = offset
+                if not last_line.endswith(b'\n') and file.read(1) not in (b'', b'\n'):
+                    start = last_line_start
+            file.seek(start)
+            data = file.read()
+
+        # Use complete lines and a last line without a newline if it has every field.
+        end = data.rfind(b'\n') + 1
+        partial = data[end:]
+        if len(partial.split()) >= len(RgtStatusRecord._fields) and not partial.lstrip().startswith(b'#'):
+            end = len(data)
+        lines = data[:end].splitlines(keepends=True)
+
+        # Remember where the next read should start.
+        if len(lines) != 0:
+            last_line = lines[-1]
+            self.positions[file_path] = (start + end, start + end - len(last_line), zlib.crc32(last_line))
+        elif full:
+            self.positions[file_path] = (0, 0, zlib.crc32(b''))
+
+        return self.parse_lines([line.decode() for line in lines]), full
+
+
 class ParseJobID:
     """
     Parse the job_id.txt file that each test has when run.
@@ -0,0 +1,228 @@
+"""
+This file decides when each rgt input is updated when harmony runs as a daemon.
+Each rgt input has its own interval with some jitter so that they do not all hit the file system and LSF at once.
+If an update takes longer than its interval, the interval is backed off until updates fit again.
+Each rgt input is updated on its own so that a slow input does not hold back when the others start.
+An rgt input can also be asked to update early, such as when one of its jobs finishes in LSF.
+"""
+import random
+import signal
+import threading
+import time
+import traceback
+
+
+class UpdateScheduler:
+    """
+    Repeatedly update a set of rgt inputs until told to stop.
+    """
+
+    def __init__(self, rgt_input_paths, update_function, refresh_time=300, max_refresh_time=3600, jitter=0.1,
+                 clock=time.time, min_refresh_time=0, executor=None):
+        """
+        Constructor for the scheduler.
+
+        :param rgt_input_paths: The paths to each rgt input.
+        :param update_function: A function that takes the path of an rgt input, updates it and returns a tuple
+        containing how many seconds its update took and whether it failed.
+        :param refresh_time: How many seconds to wait between the starts of updates for each rgt input.
+        :param max_refresh_time: The longest an interval can be backed off to.
+        :param jitter: The fraction of the interval that each wait is randomly changed by.
+        :param clock: The function that gets the current time.
+        :param min_refresh_time: The least seconds between the starts of updates of an rgt input that is asked to
+        update early.
+        :param executor: The executor that runs each update. It should be kept for as long as the scheduler runs. If
+        None, updates run one after another in the thread of the scheduler.
+        """
+        self.update_function = update_function
+        self.refresh_time = refresh_time
+        self.max_refresh_time = max(max_refresh_time, refresh_time)
+        self.jitter = jitter
+        self.clock = clock
+        self.min_refresh_time = min_refresh_time
+        self.executor = executor
+
+        # The current interval of each rgt input and when it is next due. Every input is due immediately.
+        now = self.clock()
+        self.intervals = {rgt_input_path: refresh_time for rgt_input_path in rgt_input_paths}
+        self.next_update = {rgt_input_path: now for rgt_input_path in rgt_input_paths}
+        # When the last update of each rgt input started and when the inputs that were asked to update early while
+        # they were updating should be updated again.
+        self.last_start = {}
+        self.requested = {}
+        # The rgt inputs that are updating right now. They are not due again until they are done.
+        self.running = set()
+        # Held while changing when inputs are due since early updates are asked for from other threads.
+        self.lock = threading.Lock()
+
+        # Set when the scheduler should stop after the current cycle.
+        self.stop_event = threading.Event()
+        # Set to wake the scheduler before the next input is due.
+        self.wake_event = threading.Event()
+        self.cycles = 0
+
+    def handle_signals(self):
+        """
+        Stop gracefully on SIGTERM or SIGINT. This can only be called from the main thread.
+        """
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+
+    def handle_stop(self, signum, frame):
+        """
+        Signal handler that asks the scheduler to stop.
+
+        :param signum: The signal number.
+        :param frame: The current stack frame.
+        """
+        print("Received signal " + str(signum) + ". Stopping after the current update.")
+        self.stop()
+
+    def stop(self):
+        """
+        Ask the scheduler to stop. Any update that is running finishes first.
+        """
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def request_update(self, rgt_input_path):
+        """
+        Ask for an rgt input to be updated as soon as possible. It is not updated more often than the minimum refresh
+        time. If it is updating right now, it is updated again once it is done.
+
+        :param rgt_input_path: The path to the rgt input.
+        """
+        with self.lock:
+            if rgt_input_path not in self.next_update:
+                return
+            earliest = self.last_start.get(rgt_input_path, float('-inf')) + self.min_refresh_time
+            self.requested[rgt_input_path] = earliest
+            self.next_update[rgt_input_path] = min(self.next_update[rgt_input_path], earliest)
+        self.wake_event.set()
+
+    def due_inputs(self):
+        """
+        Get the rgt inputs that are due to be updated and are not already updating.
+
+        :return: A list of rgt input paths.
+        """
+        now = self.clock()
+        with self.lock:
+            return [rgt_input_path for rgt_input_path, next_update in self.next_update.items()
+                    if next_update <= now and rgt_input_path not in self.running]
+
+    def next_interval(self, rgt_input_path, update_time):
+        """
+        Get the interval to use for an rgt input after an update. The interval is doubled whenever an update takes
+        longer than it and goes back to the refresh time once an update fits.
+
+        :param rgt_input_path: The path to the rgt input.
+        :param update_time: How many seconds the update took.
+        :return: The number of seconds until the next update should start before any jitter.
+        """
+        interval = self.intervals[rgt_input_path]
+        if update_time > interval:
+            interval = min(interval * 2, self.max_refresh_time)
+        elif update_time <= self.refresh_time:
+            interval = self.refresh_time
+        self.intervals[rgt_input_path] = interval
+        return interval
+
+    def jittered(self, interval):
+        """
+        Randomly change an interval by up to the jitter fraction in either direction.
+
+        :param interval: The interval in seconds.
+        :return: The changed interval.
+        """
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def run_cycle(self):
+        """
+        Start updating every rgt input that is due. Each one is scheduled again once its own update is done.
+
+        :return: A list of the rgt inputs that were started.
+        """
+        due = self.due_inputs()
+        if len(due) == 0:
+            return due
+
+        start = self.clock()
+        with self.lock:
+            for rgt_input_path in due:
+                self.last_start[rgt_input_path] = start
+                self.running.add(rgt_input_path)
+                # This update covers anything asked for before it started.
+                self.requested.pop(rgt_input_path, None)
+        self.cycles += 1
+
+        for rgt_input_path in due:
+            if self.executor is None:
+                self.finish_update(rgt_input_path, start, self.run_update(rgt_input_path, start))
+            else:
+                future = self.executor.submit(self.run_update, rgt_input_path, start)
+                future.add_done_callback(lambda done, path=rgt_input_path: self.finish_update(path, start,
+                                                                                               done.result()))
+        return due
+
+    def run_update(self, rgt_input_path, start):
+        """
+        Update a single rgt input. Any problem is printed and counted as a failed update.
+
+        :param rgt_input_path: The path to the rgt input.
+        :param start: When the update started.
+        :return: A tuple containing how many seconds the update took and whether it failed.
+        """
+        try:
+            return self.update_function(rgt_input_path)
+        except Exception:
+            traceback.print_exc()
+            return self.clock() - start, True
+
+    def finish_update(self, rgt_input_path, start, result):
+        """
+        Schedule the next update of an rgt input once its update is done.
+
+        :param rgt_input_path: The path to the rgt input.
+        :param start: When the update started.
+        :param result: A tuple containing how many seconds the update took and whether it failed.
+        """
+        update_time, _ = result
+        with self.lock:
+            interval = self.next_interval(rgt_input_path, update_time)
+            # Schedule from the start of the update so that the interval is the time between starts. If an early
+            # update was asked for while updating, that is sooner.
+            next_update = start + self.jittered(interval)
+            if rgt_input_path in self.requested:
+                next_update = min(next_update, self.requested.pop(rgt_input_path))
+            self.next_update[rgt_input_path] = next_update
+            self.running.discard(rgt_input_path)
+        if interval > self.refresh_time:
+            print("Updating " + rgt_input_path + " took " + str(update_time) + " seconds. Backing off to every "
+                  + str(interval) + " seconds.")
+        # The scheduler may be waiting for this input to be due.
+        self.wake_event.set()
+
+    def time_until_due(self):
+        """
+        Get how long until the next rgt input that is not updating is due.
+
+        :return: The number of seconds. 0 if something is already due.
+        """
+        with self.lock:
+            waiting = [next_update for rgt_input_path, next_update in self.next_update.items()
+                       if rgt_input_path not in self.running]
+        if len(waiting) == 0:
+            return self.refresh_time
+        return max(min(waiting) - self.clock(), 0)
+
+    def run(self):
+        """
+        Keep updating until stop is called. Updates that are still running when this returns are left to the
+        executor.
+        """
+        while not self.stop_event.is_set():
+            self.run_cycle()
+            # Sleep until the next input is due. Wake early if asked to stop or to update an input early.
+            self.wake_event.wait(self.time_until_due())
+            self.wake_event.clear()
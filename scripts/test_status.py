@@ -1,5 +1,4 @@
-from scripts.job_status import JobStatus
-from scripts import parse_file, config_functions
+from scripts import parse_file, config_functions, job_snapshot
 from scripts.notifications.slack_app import slack_application
 import os
 import sys
@@ -34,6 +33,8 @@ def check_tests(rgt_in_path, notifier=None):
 
     # Create the parser for the jobID.
     jobID_parser = parse_file.ParseJobID()
+    # Every test is checked against the same snapshot of LSF.
+    snapshot = job_snapshot.get_snapshot()
 
     # Go through each directory and if it is a problem, add it to the correct error string.
     for i in range(len(test_directories)):
@@ -51,8 +52,7 @@ def check_tests(rgt_in_path, notifier=None):
             continue
 
         # If the job is not in the queue/running then add it to the error string.
-        JS = JobStatus()
-        if not JS.in_queue(id):
+        if not snapshot.in_queue(id):
             error_not_queued += "\t" + test_list[i]['program'] + "\t" + test_list[i]['test'] + "\n"
             # Another problem.
             queued_problems = True
@@ -22,6 +22,18 @@ CREATE TABLE IF NOT EXISTS `test_rgt_check`
   UNIQUE KEY  `check_uid` ( `check_uid` )
   );
 
+# Hold test outputs by their hash so that identical outputs are only stored once. The body is compressed with zlib.
+CREATE TABLE IF NOT EXISTS `test_rgt_output_blob`
+  (
+  `output_hash`       CHAR (64)       NOT NULL,
+  `body`              MEDIUMBLOB      NOT NULL,
+  `size`              INT             NOT NULL,
+  `refcount`          INT             NOT NULL DEFAULT 0,
+  `timestamp`         TIMESTAMP       ,
+  PRIMARY KEY ( `output_hash` ),
+  KEY `refcount` ( `refcount` )
+  );
+
 # Hold info about test.
 CREATE TABLE IF NOT EXISTS `test_rgt_test`
   (
@@ -40,6 +52,19 @@ CREATE TABLE IF NOT EXISTS `test_rgt_test`
   `output_submit`     TEXT            NULL,
   `output_check`      TEXT            NULL,
   `output_report`     TEXT            NULL,
+  # The sha256 hash and size in bytes of each output and whether it is stored compressed with zlib and base64.
+  `output_build_hash`         CHAR (64)   NULL,
+  `output_build_size`         INT         NULL,
+  `output_build_compressed`   BOOLEAN     NOT NULL DEFAULT FALSE,
+  `output_submit_hash`        CHAR (64)   NULL,
+  `output_submit_size`        INT         NULL,
+  `output_submit_compressed`  BOOLEAN     NOT NULL DEFAULT FALSE,
+  `output_check_hash`         CHAR (64)   NULL,
+  `output_check_size`         INT         NULL,
+  `output_check_compressed`   BOOLEAN     NOT NULL DEFAULT FALSE,
+  `output_report_hash`        CHAR (64)   NULL,
+  `output_report_size`        INT         NULL,
+  `output_report_compressed`  BOOLEAN     NOT NULL DEFAULT FALSE,
   `system`            VARCHAR (64)    NOT NULL,
   `previous_job_id`   CHAR (36)       NOT NULL,
   `done`              BOOLEAN         NOT NULL,
@@ -8,6 +8,9 @@ DROP TABLE `test_rgt_test_event`;
 DELETE FROM `test_rgt_test`;
 DROP TABLE `test_rgt_test`;
 
+DELETE FROM `test_rgt_output_blob`;
+DROP TABLE `test_rgt_output_blob`;
+
 DELETE FROM `test_rgt_event`;
 DROP TABLE `test_rgt_event`;
 
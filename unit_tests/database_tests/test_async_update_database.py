@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from scripts.database import async_update_database
+
+
+class TestAsyncStages(unittest.TestCase):
+    """
+    Class to test the stages that AsyncUpdateDatabase is built from.
+    """
+
+    def run_pipeline(self, items, functions, workers=2, queue_size=1):
+        """
+        Run some items through a stage for each function.
+
+        :param items: The items to feed to the first stage.
+        :param functions: The function of each stage.
+        :param workers: How many workers each stage has.
+        :param queue_size: The size of each queue.
+        :return: Every result of the last stage.
+        """
+        results = []
+
+        async def pipeline():
+            queues = [asyncio.Queue(maxsize=queue_size) for _ in range(len(functions) + 1)]
+            tasks = [async_update_database.AsyncUpdateDatabase.feed(items, queues[0])]
+            for i, function in enumerate(functions):
+                tasks.append(async_update_database.AsyncUpdateDatabase.run_stage(function, executor, workers,
+                                                                                 queues[i], queues[i + 1]))
+
+            async def collect():
+                while True:
+                    item = await queues[-1].get()
+                    if item is async_update_database.STOP:
+                        return
+                    results.append(item)
+            tasks.append(collect())
+            await asyncio.gather(*tasks)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            asyncio.run(pipeline())
+        return results
+
+    def test_every_item(self):
+        """
+        Test that every item goes through every stage even when the queues are small.
+        """
+        results = self.run_pipeline(range(20), [lambda x: x + 1, lambda x: x * 2])
+        self.assertEqual(sorted((x + 1) * 2 for x in range(20)), sorted(results))
+
+    def test_dropped_items(self):
+        """
+        Test that results that are None are not passed on.
+        """
+        results = self.run_pipeline(range(10), [lambda x: x if x % 2 == 0 else None])
+        self.assertEqual([0, 2, 4, 6, 8], sorted(results))
+
+    def test_stages_overlap(self):
+        """
+        Test that a later stage works on items while an earlier stage is still running.
+        """
+        first_written = threading.Event()
+
+        def scan(x):
+            # The last item waits until the first item reaches the second stage.
+            if x == 4:
+                self.assertTrue(first_written.wait(5))
+            return x
+
+        def write(x):
+            first_written.set()
+            return x
+
+        self.assertEqual(list(range(5)), sorted(self.run_pipeline(range(5), [scan, write], workers=1)))
+
+    def test_error(self):
+        """
+        Test that a problem in a stage is raised.
+        """
+        def fail(x):
+            if x == 3:
+                raise ValueError("Bad item.")
+            return x
+
+        with self.assertRaises(ValueError):
+            self.run_pipeline(range(10), [fail])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import os
+import shutil
+import tempfile
+from scripts.database import change_detector
+
+
+class TestChangeDetector(unittest.TestCase):
+    """
+    Class to test that change_detector.py notices changes to tests.
+    """
+
+    def setUp(self):
+        """
+        Create a Status directory with one instance in it.
+        """
+        self.test_path = tempfile.mkdtemp()
+        self.instance_path = os.path.join(self.test_path, 'instance')
+        os.mkdir(self.instance_path)
+        self.rgt_status_path = os.path.join(self.test_path, 'rgt_status.txt')
+        with open(self.rgt_status_path, mode='w+') as f:
+            f.write('0000-00-01 instance 1 0 0 0\n')
+
+        self.CD = change_detector.ChangeDetector()
+
+    def record(self, unfinished):
+        """
+        Record the test as if it had just been read.
+
+        :param unfinished: Whether any instance is unfinished.
+        """
+        fingerprints = self.CD.test_fingerprints(self.test_path)
+        self.CD.record_test(self.test_path, fingerprints, [self.instance_path], unfinished)
+
+    def test_new_test_is_changed(self):
+        """
+        Test that a test that has never been read is not skipped.
+        """
+        fingerprints = self.CD.test_fingerprints(self.test_path)
+        self.assertFalse(self.CD.test_unchanged(self.test_path, fingerprints))
+
+    def test_done_test_is_skipped(self):
+        """
+        Test that a test with only done instances is skipped until something changes.
+        """
+        self.record(unfinished=False)
+        self.assertTrue(self.CD.test_unchanged(self.test_path, self.CD.test_fingerprints(self.test_path)))
+
+        # Append a line to the status file.
+        with open(self.rgt_status_path, mode='a') as f:
+            f.write('0000-00-02 instance_2 2 0 0 0\n')
+        self.assertFalse(self.CD.test_unchanged(self.test_path, self.CD.test_fingerprints(self.test_path)))
+
+    def test_instance_change_is_noticed(self):
+        """
+        Test that adding a file to an instance directory is noticed.
+        """
+        self.record(unfinished=False)
+
+        # Writing a file to the instance directory changes its fingerprint.
+        with open(os.path.join(self.instance_path, 'Event_110.txt'), mode='w+') as f:
+            f.write('event_filename=Event_110.txt')
+        os.utime(self.instance_path, ns=(0, 0))
+        self.assertFalse(self.CD.test_unchanged(self.test_path, self.CD.test_fingerprints(self.test_path)))
+
+    def test_unfinished_test_is_not_skipped(self):
+        """
+        Test that a test with unfinished instances is always read.
+        """
+        self.record(unfinished=True)
+        self.assertFalse(self.CD.test_unchanged(self.test_path, self.CD.test_fingerprints(self.test_path)))
+
+    def test_finished_test_rests(self):
+        """
+        Test that a finished test is not checked again until the finished refresh time has passed.
+        """
+        self.CD.finished_refresh_time = 60
+        self.record(unfinished=False)
+        self.assertTrue(self.CD.test_resting(self.test_path))
+
+        # Once the time has passed, the test is checked again.
+        self.CD.checked_at[self.test_path] -= 61
+        self.assertFalse(self.CD.test_resting(self.test_path))
+
+        # A new instance is noticed while the test rests.
+        self.CD.checked_at[self.test_path] += 61
+        os.mkdir(os.path.join(self.test_path, 'instance_2'))
+        os.utime(self.test_path, ns=(0, 0))
+        self.assertFalse(self.CD.test_resting(self.test_path))
+
+        # Unfinished tests never rest.
+        self.record(unfinished=True)
+        self.assertFalse(self.CD.test_resting(self.test_path))
+
+    def test_instance_event_paths(self):
+        """
+        Test that the event paths of an instance are only given back while the directory is unchanged.
+        """
+        event_paths, current = self.CD.get_instance(self.instance_path)
+        self.assertIsNone(event_paths)
+        self.CD.record_instance(self.instance_path, current, ['event_path'])
+
+        event_paths, _ = self.CD.get_instance(self.instance_path)
+        self.assertEqual(event_paths, ['event_path'])
+
+        os.utime(self.instance_path, ns=(0, 0))
+        event_paths, _ = self.CD.get_instance(self.instance_path)
+        self.assertIsNone(event_paths)
+
+    def test_forget_instance(self):
+        """
+        Test that a forgotten instance directory is listed again even though it has not changed.
+        """
+        _, current = self.CD.get_instance(self.instance_path)
+        self.CD.record_instance(self.instance_path, current, ['event_path'])
+        self.CD.forget_instance(self.instance_path)
+        event_paths, _ = self.CD.get_instance(self.instance_path)
+        self.assertIsNone(event_paths)
+        # Forgetting an instance that was never listed does nothing.
+        self.CD.forget_instance(os.path.join(self.test_path, 'missing'))
+
+    def tearDown(self):
+        """
+        Remove the directories.
+        """
+        shutil.rmtree(self.test_path)
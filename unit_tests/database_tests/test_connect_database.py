@@ -0,0 +1,57 @@
+import unittest
+from scripts.database import connect_database
+from scripts import config_functions
+
+
+class TestDatabaseConnector(unittest.TestCase):
+    """
+    Class to test the connection pool in connect_database.py
+    """
+
+    def setUp(self):
+        """
+        Initialize a connector with a small pool.
+        """
+        database_conf = config_functions.get_config()['CLIENT']
+        self.connector = connect_database.DatabaseConnector(database_conf, max_connections=2)
+
+    def test_checkout_reuses_connection(self):
+        """
+        Test that checking out a connection twice in a row only opens one connection.
+        """
+        with self.connector.checkout() as db:
+            first = db
+        with self.connector.checkout() as db:
+            second = db
+
+        self.assertIs(first, second)
+        self.assertEqual(self.connector.pool_stats(), {'opened': 1, 'reused': 1})
+
+    def test_nested_checkouts_open_new_connections(self):
+        """
+        Test that a connection is not handed out twice while it is checked out.
+        """
+        with self.connector.checkout() as first:
+            with self.connector.checkout() as second:
+                self.assertIsNot(first, second)
+
+        self.assertEqual(self.connector.pool_stats()['opened'], 2)
+
+    def test_broken_connection_is_replaced(self):
+        """
+        Test that a connection closed while idle is not handed out again.
+        """
+        with self.connector.checkout() as db:
+            first = db
+        first.close()
+
+        with self.connector.checkout() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def tearDown(self):
+        """
+        Close the pooled connections.
+        """
+        self.connector.close()
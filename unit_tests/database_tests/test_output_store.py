@@ -0,0 +1,36 @@
+import unittest
+from scripts.database import output_store
+
+
+class TestOutputStore(unittest.TestCase):
+    """
+    Class to test that output_store.py stores outputs so they can be read back.
+    """
+
+    def test_round_trip(self):
+        """
+        Test that outputs can be decoded back to their text whether they were compressed or not.
+        """
+        text = 'building . . .\nAll done\n' * 100
+        for compress in [False, True]:
+            fields = output_store.output_fields('build', text.encode('utf-8'), compress)
+            self.assertEqual(output_store.decode_output(fields['output_build'], fields['output_build_compressed']),
+                             text)
+
+    def test_side_fields(self):
+        """
+        Test that the hash and size describe the uncompressed output.
+        """
+        data = b'submitting . . .\n' * 100
+        fields = output_store.output_fields('submit', data, compress=True)
+        self.assertEqual(fields['output_submit_hash'], output_store.hash_output(data))
+        self.assertEqual(fields['output_submit_size'], len(data))
+        self.assertTrue(fields['output_submit_compressed'])
+        # Repetitive output should be much smaller once compressed.
+        self.assertLess(len(fields['output_submit']), len(data))
+
+    def test_decode_missing(self):
+        """
+        Test that a missing output stays missing.
+        """
+        self.assertIsNone(output_store.decode_output(None, compressed=True))
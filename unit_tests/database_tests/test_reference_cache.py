@@ -0,0 +1,99 @@
+import unittest
+from scripts.database import reference_cache
+
+
+class FakeCursor:
+    """
+    A cursor that answers the queries for the event and check tables.
+    """
+
+    def __init__(self, connector):
+        self.connector = connector
+        self.rows = []
+
+    def execute(self, sql):
+        if self.connector.event_table in sql:
+            self.rows = list(self.connector.event_ids.items())
+        else:
+            self.rows = [(check_uid,) for check_uid in self.connector.check_uids]
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnector:
+    """
+    A connector that counts how many times the tables are read.
+    """
+
+    def __init__(self, event_ids, check_uids):
+        self.event_table = 'test_rgt_event'
+        self.event_ids = event_ids
+        self.check_uids = check_uids
+        self.connections = 0
+
+    def connect(self):
+        self.connections += 1
+        return self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close_connection(self, db):
+        pass
+
+
+class TestReferenceCache(unittest.TestCase):
+    """
+    Class to test that reference_cache.py only reloads the tables when it needs to.
+    """
+
+    def setUp(self):
+        """
+        Create a cache for an event table with one event and a check table with one check status.
+        """
+        self.connector = FakeConnector({140: 1}, {0})
+        self.cache = reference_cache.ReferenceCache(self.connector, 'test_rgt_event', 'test_rgt_check')
+
+    def test_known_keys(self):
+        """
+        Test that known keys are found after a single load.
+        """
+        self.assertEqual(self.cache.get_event_id(140), 1)
+        self.assertTrue(self.cache.legal_check_status(0))
+        self.assertEqual(self.connector.connections, 1)
+
+    def test_alternating_misses(self):
+        """
+        Test that two missing keys looked up in turn only reload the tables once each.
+        """
+        self.cache.refresh()
+        for _ in range(5):
+            self.assertIsNone(self.cache.get_event_id(999))
+            self.assertFalse(self.cache.legal_check_status(7))
+        # One load at the start and one for each missing key.
+        self.assertEqual(self.connector.connections, 3)
+
+    def test_miss_found_after_reload(self):
+        """
+        Test that a key added to the table after the tables were loaded is found.
+        """
+        self.cache.refresh()
+        self.connector.event_ids[150] = 2
+        self.assertEqual(self.cache.get_event_id(150), 2)
+
+    def test_stale_reload_clears_misses(self):
+        """
+        Test that a missing key can cause another reload once the tables were reloaded for being stale.
+        """
+        self.cache.get_event_id(999)
+        self.cache.loaded_at -= self.cache.refresh_time + 1
+        self.cache.legal_check_status(0)
+        self.assertEqual(self.cache.misses, set())
+        connections = self.connector.connections
+        self.cache.get_event_id(999)
+        self.assertEqual(self.connector.connections, connections + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
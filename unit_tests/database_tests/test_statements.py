@@ -0,0 +1,65 @@
+import unittest
+from scripts.database import statements
+
+
+class TestTestStatements(unittest.TestCase):
+    """
+    Class to test that statements.py makes statements with a fixed shape.
+    """
+
+    def setUp(self):
+        """
+        Create the statements for the test tables.
+        """
+        self.statements = statements.TestStatements('test_rgt_test', 'test_rgt_test_event')
+
+    def test_update_params_have_fixed_shape(self):
+        """
+        Test that every update has the same number of values no matter which fields are given.
+        """
+        few = self.statements.update_test_params({'done': True}, 1)
+        many = self.statements.update_test_params({'job_id': 11, 'build_status': 0, 'output_build': None,
+                                                   'done': False}, 2)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(few), self.statements.update_test.count('%s'))
+
+        # Fields that are not given are not set. Fields that are given are set even when they are None.
+        index = 2 * statements.TEST_UPDATE_COLUMNS.index('output_build')
+        self.assertEqual(few[index:index + 2], (False, None))
+        self.assertEqual(many[index:index + 2], (True, None))
+        # The test id is last.
+        self.assertEqual(many[-1], 2)
+
+    def test_insert_params(self):
+        """
+        Test that columns that are not given while adding a test get their default.
+        """
+        params = self.statements.insert_test_params({'harness_uid': 'instance', 'job_id': 11})
+        self.assertEqual(len(params), self.statements.insert_test.count('%s'))
+        values = dict(zip(statements.TEST_COLUMNS, params))
+        self.assertEqual(values['harness_uid'], 'instance')
+        self.assertEqual(values['job_id'], 11)
+        self.assertIsNone(values['build_status'])
+        self.assertFalse(values['done'])
+        self.assertFalse(values['output_build_compressed'])
+
+    def test_upsert_params(self):
+        """
+        Test that an upsert only changes the columns that were given when the test is already in the table.
+        """
+        params = self.statements.upsert_test_params({'harness_uid': 'instance', 'job_id': 11})
+        self.assertEqual(len(params), self.statements.upsert_test.count('%s'))
+        flags = dict(zip(statements.TEST_UPDATE_COLUMNS, params[len(statements.TEST_COLUMNS):]))
+        self.assertTrue(flags['job_id'])
+        self.assertFalse(flags['output_build_hash'])
+        self.assertFalse(flags['done'])
+        self.assertIn("output_build = IF(%s, VALUES(output_build), output_build)", self.statements.upsert_test)
+
+    def test_unknown_field(self):
+        """
+        Test that fields that are not columns are not silently dropped.
+        """
+        with self.assertRaises(KeyError):
+            self.statements.update_test_params({'harness_uid': 'instance'}, 1)
+        with self.assertRaises(KeyError):
+            self.statements.insert_test_params({'not_a_column': 1})
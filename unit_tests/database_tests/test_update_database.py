@@ -1,9 +1,12 @@
 import unittest
 import os
 from scripts.database import update_database
+from scripts.database import async_update_database
 from scripts.database import create_database
 from scripts import config_functions
+from scripts import job_transitions
 from scripts.database import connect_database
+from scripts.database import output_store
 import shutil
 from random import random
 from contextlib import contextmanager
@@ -363,6 +366,85 @@ class InstanceCreator:
             f.write(text)
 
 
+class FakeResult:
+    """
+    The result of a statement with some number of warnings.
+    """
+
+    def __init__(self, warning_count):
+        self.warning_count = warning_count
+
+
+class FakeConnection:
+    """
+    A connection that gives back some warnings for every statement.
+    """
+
+    def __init__(self, database_warnings):
+        self.database_warnings = database_warnings
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def show_warnings(self):
+        return self.database_warnings
+
+    def commit(self):
+        pass
+
+
+class FakeCursor:
+    """
+    A cursor that records each statement it runs.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._result = None
+
+    def execute(self, sql, row=None):
+        self.db.statements.append((sql, row))
+        self._result = FakeResult(len(self.db.database_warnings))
+
+    def executemany(self, sql, rows):
+        self.db.statements.append((sql, list(rows)))
+        self._result = FakeResult(len(self.db.database_warnings))
+
+
+class TestDatabaseWarnings(unittest.TestCase):
+    """
+    Class to test that warnings from the database are treated as errors without changing the warning filters.
+    """
+
+    def test_no_warnings(self):
+        """
+        Test that an insert sends every row at once and an update sends each row on its own.
+        """
+        db = FakeConnection([])
+        self.assertTrue(update_database.execute_many("INSERT INTO t (a) VALUES (%s)", [(1,), (2,)], db))
+        self.assertTrue(update_database.execute_many("UPDATE t SET a = %s", [(1,), (2,)], db))
+        self.assertEqual(3, len(db.statements))
+
+    def test_warning_fails(self):
+        """
+        Test that a warning makes the statement fail and is recorded.
+        """
+        db = FakeConnection([('Warning', 1452, 'Cannot add or update a child row')])
+        failed_statements = []
+        with self.assertWarns(UserWarning):
+            self.assertFalse(update_database.execute_many("INSERT IGNORE INTO t (a) VALUES (%s)", [(1,)], db,
+                                                          failed_statements))
+        self.assertIn('child row', failed_statements[0].error)
+
+    def test_duplicate_ignored(self):
+        """
+        Test that rows skipped by INSERT IGNORE because they are already in the table are not a failure.
+        """
+        db = FakeConnection([('Warning', 1062, "Duplicate entry '1' for key 'PRIMARY'")])
+        self.assertTrue(update_database.execute_many("INSERT IGNORE INTO t (a) VALUES (%s)", [(1,)], db))
+
+
 class TestUpdateDatabase(unittest.TestCase):
     """
     This class tests that updating the database works correctly.
@@ -460,6 +542,7 @@ class TestUpdateDatabase(unittest.TestCase):
         self.test_event_table = 'test_rgt_test_event'
         self.event_table = 'test_rgt_event'
         self.check_table = 'test_rgt_check'
+        self.output_blob_table = 'test_rgt_output_blob'
         self.IC = InstanceCreator()
 
         # Set the path to the drop tables file.
@@ -484,17 +567,22 @@ class TestUpdateDatabase(unittest.TestCase):
         # Initialize the directories for the test.
         self.init_directories()
 
-    def init_update_database(self, rgt_input_path=''):
+    def init_update_database(self, rgt_input_path='', scan_workers=1, updater_class=update_database.UpdateDatabase,
+                             **kwargs):
         """
         Initialize the UpdateDatabase class. Everything should be setup before initializing the class.
 
         :param rgt_input_path: The path to the rgt input file.
+        :param scan_workers: The number of threads reading test directories at once.
+        :param updater_class: The class of the updater such as UpdateDatabase or AsyncUpdateDatabase.
+        :param kwargs: Any other arguments for the updater.
         """
-        self.UD = update_database.UpdateDatabase(self.connector, rgt_input_path, test_table=self.test_table,
-                                                 test_event_table=self.test_event_table, event_table=self.event_table,
-                                                 check_table=self.check_table,
-                                                 replacement_lsf_exit_function=self.IC.replacement_lsf_exit_function,
-                                                 replacement_in_queue_function=self.IC.replacement_in_queue_function)
+        self.UD = updater_class(self.connector, rgt_input_path, test_table=self.test_table,
+                                test_event_table=self.test_event_table, event_table=self.event_table,
+                                check_table=self.check_table,
+                                replacement_lsf_exit_function=self.IC.replacement_lsf_exit_function,
+                                replacement_in_queue_function=self.IC.replacement_in_queue_function,
+                                scan_workers=scan_workers, **kwargs)
 
     def insert_event(self, event_uid, event_name='test'):
         """
@@ -584,6 +672,27 @@ class TestUpdateDatabase(unittest.TestCase):
         event_id = self.UD.get_event_id(event_uid)
         self.assertEqual(2, event_id)
 
+    def test_legal_check_status(self):
+        """
+        Test whether the legal_check_status function works and picks up new checks.
+        """
+        # Insert a check.
+        db = self.connector.connect()
+        cursor = db.cursor()
+        sql = "INSERT INTO {table} (check_uid, check_desc) VALUES ({check_uid}, 'test')"
+        cursor.execute(sql.format(table=self.check_table, check_uid=0))
+        db.commit()
+
+        self.init_update_database()
+        self.assertTrue(self.UD.legal_check_status('0'))
+        self.assertFalse(self.UD.legal_check_status('1'))
+
+        # A check that is added later is found since the cache is reloaded when a check is missing.
+        cursor.execute(sql.format(table=self.check_table, check_uid=2))
+        db.commit()
+        db.close()
+        self.assertTrue(self.UD.legal_check_status(2))
+
     def test_get_event_uid(self):
         """
         Test whether the get_event_uid function works.
@@ -604,6 +713,17 @@ class TestUpdateDatabase(unittest.TestCase):
         event_uid = self.UD.get_event_uid(event_dic)
         self.assertIsNone(event_uid)
 
+        # Test that the uid is matched exactly instead of by a digit that it contains.
+        event_dic = {'event_filename': 'Event_120_description.txt'}
+        event_uid = self.UD.get_event_uid(event_dic)
+        self.assertIsNone(event_uid)
+
+        # An event that is added while the updater is running is found once it is in the event table.
+        self.insert_event(3)
+        event_dic = {'event_filename': 'Event_3.txt'}
+        event_uid = self.UD.get_event_uid(event_dic)
+        self.assertEqual(event_uid, 3)
+
     def test_insert_parsed_event_into_event_table(self):
         """
         Test whether the insert_parsed_event_into_event_table function works.
@@ -632,6 +752,119 @@ class TestUpdateDatabase(unittest.TestCase):
         self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1}))
         self.assertTrue(self.in_table(self.test_event_table, **{'event_id': 1}))
 
+    def test_flush_event_table(self):
+        """
+        Test that held off events are written together and duplicates are ignored.
+        """
+        # Insert a new test into the test table since the unique key is needed.
+        db = self.connector.connect()
+        with db.cursor() as cursor:
+            sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, " \
+                  "application, testname, system, previous_job_id, done)" \
+                  " VALUES ('2', '0000-00-00', 'path', 'app', 'test', 'sys', 1, FALSE)"
+            sql = sql.format(table=self.test_table)
+            cursor.execute(sql)
+        db.commit()
+        db.close()
+
+        # Insert two events into the event table.
+        self.insert_event(1)
+        self.insert_event(2)
+
+        self.init_update_database()
+
+        # Hold off the events and check that nothing is written until the block is done.
+        with self.UD.deferred_flush():
+            self.UD.insert_parsed_event_into_event_table(1, 1, '0000-00-01')
+            self.UD.insert_parsed_event_into_event_table(1, 1, '0000-00-01')
+            self.UD.insert_parsed_event_into_event_table(1, 2, '0000-00-02')
+            self.assertFalse(self.in_table(self.test_event_table, **{'test_id': 1}))
+
+        # Test that both events were written once.
+        self.assertEqual(self.UD.events_inserted, 2)
+        self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 1}))
+        self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 2}))
+
+        # Writing an event that already exists does not insert anything.
+        self.UD.insert_parsed_event_into_event_table(1, 2, '0000-00-02')
+        self.assertEqual(self.UD.events_inserted, 2)
+
+    def test_flush_test_table(self):
+        """
+        Test that held off test updates are written together.
+        """
+        # Insert two tests into the test table.
+        db = self.connector.connect()
+        with db.cursor() as cursor:
+            for harness_uid in ['1', '2']:
+                sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, " \
+                      "application, testname, system, previous_job_id, done)" \
+                      " VALUES ('{harness_uid}', '0000-00-00', 'path', 'app', 'test', 'sys', 1, FALSE)"
+                cursor.execute(sql.format(table=self.test_table, harness_uid=harness_uid))
+        db.commit()
+        db.close()
+
+        self.init_update_database()
+
+        # Hold off the updates and check that nothing is written until the block is done.
+        with self.UD.deferred_flush():
+            self.UD.test_rows.append((1, {'build_status': 0, 'done': True}))
+            self.UD.test_rows.append((2, {'job_id': 12}))
+            self.assertFalse(self.in_table(self.test_table, **{'test_id': 1, 'done': True}))
+
+        # Both were written and fields that were not given were left alone.
+        self.assertEqual(len(self.UD.test_rows), 0)
+        self.assertTrue(self.in_table(self.test_table, **{'test_id': 1, 'build_status': 0, 'done': True}))
+        self.assertTrue(self.in_table(self.test_table, **{'test_id': 2, 'job_id': '12', 'done': False}))
+
+    def test_directory_transaction(self):
+        """
+        Test that writes in a directory transaction are committed together, rolled back together and that failed
+        statements are recorded.
+        """
+        # Insert a test into the test table.
+        db = self.connector.connect()
+        with db.cursor() as cursor:
+            sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, " \
+                  "application, testname, system, previous_job_id, done)" \
+                  " VALUES ('1', '0000-00-00', 'path', 'app', 'test', 'sys', 1, FALSE)"
+            cursor.execute(sql.format(table=self.test_table))
+        db.commit()
+        db.close()
+        self.insert_event(1)
+
+        self.init_update_database()
+
+        # Nothing is kept if the directory fails part way through.
+        with self.assertRaises(RuntimeError):
+            with self.UD.directory_transaction():
+                self.UD.test_rows.append((1, {'done': True}))
+                self.UD.flush_test_table()
+                raise RuntimeError
+        self.assertTrue(self.in_table(self.test_table, **{'test_id': 1, 'done': False}))
+
+        # A failed statement is undone and recorded without losing the rest of the transaction.
+        with self.UD.directory_transaction():
+            self.UD.test_rows.append((1, {'build_status': 0}))
+            self.UD.flush_test_table()
+            # This row is missing its event time. INSERT IGNORE only turns some errors into warnings depending on the
+            # server, but a row that can not even be formatted into the statement always fails.
+            self.UD.event_rows.append((1, 1))
+            with self.assertWarns(UserWarning):
+                self.UD.flush_event_table()
+            self.UD.insert_parsed_event_into_event_table(1, 1, '0000-00-01')
+        self.assertEqual(len(self.UD.failed_statements), 1)
+        self.assertEqual(self.UD.failed_statements[0].rows, [(1, 1)])
+        self.assertTrue(self.in_table(self.test_table, **{'test_id': 1, 'build_status': 0}))
+        self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 1}))
+
+        # With a batch size, the transaction is committed as rows are written.
+        self.UD.commit_batch_size = 1
+        with self.UD.directory_transaction():
+            self.UD.test_rows.append((1, {'done': True}))
+            self.UD.flush_test_table()
+            self.assertTrue(self.in_table(self.test_table, **{'test_id': 1, 'done': True}))
+
     def test_get_exit_status(self):
         """
         Test whether the get_exit_status function works.
@@ -651,6 +884,8 @@ class TestUpdateDatabase(unittest.TestCase):
         # Assert that the correct exit values are returned.
         self.assertEqual(exit_status_0, self.UD.get_exit_status(job_id_0))
         self.assertEqual(exit_status_1, self.UD.get_exit_status(job_id_1))
+        # A job id that has not been set yet has no exit status.
+        self.assertIsNone(self.UD.get_exit_status(None))
 
     def test_output_text(self):
         """
@@ -718,9 +953,9 @@ class TestUpdateDatabase(unittest.TestCase):
         # No exit status key because it is set to null and no status problems.
         # No submit or check status because they are both not integers.
         # Expect output build and submit because they will both have files.
-        expected_result = {'job_id': job_id, 'build_status': int(build_status),
-                           'output_build': build_output_text, 'output_submit': submit_output_text,
-                           'done': False}
+        expected_result = {'job_id': job_id, 'build_status': int(build_status), 'done': False,
+                           **output_store.output_fields('build', build_output_text.encode()),
+                           **output_store.output_fields('submit', submit_output_text.encode())}
         for key in expected_result.keys():
             self.assertIn(key, update_fields.keys())
 
@@ -767,8 +1002,9 @@ class TestUpdateDatabase(unittest.TestCase):
         # No check status because it is not an int.
         # Expect output build and submit because they will both have files.
         expected_result = {'job_id': job_id, 'build_status': int(build_status), 'submit_status': int(submit_status),
-                           'output_build': build_output_text, 'output_submit': submit_output_text,
-                           'lsf_exit_status': exit_status, 'done': True}
+                           'lsf_exit_status': exit_status, 'done': True,
+                           **output_store.output_fields('build', build_output_text.encode()),
+                           **output_store.output_fields('submit', submit_output_text.encode())}
         for key in expected_result.keys():
             self.assertIn(key, list(update_fields.keys()))
 
@@ -778,28 +1014,6 @@ class TestUpdateDatabase(unittest.TestCase):
         for key in update_fields.keys():
             self.assertIn(key, expected_result.keys())
 
-    def test_get_update_sql(self):
-        """
-        Test that get_update_sql works.
-        """
-        # Set the update fields.
-        update_fields = {'int_1': 10, 'int_2': 20, 'str_1': 'one', 'str_2': 'two'}
-        test_id = 100
-
-        self.init_update_database()
-
-        # Create the update sql.
-        sql = self.UD.get_update_sql(update_fields, test_id)
-
-        # Assert that the correct sql is there.
-        self.assertIn('UPDATE test_rgt_test', sql)
-        self.assertIn('int_1 = 10', sql)
-        self.assertIn('int_2 = 20', sql)
-        self.assertIn("str_1 = 'one'", sql)
-        self.assertIn("str_2 = 'two'", sql)
-        self.assertIn('WHERE', sql)
-        self.assertIn('test_id = ' + str(test_id), sql)
-
     def test_update_test_table(self):
         """
         Test that the test table can be updated for some test.
@@ -856,6 +1070,192 @@ class TestUpdateDatabase(unittest.TestCase):
                          'system': system}
         self.assertTrue(self.in_table(self.test_table, **expected_vals))
 
+    def test_unchanged_outputs_are_skipped(self):
+        """
+        Test that outputs are only sent again when their hash changes and that compressed outputs can be read back.
+        """
+        # Initialize test variables.
+        program_name = 'program'
+        test_name = 'test'
+        time = '0000-00-00'
+        harness_uid = 'instance'
+        job_id = 11
+        outputs = {'build': 'building . . .\nAll done', 'submit': 'submitting . . .\nAll done'}
+        events = {'0': {}}
+
+        # Create an rgt status line and a test instance.
+        rgt_line = self.IC.create_rgt_status_line(time, harness_uid, job_id, '0', '0', '***')
+        instance = self.IC.create_test_instance(program_name, test_name, harness_uid, time, job_id, '0', '0', '***',
+                                                outputs, 'system', events, None, False)
+        run_archive = instance.complete_events['0']['run_archive']
+
+        # Insert the test into the test table.
+        sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, application, testname, system, " \
+              "previous_job_id, done) VALUES ('{harness_uid}', '{time}', 'path', '{application}', '{testname}', " \
+              "'system', '{harness_uid}', FALSE)"
+        sql = sql.format(table=self.test_table, harness_uid=harness_uid, time=time, application=program_name,
+                         testname=test_name)
+        db = self.connector.connect()
+        cursor = db.cursor()
+        cursor.execute(sql)
+        db.commit()
+        db.close()
+
+        # Store the outputs compressed.
+        self.init_update_database()
+        self.UD.compress_outputs = True
+        self.UD.update_test_table(1, run_archive, run_archive, rgt_line)
+        self.assertTrue(self.in_table(self.test_table, **{'output_build_hash': output_store.hash_output(
+            outputs['build'].encode()), 'output_build_compressed': True}))
+
+        # The stored text decodes back to the output.
+        db = self.connector.connect()
+        cursor = db.cursor()
+        cursor.execute("SELECT output_build FROM " + self.test_table + " WHERE test_id = 1")
+        stored_text = cursor.fetchone()[0]
+        db.close()
+        self.assertEqual(output_store.decode_output(stored_text, compressed=True), outputs['build'])
+
+        # Once the hashes are loaded, unchanged outputs are left out.
+        self.UD.get_job_tuples([harness_uid])
+        update_fields = self.UD.get_update_fields(rgt_line, run_archive, run_archive, test_id=1)
+        self.assertNotIn('output_build', update_fields)
+        self.assertNotIn('output_submit', update_fields)
+
+    def test_output_blobs(self):
+        """
+        Test that identical outputs are stored once in the output blob table and that references are counted.
+        """
+        # Initialize test variables.
+        time = '0000-00-00'
+        harness_uids = ['instance_A', 'instance_B']
+        outputs = {'build': 'building . . .\nAll done', 'submit': 'submitting . . .\nAll done'}
+        events = {'0': {}}
+
+        # Create two instances with the same outputs.
+        instances = []
+        rgt_lines = []
+        for i, harness_uid in enumerate(harness_uids):
+            rgt_lines.append(self.IC.create_rgt_status_line(time, harness_uid, 11 + i, '0', '0', '***'))
+            instances.append(self.IC.create_test_instance('program', 'test', harness_uid, time, 11 + i, '0', '0',
+                                                           '***', outputs, 'system', events, None, False))
+
+            # Insert the test into the test table.
+            sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, application, testname, system, " \
+                  "previous_job_id, done) VALUES ('{harness_uid}', '{time}', 'path', 'program', 'test', 'system', " \
+                  "'{harness_uid}', FALSE)"
+            db = self.connector.connect()
+            cursor = db.cursor()
+            cursor.execute(sql.format(table=self.test_table, harness_uid=harness_uid, time=time))
+            db.commit()
+            db.close()
+
+        self.init_update_database()
+        self.UD.output_blob_table = self.output_blob_table
+        for i in range(len(harness_uids)):
+            run_archive = instances[i].complete_events['0']['run_archive']
+            self.UD.update_test_table(i + 1, run_archive, run_archive, rgt_lines[i])
+
+        build_hash = output_store.hash_output(outputs['build'].encode())
+        db = self.connector.connect()
+        cursor = db.cursor()
+        # The test table only holds the hash.
+        cursor.execute("SELECT output_build, output_build_hash FROM " + self.test_table + " WHERE test_id = 1")
+        self.assertEqual(cursor.fetchone(), (None, build_hash))
+        # Each output is stored once and referenced by both tests.
+        cursor.execute("SELECT body, refcount FROM " + self.output_blob_table + " WHERE output_hash = %s",
+                       (build_hash,))
+        body, refcount = cursor.fetchone()
+        self.assertEqual(output_store.decompress_blob(body), outputs['build'])
+        self.assertEqual(refcount, 2)
+        cursor.execute("SELECT COUNT(*) FROM " + self.output_blob_table)
+        self.assertEqual(cursor.fetchone()[0], 2)
+        db.close()
+
+        # Change the build output of the first test. The old blob loses a reference.
+        run_archive = instances[0].complete_events['0']['run_archive']
+        with open(os.path.join(run_archive, 'output_build.txt'), mode='w') as f:
+            f.write('building again')
+        self.UD.get_job_tuples(harness_uids)
+        self.UD.update_test_table(1, run_archive, run_archive, rgt_lines[0])
+
+        db = self.connector.connect()
+        cursor = db.cursor()
+        cursor.execute("SELECT refcount FROM " + self.output_blob_table + " WHERE output_hash = %s", (build_hash,))
+        self.assertEqual(cursor.fetchone()[0], 1)
+        cursor.execute("SELECT refcount FROM " + self.output_blob_table + " WHERE output_hash = %s",
+                       (output_store.hash_output(b'building again'),))
+        self.assertEqual(cursor.fetchone()[0], 1)
+        db.close()
+
+    def test_collect_output_blobs(self):
+        """
+        Test that outputs that are no longer referenced are deleted and that an output that was deleted after it was
+        stored is stored again when it is referenced.
+        """
+        # Initialize test variables.
+        time = '0000-00-00'
+        harness_uids = ['instance_A', 'instance_B']
+        outputs = {'build': 'building . . .\nAll done'}
+        events = {'0': {}}
+
+        # Create two instances with the same output.
+        instances = []
+        rgt_lines = []
+        for i, harness_uid in enumerate(harness_uids):
+            rgt_lines.append(self.IC.create_rgt_status_line(time, harness_uid, 11 + i, '0', '0', '***'))
+            instances.append(self.IC.create_test_instance('program', 'test', harness_uid, time, 11 + i, '0', '0',
+                                                           '***', outputs, 'system', events, None, False))
+
+            # Insert the test into the test table.
+            sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, application, testname, system, " \
+                  "previous_job_id, done) VALUES ('{harness_uid}', '{time}', 'path', 'program', 'test', 'system', " \
+                  "'{harness_uid}', FALSE)"
+            db = self.connector.connect()
+            cursor = db.cursor()
+            cursor.execute(sql.format(table=self.test_table, harness_uid=harness_uid, time=time))
+            db.commit()
+            db.close()
+
+        self.init_update_database()
+        self.UD.output_blob_table = self.output_blob_table
+        run_archive = instances[0].complete_events['0']['run_archive']
+        self.UD.update_test_table(1, run_archive, run_archive, rgt_lines[0])
+        build_hash = output_store.hash_output(outputs['build'].encode())
+        self.assertIn(build_hash, self.UD.known_blobs)
+
+        # Only the blob that is not referenced is deleted.
+        db = self.connector.connect()
+        cursor = db.cursor()
+        cursor.execute("INSERT INTO " + self.output_blob_table + " (output_hash, body, size, refcount) "
+                       "VALUES ('unused', '', 0, 0)")
+        db.commit()
+        db.close()
+        self.assertEqual(update_database.collect_output_blobs(self.connector, self.output_blob_table), 1)
+
+        db = self.connector.connect()
+        cursor = db.cursor()
+        cursor.execute("SELECT output_hash FROM " + self.output_blob_table)
+        self.assertEqual(cursor.fetchall(), ((build_hash,),))
+        # Pretend the first test no longer references its output so that it is deleted.
+        cursor.execute("UPDATE " + self.output_blob_table + " SET refcount = 0")
+        db.commit()
+        db.close()
+        self.assertEqual(update_database.collect_output_blobs(self.connector, self.output_blob_table), 1)
+
+        # The updater still thinks the blob exists. It is stored again when the second test references it.
+        run_archive = instances[1].complete_events['0']['run_archive']
+        self.UD.update_test_table(2, run_archive, run_archive, rgt_lines[1])
+
+        db = self.connector.connect()
+        cursor = db.cursor()
+        cursor.execute("SELECT body, refcount FROM " + self.output_blob_table + " WHERE output_hash = %s",
+                       (build_hash,))
+        body, refcount = cursor.fetchone()
+        self.assertEqual(output_store.decompress_blob(body), outputs['build'])
+        self.assertEqual(refcount, 1)
+        db.close()
+
     def test_get_add_fields(self):
         """
         Test that the correct fields can be found when adding a test.
@@ -902,29 +1302,6 @@ class TestUpdateDatabase(unittest.TestCase):
         for key in add_fields.keys():
             self.assertIn(key, expected_result.keys())
 
-    def test_get_add_sql(self):
-        """
-        Test that the correct sql can be made for adding a test.
-        """
-        # Set the fields to add.
-        add_fields = {'int_1': 10, 'int_2': 20, 'str_1': 'one', 'str_2': 'two'}
-
-        self.init_update_database()
-
-        # Get the sql.
-        sql = self.UD.get_add_sql(add_fields)
-
-        # Assert that it has the correct stuff.
-        self.assertIn('INSERT INTO test_rgt_test', sql)
-        self.assertIn('int_1', sql)
-        self.assertIn('int_2', sql)
-        self.assertIn('str_1', sql)
-        self.assertIn('str_2', sql)
-        self.assertIn('10', sql)
-        self.assertIn('20', sql)
-        self.assertIn("'one'", sql)
-        self.assertIn("'two'", sql)
-
     def test_add_to_test_table(self):
         """
         Test that a test can be added to the test table.
@@ -966,56 +1343,6 @@ class TestUpdateDatabase(unittest.TestCase):
                          'system': system}
         self.assertTrue(self.in_table(self.test_table, **expected_vals))
 
-    def test_in_event_table(self):
-        """
-        Test whether an event can be found in the test event table.
-        """
-        # Initialize test variables.
-        program_name = 'program'
-        test_name = 'test'
-        time = '0000-00-01'
-        harness_uid = 'instance'
-        job_id = 11
-        build_status = '0'
-        submit_status = '0'
-        check_status = '***'
-        build_output_text = 'building . . .\nAll done'
-        submit_output_text = 'submitting . . .\nAll done'
-        check_output_text = ''
-        outputs = {'build': build_output_text, 'submit': submit_output_text, 'check': check_output_text}
-        system = 'system'
-        event_uid = '0'
-        events = {event_uid: {}}
-        exit_status = None
-        in_queue = False
-
-        # Initialize the rgt line for the test.
-        rgt_line = self.IC.create_rgt_status_line(time, harness_uid, job_id, build_status, submit_status, check_status)
-        # Initialize the test instance.
-        instance = self.IC.create_test_instance(program_name, test_name, harness_uid, time, job_id, build_status,
-                                                submit_status, check_status, outputs, system, events, exit_status, in_queue)
-
-        harness_tld = instance.status_instance_path
-
-        # Add the test to the test table.
-        self.init_update_database()
-        self.UD.add_to_test_table(instance.event_paths['0'], rgt_line, harness_tld)
-
-        # Initialize a database connection.
-        db = self.connector.connect()
-        cursor = db.cursor()
-        # Insert the event into the event table.
-        self.insert_event(event_uid)
-        # Insert the test, event pair.
-        sql = "INSERT INTO {table} (test_id, event_id, event_time) " \
-              "VALUES ({test_id}, {event_id}, {event_time})"\
-              .format(table=self.test_event_table, test_id=1, event_id=1, event_time=time)
-        cursor.execute(sql)
-        db.commit()
-
-        # Assert that test_instance 1 has an event with id 1. These are NOT the uids.
-        self.assertTrue(self.UD.in_event_table(1, 1))
-
     def test_insert_into_event_table(self):
         """
         Test if the test, event pair can be added to the test event table.
@@ -1055,11 +1382,11 @@ class TestUpdateDatabase(unittest.TestCase):
         self.UD.add_to_test_table(instance.event_paths['0'], rgt_line, harness_tld)
 
         # Assert that the pair is not yet in the test event table.
-        self.assertFalse(self.UD.in_event_table(1, 1))
+        self.assertFalse(self.in_table(self.test_event_table, test_id=1, event_id=1))
         # Insert the pair.
         self.UD.insert_into_event_table(1, instance.event_paths['0'])
         # Assert that the pair is now in the test event table.
-        self.assertTrue(self.UD.in_event_table(1, 1))
+        self.assertTrue(self.in_table(self.test_event_table, test_id=1, event_id=1))
 
     def test_update_test_event_table(self):
         """
@@ -1107,6 +1434,10 @@ class TestUpdateDatabase(unittest.TestCase):
         for event_path in event_paths:
             self.assertIn(event_path, expected_paths)
 
+        # Make sure the stat of each event was kept.
+        for event_path in event_paths:
+            self.assertEqual(self.UD.event_files[event_path].stat.st_size, os.stat(event_path).st_size)
+
         # Initialize a database connection.
         db = self.connector.connect()
         cursor = db.cursor()
@@ -1185,6 +1516,9 @@ class TestUpdateDatabase(unittest.TestCase):
         self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 1}))
         self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 2}))
 
+        # Each event file was only parsed once.
+        self.assertEqual(len(event_uids), self.UD.event_cache.misses)
+
     # TODO: Simplify test instance introduction.
     def test_update_test_instance(self):
         """
@@ -1254,51 +1588,39 @@ class TestUpdateDatabase(unittest.TestCase):
         self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 1}))
         self.assertTrue(self.in_table(self.test_event_table, **{'test_id': 1, 'event_id': 2}))
 
-    def test_get_job_tuple(self):
+    def test_get_job_tuples(self):
         """
-        Test that the tuple for some job can be found.
+        Test whether the get_job_tuples function finds many instances in one query.
         """
-        # Initialize test variables.
-        program_name = 'program'
-        test_name = 'test'
-        time = '0000-00-01'
-        harness_uid = 'instance'
-        job_id = 11
-        build_status = '0'
-        submit_status = '0'
-        check_status = '***'
-        build_output_text = 'building . . .\nAll done'
-        submit_output_text = 'submitting . . .\nAll done'
-        check_output_text = ''
-        outputs = {'build': build_output_text, 'submit': submit_output_text, 'check': check_output_text}
-        system = 'system'
-        event_uids = ['0', '1']
-        events = {event_uids[0]: {}, event_uids[1]: {}}
-        exit_status = None
-        in_queue = False
+        harness_uids = ['instance_A', 'instance_B']
+        done_values = [False, True]
 
         # Initialize a database connection.
         db = self.connector.connect()
         cursor = db.cursor()
-        # Insert the test.
+        # Insert the tests.
         sql = "INSERT INTO {table} (harness_uid, harness_start, harness_tld, " \
               "application, testname, system, previous_job_id, done) " + \
-              "VALUES ('{harness_uid}', '{harness_start}', '{harness_tld}', " \
-              "'{application}', '{testname}', '{system}', '{previous_job_id}', {done})" 
-
-        sql = sql.format(table=self.test_table, harness_uid=harness_uid, harness_start=time, harness_tld='path',
-                         application=program_name, testname=test_name, system=system, previous_job_id=harness_uid, done=False)
+              "VALUES ('{harness_uid}', '0000-00-01', 'path', 'program', 'test', 'system', '{harness_uid}', {done})"
+        for harness_uid, done in zip(harness_uids, done_values):
+            cursor.execute(sql.format(table=self.test_table, harness_uid=harness_uid, done=done))
         # Execute and close the connection.
-        cursor.execute(sql)
         db.commit()
         db.close()
 
-        # Get the job tuple.
+        # Get the job tuples, including one for an instance that does not exist. Use a small chunk size so that
+        # multiple queries are needed.
         self.init_update_database()
-        job_tuple = self.UD.get_job_tuple(harness_uid)
+        self.UD.select_chunk_size = 1
+        job_tuples = self.UD.get_job_tuples(harness_uids + ['instance_C'])
+
         # Assert that it contains the correct information.
-        self.assertEqual(job_tuple[0], 1)
-        self.assertEqual(job_tuple[1], False)
+        self.assertEqual(len(job_tuples), 2)
+        self.assertEqual(job_tuples['instance_A'][0], 1)
+        self.assertEqual(bool(job_tuples['instance_A'][1]), False)
+        self.assertEqual(job_tuples['instance_B'][0], 2)
+        self.assertEqual(bool(job_tuples['instance_B'][1]), True)
+        self.assertNotIn('instance_C', job_tuples)
 
     def test_update_test_instances(self):
         """
@@ -1419,3 +1741,128 @@ class TestUpdateDatabase(unittest.TestCase):
         for uid in new_uids:
             self.assertTrue(self.in_table(self.test_table, **{'harness_uid': uid, 'done': True}))
 
+    def test_done_uids(self):
+        """
+        Test that instances that are done are remembered and never looked up again.
+        """
+        # Initialize test variables.
+        harness_uid = 'instance'
+        outputs = {'build': 'building . . .\nAll done', 'submit': 'submitting . . .\nAll done', 'check': ''}
+        self.IC.create_test_instance('program', 'test', harness_uid, '0000-00-01', 11, '0', '0', '***', outputs,
+                                     'system', {'0': {}}, None, False)
+        self.insert_event(0)
+
+        # The instance is marked done when it is added.
+        self.init_update_database(self.IC.path_to_rgt_input)
+        self.UD.update_tests()
+        self.assertTrue(self.in_table(self.test_table, **{'harness_uid': harness_uid, 'done': True}))
+        self.assertIn(harness_uid, self.UD.done_uids)
+        self.assertEqual(1, self.UD.metrics.counters['instances_written'])
+        # The rgt_status.txt file and the single event were each parsed once.
+        self.assertEqual(2, self.UD.metrics.timings['parse_files'])
+
+        # A new updater loads the done instances and does not search the test table for them.
+        self.init_update_database(self.IC.path_to_rgt_input)
+        searched = []
+        get_job_tuples = self.UD.get_job_tuples
+        self.UD.get_job_tuples = lambda harness_uids: searched.extend(harness_uids) or get_job_tuples(harness_uids)
+        self.UD.update_tests()
+        self.assertIn(harness_uid, self.UD.done_uids)
+        self.assertNotIn(harness_uid, searched)
+        self.assertEqual(1, self.UD.metrics.counters['instances_skipped'])
+        self.assertEqual(0, self.UD.metrics.counters['instances_written'])
+
+    def test_unfinished_jobs(self):
+        """
+        Test that the jobs of instances that are not done are remembered so that their transitions can start an update.
+        """
+        # Initialize test variables.
+        harness_uid = 'instance'
+        outputs = {'build': 'building . . .\nAll done', 'submit': 'submitting . . .\nAll done', 'check': ''}
+        self.IC.create_test_instance('program', 'test', harness_uid, '0000-00-01', 11, '0', '0', '***', outputs,
+                                     'system', {'0': {}}, None, True)
+        self.insert_event(0)
+
+        self.init_update_database(self.IC.path_to_rgt_input)
+        self.UD.update_tests()
+        self.assertEqual({11}, self.UD.unfinished_jobs)
+        self.assertTrue(self.UD.wants_update(job_transitions.JobTransition(11, 'Running', 'Complete', 0, 0)))
+        self.assertTrue(self.UD.wants_update(job_transitions.JobTransition(11, 'Running', None, None, 0)))
+        self.assertFalse(self.UD.wants_update(job_transitions.JobTransition(11, 'Eligible', 'Running', None, 0)))
+        self.assertFalse(self.UD.wants_update(job_transitions.JobTransition(12, 'Running', 'Complete', 0, 0)))
+
+        # Once the instance is done, its job is forgotten.
+        self.IC.write_exit_value(11, 0)
+        self.UD.update_tests()
+        self.assertEqual(set(), self.UD.unfinished_jobs)
+
+    def create_many_instances(self):
+        """
+        Create one finished instance in each of several tests so that there are more tests than workers.
+
+        :return: The uid of each instance.
+        """
+        program_names = ['program_1', 'program_2', 'program_3']
+        test_names = ['test_alpha', 'test_beta', 'test_gamma']
+        time = '0000-00-01'
+        job_id = 11
+        build_status = '0'
+        submit_status = '0'
+        check_status = '***'
+        outputs = {'build': 'building . . .\nAll done', 'submit': 'submitting . . .\nAll done', 'check': ''}
+        system = 'system'
+        events = {'0': {}}
+        exit_status = None
+        in_queue = False
+
+        # Create one instance for every test.
+        new_uids = []
+        for program_name in program_names:
+            for test_name in test_names:
+                new_uid = program_name + '_' + test_name
+                self.IC.create_test_instance(program_name, test_name, new_uid, time, job_id + len(new_uids),
+                                             build_status, submit_status, check_status, outputs, system, events,
+                                             exit_status, in_queue)
+                new_uids.append(new_uid)
+
+        self.insert_event(0)
+        return new_uids
+
+    def assert_instances_added(self, new_uids):
+        """
+        Check that every test was read once and every instance was added as done.
+
+        :param new_uids: The uid of each instance from create_many_instances.
+        """
+        self.assertEqual(self.UD.change_detector.directories_visited, 2 * len(new_uids))
+        for uid in new_uids:
+            self.assertTrue(self.in_table(self.test_table, **{'harness_uid': uid, 'done': True}))
+
+    def test_update_tests_concurrent(self):
+        """
+        Test that many tests can be read by multiple threads and are all added.
+        """
+        new_uids = self.create_many_instances()
+
+        # Update all of the tests with more tests than workers.
+        self.init_update_database(self.IC.path_to_rgt_input, scan_workers=2)
+        self.UD.update_tests()
+
+        self.assert_instances_added(new_uids)
+        self.assertTrue(self.in_table(self.test_event_table, **{'event_id': 1, 'test_id': len(new_uids)}))
+
+    def test_update_tests_async(self):
+        """
+        Test that many tests are all added when the update runs as stages.
+        """
+        new_uids = self.create_many_instances()
+
+        # Update all of the tests with more tests than workers in each stage.
+        self.init_update_database(self.IC.path_to_rgt_input, scan_workers=2,
+                                  updater_class=async_update_database.AsyncUpdateDatabase, parse_workers=2,
+                                  lsf_workers=2)
+        self.UD.update_tests()
+
+        # The jobs looked up in LSF are forgotten once they are written.
+        self.assert_instances_added(new_uids)
+        self.assertEqual(0, len(self.UD.job_states))
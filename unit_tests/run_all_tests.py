@@ -1,10 +1,22 @@
 import unittest
+from unit_tests import test_job_backends
 from unit_tests import test_job_monitor
+from unit_tests import test_job_snapshot
 from unit_tests import test_job_status
+from unit_tests import test_job_table
+from unit_tests import test_job_transitions
+from unit_tests import test_metrics
 from unit_tests import test_parse_file
+from unit_tests import test_scheduler
 from unit_tests import test_test_status
 from unit_tests.notifications_tests import test_slack_commands
+from unit_tests.database_tests import test_async_update_database
+from unit_tests.database_tests import test_change_detector
+from unit_tests.database_tests import test_connect_database
 from unit_tests.database_tests import test_create_database
+from unit_tests.database_tests import test_output_store
+from unit_tests.database_tests import test_reference_cache
+from unit_tests.database_tests import test_statements
 from unit_tests.database_tests import test_update_database
 import argparse
 
@@ -24,10 +36,22 @@ def main():
     # TODO: Should this be split more than it currently is?
     fast_test_list = [test_job_status.TestJobClass, test_job_status.TestJobStatus,
                       test_parse_file.TestErrors, test_parse_file.TestParseJobID, test_parse_file.TestParseRGTInput,
+                      test_parse_file.TestParseRGTStatusTail, test_parse_file.TestRecords,
+                      test_parse_file.TestEventCache,
+                      test_job_snapshot.TestJobSnapshot, test_job_snapshot.TestJobSnapshotService,
+                      test_job_table.TestJobTable, test_job_backends.TestReplayBackend,
+                      test_job_backends.TestJobStatusReplay, test_job_transitions.TestDiffTables,
+                      test_job_transitions.TestJobTransitionFeed, test_job_transitions.TestMonitorFeed,
+                      test_metrics.TestUpdateMetrics, test_scheduler.TestUpdateScheduler,
                       test_test_status.TestTestStatus,
-                      test_slack_commands.TestMessageParser, test_slack_commands.TestStaticFunctions]
-
-    database_test_list = [test_create_database.TestCreateDatabase,
+                      test_slack_commands.TestMessageParser, test_slack_commands.TestStaticFunctions,
+                      test_change_detector.TestChangeDetector, test_output_store.TestOutputStore,
+                      test_reference_cache.TestReferenceCache,
+                      test_statements.TestTestStatements, test_async_update_database.TestAsyncStages,
+                      test_update_database.TestDatabaseWarnings]
+
+    database_test_list = [test_connect_database.TestDatabaseConnector,
+                          test_create_database.TestCreateDatabase,
                           test_update_database.TestUpdateDatabase]
 
     slow_test_list = [test_job_monitor.TestJobMonitorClass, test_job_monitor.TestMonitor]
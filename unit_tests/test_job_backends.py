@@ -0,0 +1,126 @@
+import os
+import unittest
+from scripts import job_backends
+from scripts import job_status
+
+# The output of bjobs that is replayed. This is only read. example_bjobs.txt is rewritten by get_actual_jobs.
+bjobs_path = os.path.join(os.path.dirname(__file__), 'test_inputs', 'replay_bjobs.txt')
+
+
+class TestReplayBackend(unittest.TestCase):
+    """
+    Class to test serving jobs without LSF.
+    """
+
+    def test_parse_bjobs(self):
+        """
+        Test that each job in the output of bjobs is read.
+        """
+        backend = job_backends.ReplayBackend.from_bjobs(bjobs_path)
+        jobs = list(backend.read_jobs())
+        self.assertEqual(4, len(jobs))
+        self.assertEqual((55579, 'leverman', 'IOR_alpine_stability_peak', 'Running', None, 'batch'), jobs[0])
+        self.assertEqual('Eligible', jobs[2][3])
+
+        # The jobs are matched like LSF would.
+        self.assertEqual([55661], [job[0] for job in backend.read_jobs(user='tonyca')])
+        self.assertEqual([55580], [job[0] for job in backend.read_jobs(jobid=55580)])
+        self.assertEqual(3, len(list(backend.read_jobs(jobName='IOR_alpine_stability_peak'))))
+        self.assertEqual(0, len(list(backend.read_jobs(queue='debug'))))
+
+    def test_finished_bjobs(self):
+        """
+        Test that finished jobs in the output of bjobs are given an exit status.
+        """
+        text = "JOBID   USER       STAT   QUEUE       JOB_NAME\n" \
+               "1       alice      DONE   batch       build\n" \
+               "2       alice      EXIT   batch       run\n" \
+               "3       bob        RUN    batch       run\n"
+        self.assertEqual([(1, 'Complete', 0), (2, 'Killed', 1), (3, 'Running', None)],
+                         [(job[0], job[3], job[4]) for job in job_backends.parse_bjobs(text)])
+
+    def test_snapshots(self):
+        """
+        Test that each read serves the next snapshot and the last one keeps being served.
+        """
+        backend = job_backends.ReplayBackend([[(1, 'user', 'job', 'Eligible', None, 'batch')],
+                                              [(1, 'user', 'job', 'Complete', 0, 'batch')]])
+        self.assertEqual('Eligible', next(backend.read_jobs())[3])
+        self.assertEqual('Complete', next(backend.read_jobs())[3])
+        self.assertEqual('Complete', next(backend.read_jobs())[3])
+        self.assertEqual(3, backend.reads)
+
+    def test_interval(self):
+        """
+        Test that snapshots can be served for some number of seconds each.
+        """
+        now = [0]
+        backend = job_backends.ReplayBackend([[(1, 'user', 'job', 'Eligible', None, 'batch')],
+                                              [(1, 'user', 'job', 'Running', None, 'batch')]],
+                                             interval=10, clock=lambda: now[0])
+        self.assertEqual('Eligible', next(backend.read_jobs())[3])
+        self.assertEqual('Eligible', next(backend.read_jobs())[3])
+        now[0] = 10
+        self.assertEqual('Running', next(backend.read_jobs())[3])
+
+    def test_synthetic(self):
+        """
+        Test that a generated population keeps its size and changes with each snapshot.
+        """
+        backend = job_backends.ReplayBackend.synthetic(200, churn=0.5, seed=1)
+        first = list(backend.read_jobs())
+        second = list(backend.read_jobs())
+        self.assertEqual(200, len(first))
+        self.assertEqual(200, len(second))
+        self.assertNotEqual(first, second)
+
+        # The same seed makes the same jobs.
+        again = job_backends.ReplayBackend.synthetic(200, churn=0.5, seed=1)
+        self.assertEqual(first, list(again.read_jobs()))
+
+
+class TestJobStatusReplay(unittest.TestCase):
+    """
+    Class to test JobStatus on top of a replay backend.
+    """
+
+    def setUp(self):
+        """
+        Setup a JobStatus that reads the output of bjobs.
+        """
+        self.JS = job_status.JobStatus(backend=job_backends.ReplayBackend.from_bjobs(bjobs_path))
+
+    def test_get_jobs(self):
+        """
+        Test that jobs are found and filtered by status.
+        """
+        self.assertEqual(4, len(self.JS.get_jobs()))
+        self.assertEqual([55579, 55661], [job.jobId for job in self.JS.get_jobs_by_status('Running')])
+        self.assertEqual({'Running': 2, 'Eligible': 2}, self.JS.count_type(self.JS.get_jobs()))
+        with self.assertRaises(KeyError):
+            self.JS.get_jobs(status='Sleeping')
+
+    def test_lookups(self):
+        """
+        Test the lookups of single jobs and of many jobs.
+        """
+        self.assertTrue(self.JS.in_queue(55580))
+        self.assertFalse(self.JS.in_queue(1))
+        self.assertEqual('Running', self.JS.get_job_status(55661))
+        self.assertIsNone(self.JS.get_job_status(1))
+        self.assertEqual(({55579: 'Running', 55580: 'Eligible'}, frozenset([1])),
+                         self.JS.get_statuses([55579, 55580, 1]))
+
+    def test_default_backend(self):
+        """
+        Test that a JobStatus made without a backend uses the default backend.
+        """
+        backend = job_backends.ReplayBackend([])
+        job_backends.set_default_backend(backend)
+        self.addCleanup(job_backends.set_default_backend, None)
+        self.assertIs(backend, job_status.JobStatus().backend)
+        self.assertEqual(0, len(job_status.JobStatus().get_jobs()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import types
+import unittest
+from scripts import job_snapshot
+
+
+def make_job(job_id, user='user', job_name='job', status='Running', exit_status=None):
+    """
+    Make something that looks like a Job from LSF.
+    """
+    return types.SimpleNamespace(jobId=job_id, user=user, jobName=job_name, status=status, exit_status=exit_status)
+
+
+class TestJobSnapshot(unittest.TestCase):
+    """
+    Class to test finding jobs in a snapshot.
+    """
+
+    def setUp(self):
+        """
+        Setup a snapshot of a few jobs.
+        """
+        self.jobs = [make_job(1, user='alice', job_name='build'),
+                     make_job(2, user='alice', job_name='run', status='Eligible'),
+                     make_job(3, user='bob', job_name='run', status='Complete', exit_status=0),
+                     make_job(4, user='bob', job_name='check', status='Killed', exit_status=1)]
+        self.snapshot = job_snapshot.JobSnapshot(self.jobs, 100)
+
+    def test_by_id(self):
+        """
+        Test that jobs are found by their id.
+        """
+        self.assertEqual(4, len(self.snapshot))
+        self.assertIn(3, self.snapshot)
+        self.assertNotIn(5, self.snapshot)
+        self.assertEqual(('bob', 'run', 'Complete', 0), self.snapshot.get(3)[1:5])
+        self.assertIsNone(self.snapshot.get(5))
+        self.assertEqual('Killed', self.snapshot.get_job_status(4))
+        self.assertIsNone(self.snapshot.get_job_status(5))
+
+    def test_indexes(self):
+        """
+        Test that jobs are found by their user, name and status.
+        """
+        self.assertEqual([1, 2], [job.jobId for job in self.snapshot.get_jobs_by_user('alice')])
+        self.assertEqual([], self.snapshot.get_jobs_by_user('carol'))
+        self.assertEqual([2, 3], [job.jobId for job in self.snapshot.get_jobs_by_name('run')])
+        self.assertEqual([1], [job.jobId for job in self.snapshot.get_jobs_by_status('Running')])
+        self.assertEqual([3, 4], [job.jobId for job in self.snapshot.get_jobs_by_status(['Complete', 'Killed'])])
+
+        # Changing a returned list should not change the snapshot.
+        self.snapshot.get_jobs_by_user('alice').clear()
+        self.assertEqual(2, len(self.snapshot.get_jobs_by_user('alice')))
+
+    def test_in_queue(self):
+        """
+        Test that only waiting and running jobs are in the queue.
+        """
+        self.assertTrue(self.snapshot.in_queue(1))
+        self.assertTrue(self.snapshot.in_queue(2))
+        self.assertFalse(self.snapshot.in_queue(3))
+        self.assertFalse(self.snapshot.in_queue(5))
+
+
+class TestJobSnapshotService(unittest.TestCase):
+    """
+    Class to test sharing snapshots between callers.
+    """
+
+    def setUp(self):
+        """
+        Setup a service with a clock that only moves when told to.
+        """
+        self.now = 0
+        self.fetches = 0
+        self.service = job_snapshot.JobSnapshotService(ttl=30, fetch_jobs=self.fetch_jobs, clock=lambda: self.now)
+
+    def fetch_jobs(self):
+        """
+        Pretend to get every job from LSF.
+        """
+        self.fetches += 1
+        return [make_job(self.fetches)]
+
+    def test_ttl(self):
+        """
+        Test that a snapshot is reused until it is older than the ttl.
+        """
+        snapshot = self.service.get_snapshot()
+        self.now = 30
+        self.assertIs(snapshot, self.service.get_snapshot())
+        self.assertEqual(1, self.fetches)
+
+        # A caller can ask for a newer snapshot than the ttl allows.
+        self.now = 31
+        self.assertIsNot(snapshot, self.service.get_snapshot(max_age=0))
+        self.assertEqual(2, self.fetches)
+
+        self.now = 62
+        self.assertIn(3, self.service.get_snapshot())
+        self.service.invalidate()
+        self.assertIn(4, self.service.get_snapshot())
+        self.assertEqual(4, self.service.refreshes)
+        self.assertEqual(5, self.service.requests)
+
+    def test_single_flight(self):
+        """
+        Test that callers asking while a snapshot is taken all get that snapshot.
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch():
+            self.fetches += 1
+            started.set()
+            release.wait(5)
+            return [make_job(self.fetches)]
+
+        self.service.fetch_jobs = slow_fetch
+        snapshots = []
+        threads = [threading.Thread(target=lambda: snapshots.append(self.service.get_snapshot())) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(1, self.fetches)
+        self.assertEqual(5, len(snapshots))
+        for snapshot in snapshots:
+            self.assertIs(snapshots[0], snapshot)
+
+    def test_error(self):
+        """
+        Test that a snapshot that could not be taken raises the problem and is tried again by the next caller.
+        """
+        def failing_fetch():
+            raise RuntimeError("LSF is down.")
+
+        self.service.fetch_jobs = failing_fetch
+        with self.assertRaises(RuntimeError):
+            self.service.get_snapshot()
+
+        self.service.fetch_jobs = self.fetch_jobs
+        self.assertIn(1, self.service.get_snapshot())
+        self.assertIsNone(self.service.refresh_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
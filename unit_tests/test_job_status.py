@@ -1,6 +1,7 @@
 from scripts import job_status
 from pythonlsf import lsf
 import unittest
+import types
 from random import randint
 import os
 from unit_tests import get_actual_jobs
@@ -64,6 +65,16 @@ class TestJobClass(unittest.TestCase):
                     # Move to the next expected status.
                     index += 1
 
+    def test_get_status_options(self):
+        """
+        Test that statuses to match are turned into a set and invalid statuses are caught.
+        """
+        self.assertEqual(job_status.Job.viable_statuses, job_status.Job.get_status_options('all'))
+        self.assertEqual(frozenset(['Running']), job_status.Job.get_status_options('Running'))
+        self.assertEqual(frozenset(['Running', 'Blocked']), job_status.Job.get_status_options(['Running', 'Blocked']))
+        with self.assertRaises(KeyError):
+            job_status.Job.get_status_options(['Running', 'Sleeping'])
+
     class example_job:
         """
         Class to create a fake lsf job for testing.
@@ -83,6 +94,7 @@ class TestJobClass(unittest.TestCase):
             self.pendStateJ = pend_state_j
             self.jName = jName
             self.user = user
+            self.submit = types.SimpleNamespace(queue='batch')
 
 
 class TestJobStatus(unittest.TestCase):
@@ -222,6 +234,29 @@ class TestJobStatus(unittest.TestCase):
                 for actual_job_id in actual_job_ids:
                     self.assertIn(actual_job_id, job_ids)
 
+    def test_get_statuses(self):
+        """
+        Test the get_statuses and get_exit_statuses methods.
+        """
+        # Use some id that will not occur along with every job in bjobs.
+        job_ids = [job_dic['jobid'] for job_dic in self.job_dics]
+        missing_id = max(job_ids + [0]) + 1000000
+        statuses, missing = self.JS.get_statuses(job_ids + [missing_id])
+        exit_statuses, exit_missing = self.JS.get_exit_statuses(job_ids + [missing_id])
+
+        self.assertIn(missing_id, missing)
+        self.assertIn(missing_id, exit_missing)
+        self.assertNotIn(missing_id, statuses)
+        for job_dic in self.job_dics:
+            # The job may have left LSF since bjobs was run.
+            if job_dic['jobid'] in missing:
+                continue
+            with self.subTest(job_id=job_dic['jobid']):
+                self.assertEqual(job_dic['stat'], self.jobstat_to_bjobstat[statuses[job_dic['jobid']]])
+                self.assertIn(job_dic['jobid'], exit_statuses)
+
+        self.assertEqual(({}, frozenset()), self.JS.get_statuses([]))
+
     def find_job_dics_by_attr(self, attr_name, search_val):
         """
         Get all jobs in bjobs according to a certain attribute.
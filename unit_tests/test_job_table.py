@@ -0,0 +1,77 @@
+import types
+import unittest
+from scripts import job_table
+
+
+class TestJobTable(unittest.TestCase):
+    """
+    Class to test holding jobs in columns.
+    """
+
+    def setUp(self):
+        """
+        Setup a table of a few jobs.
+        """
+        self.table = job_table.JobTable()
+        self.table.append(1, 'alice', 'build', 'Running', queue='batch')
+        self.table.append(2, 'alice', 'run', 'Eligible', queue='debug')
+        self.table.append(3, 'bob', 'run', 'Complete', 0, 'batch')
+        self.table.append(4, 'bob', 'check', 'Killed', 1, 'batch')
+
+    def test_rows(self):
+        """
+        Test that rows have the same attributes as a Job.
+        """
+        self.assertEqual(4, len(self.table))
+        job = self.table[2]
+        self.assertEqual((3, 'bob', 'run', 'Complete', 0, 'batch'), tuple(job))
+        self.assertEqual('run', job.jobName)
+        self.assertIsNone(self.table[0].exit_status)
+        self.assertEqual([1, 2, 3, 4], [job.jobId for job in self.table])
+        self.assertEqual(['Running', 'Eligible', 'Complete', 'Killed'], self.table.column('status'))
+        with self.assertRaises(KeyError):
+            self.table.column('host')
+
+    def test_interned(self):
+        """
+        Test that every job shares the same string for the same user and status.
+        """
+        user = ''.join(['car', 'ol'])
+        self.table.append(5, user, 'run', 'Running')
+        self.assertIs(self.table.users[4], self.table.column('user')[4])
+        self.assertIs(job_table.intern_string('carol'), self.table.users[4])
+        self.assertEqual(self.table.status_codes[0], self.table.status_codes[4])
+
+    def test_filter(self):
+        """
+        Test that only jobs matching every criteria are kept.
+        """
+        self.assertEqual([2, 3], self.table.filter(job_name='run').column('jobId'))
+        self.assertEqual([3], self.table.filter(job_name='run', user='bob').column('jobId'))
+        self.assertEqual([1, 2], self.table.filter(status=['Running', 'Eligible']).column('jobId'))
+        self.assertEqual([4], self.table.filter(job_id=4, queue='batch').column('jobId'))
+        self.assertEqual([1, 4], self.table.filter(job_ids={1, 4, 9}).column('jobId'))
+        self.assertEqual(0, len(self.table.filter(status='Never seen')))
+        # The original table is not changed.
+        self.assertEqual(4, len(self.table))
+
+    def test_count_by(self):
+        """
+        Test that jobs are counted by status, user and queue.
+        """
+        self.assertEqual({'Running': 1, 'Eligible': 1, 'Complete': 1, 'Killed': 1}, self.table.count_by('status'))
+        self.assertEqual({'alice': 2, 'bob': 2}, self.table.count_by('user'))
+        self.assertEqual({'batch': 3, 'debug': 1}, self.table.count_by('queue'))
+
+    def test_from_jobs(self):
+        """
+        Test that a table can be made from Jobs.
+        """
+        jobs = [types.SimpleNamespace(jobId=7, user='carol', jobName='build', status='Blocked', exit_status=None)]
+        table = job_table.JobTable.from_jobs(jobs)
+        self.assertEqual((7, 'carol', 'build', 'Blocked', None, None), tuple(table[0]))
+        self.assertIs(table, job_table.JobTable.from_jobs(table))
+
+
+if __name__ == '__main__':
+    unittest.main()
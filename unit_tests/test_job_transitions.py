@@ -0,0 +1,175 @@
+import unittest
+from scripts import job_backends
+from scripts import job_monitor
+from scripts import job_snapshot
+from scripts import job_status
+from scripts import job_transitions
+from scripts.job_table import JobTable
+
+
+def make_table(jobs):
+    """
+    Make a table of jobs from tuples of their id, status and exit status.
+    """
+    table = JobTable()
+    for job_id, status, exit_status in jobs:
+        table.append(job_id, 'user', 'job', status, exit_status, 'batch')
+    return table
+
+
+class TestDiffTables(unittest.TestCase):
+    """
+    Class to test finding the jobs that changed between two tables.
+    """
+
+    def test_diff(self):
+        """
+        Test that jobs that appeared, changed or left are found and unchanged jobs are not.
+        """
+        old = make_table([(1, 'Running', None), (2, 'Eligible', None), (3, 'Running', None)])
+        new = make_table([(1, 'Running', None), (2, 'Running', None), (4, 'Eligible', None), (5, 'Complete', 0)])
+        transitions = job_transitions.diff_tables(old, new, 50)
+        self.assertEqual([(2, 'Eligible', 'Running', None, 50), (4, None, 'Eligible', None, 50),
+                          (5, None, 'Complete', 0, 50), (3, 'Running', None, None, 50)], transitions)
+        self.assertEqual([False, False, True, True], [transition.finished for transition in transitions])
+        self.assertEqual([], job_transitions.diff_tables(new, new, 60))
+
+
+class TestJobTransitionFeed(unittest.TestCase):
+    """
+    Class to test giving transitions to subscribers.
+    """
+
+    def setUp(self):
+        """
+        Setup a feed that reads the next snapshot each time the service asks for jobs.
+        """
+        self.now = 0
+        self.snapshots = [[(1, 'Eligible', None), (2, 'Running', None)],
+                          [(1, 'Running', None), (2, 'Complete', 0)],
+                          [(1, 'Complete', 0)]]
+        self.service = job_snapshot.JobSnapshotService(ttl=10, fetch_jobs=self.fetch_jobs, clock=lambda: self.now)
+        self.feed = job_transitions.JobTransitionFeed(self.service)
+        self.addCleanup(self.feed.close)
+
+    def fetch_jobs(self):
+        """
+        Pretend to get every job from LSF.
+        """
+        return make_table(self.snapshots.pop(0))
+
+    def test_publish(self):
+        """
+        Test that each subscriber only gets the transitions it wants in order.
+        """
+        everything = self.feed.subscribe()
+        job_1 = self.feed.subscribe([1])
+        # The first snapshot has nothing to compare to.
+        self.feed.poll()
+        self.assertEqual([], everything.get_all())
+
+        self.now = 20
+        self.feed.poll()
+        self.assertEqual([(1, 'Eligible', 'Running'), (2, 'Running', 'Complete')],
+                         [transition[:3] for transition in everything.get_all()])
+        self.assertEqual([(1, 'Eligible', 'Running')], [transition[:3] for transition in job_1.get_all()])
+
+        # Snapshots that were already compared are not compared again.
+        self.feed.publish(self.service.snapshot)
+        self.assertIsNone(everything.get(timeout=0))
+
+        self.feed.unsubscribe(job_1)
+        self.now = 40
+        self.feed.poll()
+        self.assertEqual(2, len(everything.get_all()))
+        self.assertEqual([], job_1.get_all())
+        self.assertEqual(4, self.feed.transitions_published)
+
+    def test_full_queue(self):
+        """
+        Test that transitions are dropped once a subscriber's queue is full.
+        """
+        subscription = self.feed.subscribe(maxsize=1)
+        self.feed.poll()
+        self.now = 20
+        self.feed.poll()
+        self.assertEqual(1, len(subscription.get_all()))
+        self.assertEqual(1, subscription.dropped)
+
+    def test_close(self):
+        """
+        Test that a closed feed no longer gets snapshots.
+        """
+        subscription = self.feed.subscribe()
+        self.feed.poll()
+        self.feed.close()
+        self.now = 20
+        self.service.get_snapshot()
+        self.assertEqual([], subscription.get_all())
+
+
+class TestMonitorFeed(unittest.TestCase):
+    """
+    Class to test monitoring a job with the transition feed.
+    """
+
+    def test_monitor(self):
+        """
+        Test that a monitor is told about each change of its job until it is done.
+        """
+        backend = job_backends.ReplayBackend([[(7, 'user', 'job', 'Eligible', None, 'batch')],
+                                              [(7, 'user', 'job', 'Running', None, 'batch')],
+                                              [(7, 'user', 'job', 'Running', None, 'batch')],
+                                              [(7, 'user', 'job', 'Complete', 0, 'batch')]])
+        JS = job_status.JobStatus(backend=backend)
+        service = job_snapshot.JobSnapshotService(ttl=0, fetch_jobs=JS.get_jobs)
+        feed = job_transitions.JobTransitionFeed(service)
+        self.addCleanup(feed.close)
+
+        notifications = []
+        job_monitor.monitor(7, 0.01, lambda **kwargs: notifications.append(kwargs), feed=feed, user='someone')
+        self.assertEqual([{'user': 'someone', 'job_id': 7, 'status': 'Eligible', 'done': False},
+                          {'user': 'someone', 'job_id': 7, 'status': 'Eligible', 'new_status': 'Running'},
+                          {'user': 'someone', 'job_id': 7, 'status': 'Running', 'new_status': 'Complete'},
+                          {'user': 'someone', 'job_id': 7, 'status': 'Complete', 'done': True}], notifications)
+        self.assertEqual([], feed.subscriptions)
+
+    def test_many_polls(self):
+        """
+        Test that a monitor keeps looking at LSF each time nothing changed until it has checked enough times.
+        """
+        fetches = []
+
+        def fetch_jobs():
+            fetches.append(len(fetches))
+            return make_table([(7, 'Running', None)])
+
+        service = job_snapshot.JobSnapshotService(ttl=0, fetch_jobs=fetch_jobs)
+        feed = job_transitions.JobTransitionFeed(service)
+        self.addCleanup(feed.close)
+
+        notifications = []
+        job_monitor.monitor(7, 0.01, lambda **kwargs: notifications.append(kwargs), num_iterations=3, feed=feed)
+        self.assertEqual([{'job_id': 7, 'status': 'Running', 'done': False},
+                          {'job_id': 7, 'status': 'Running', 'done': False}], notifications)
+        # One look for the first status and one for each of the checks.
+        self.assertEqual(4, len(fetches))
+        self.assertEqual([], feed.subscriptions)
+
+    def test_disappear(self):
+        """
+        Test that a monitor says so when its job leaves LSF.
+        """
+        backend = job_backends.ReplayBackend([[(7, 'user', 'job', 'Running', None, 'batch')], []])
+        service = job_snapshot.JobSnapshotService(ttl=0, fetch_jobs=job_status.JobStatus(backend=backend).get_jobs)
+        feed = job_transitions.JobTransitionFeed(service)
+        self.addCleanup(feed.close)
+
+        notifications = []
+        job_monitor.monitor(7, 0.01, lambda **kwargs: notifications.append(kwargs), feed=feed)
+        self.assertEqual(2, len(notifications))
+        self.assertIn('error_message', notifications[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
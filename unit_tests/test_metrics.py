@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from scripts import metrics
+
+
+class TestUpdateMetrics(unittest.TestCase):
+    """
+    Class to test the timings and counts of an update.
+    """
+
+    def setUp(self):
+        """
+        Setup the metrics and a directory for the files they are written to.
+        """
+        self.metrics = metrics.UpdateMetrics()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_observe(self):
+        """
+        Test that each timing goes into every bucket that it fits in.
+        """
+        self.metrics.observe('write', 0.002)
+        self.metrics.observe('write', 2)
+        self.assertEqual([0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2], self.metrics.buckets['write'])
+        self.assertEqual(2.002, self.metrics.seconds['write'])
+        self.assertEqual(2, self.metrics.timings['write'])
+
+        with self.metrics.time('select'):
+            pass
+        self.assertEqual(1, self.metrics.timings['select'])
+        self.assertEqual({'seconds': 0.0, 'count': 0}, self.metrics.to_dict()['phases']['lsf'])
+
+    def test_reset(self):
+        """
+        Test that everything is forgotten when the metrics are reset.
+        """
+        self.metrics.observe('lsf', 1)
+        self.metrics.count('bytes_read', 100)
+        self.metrics.count('instances_written')
+        self.assertEqual(100, self.metrics.to_dict()['counters']['bytes_read'])
+        self.assertEqual(1, self.metrics.to_dict()['counters']['instances_written'])
+
+        self.metrics.reset()
+        record = self.metrics.to_dict()
+        self.assertEqual(0, record['phases']['lsf']['count'])
+        self.assertEqual(0, sum(record['counters'].values()))
+
+    def test_json_line(self):
+        """
+        Test that a line is appended for each record.
+        """
+        path = os.path.join(self.directory.name, 'metrics.jsonl')
+        self.metrics.count('instances_visited', 3)
+        metrics.write_json_line(path, self.metrics.to_dict())
+        metrics.write_json_line(path, {'rgt_input': 'path'})
+
+        with open(path) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(3, lines[0]['counters']['instances_visited'])
+        self.assertEqual({'rgt_input': 'path'}, lines[1])
+
+    def test_prometheus_textfile(self):
+        """
+        Test that the textfile holds a histogram for each phase and a gauge for each counter.
+        """
+        path = os.path.join(self.directory.name, 'harmony.prom')
+        self.metrics.observe('write', 0.5)
+        self.metrics.count('bytes_read', 10)
+        metrics.write_prometheus_textfile(path, [({'rgt_input': 'a "quoted" path'}, self.metrics)],
+                                          {'harmony_update_seconds': [({'rgt_input': 'path'}, 1.5)]})
+
+        with open(path) as file:
+            lines = file.read().splitlines()
+        labels = '{rgt_input="a \\"quoted\\" path",phase="write"'
+        self.assertIn('harmony_update_phase_seconds_bucket' + labels + ',le="0.1"} 0', lines)
+        self.assertIn('harmony_update_phase_seconds_bucket' + labels + ',le="0.5"} 1', lines)
+        self.assertIn('harmony_update_phase_seconds_bucket' + labels + ',le="+Inf"} 1', lines)
+        self.assertIn('harmony_update_phase_seconds_count' + labels + '} 1', lines)
+        self.assertIn('harmony_update_bytes_read{rgt_input="a \\"quoted\\" path"} 10', lines)
+        self.assertIn('harmony_update_seconds{rgt_input="path"} 1.5', lines)
+        # Nothing is left behind from writing the file.
+        self.assertEqual(['harmony.prom'], os.listdir(self.directory.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 from scripts import parse_file
 import unittest
 import os
+import tempfile
+import datetime
 
 class TestErrors(unittest.TestCase):
     """
@@ -343,5 +345,240 @@ class TestParseRGTInput(unittest.TestCase):
         self.assertEqual(test_name, test['test'])
 
 
+
+class TestParseRGTStatusTail(unittest.TestCase):
+    """
+    Class to test whether only new lines of the rgt_status.txt file are parsed.
+    """
+
+    def setUp(self):
+        """
+        Setup a directory for the status file and the parser.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'rgt_status.txt')
+        self.header = "##################################\n" + \
+                      "# Start time   Unique ID   Batch ID    Build Status    Submit Status   Check Status\n" + \
+                      "##################################\n"
+        self.PR = parse_file.ParseRGTStatusTail()
+
+    @staticmethod
+    def status_line(harness_uid):
+        """
+        Create a line of the status file.
+
+        :param harness_uid: The uid of the instance.
+        :return: The line.
+        """
+        return "2018-11-07T09:04:00 " + harness_uid + " 1 0 0 ***\n"
+
+    def append_to_file(self, text):
+        """
+        Append some text to the status file.
+
+        :param text: The text to append.
+        """
+        with open(self.file_path, mode='a') as f:
+            f.write(text)
+
+    def test_only_new_lines(self):
+        """
+        Test that each line is only parsed once.
+        """
+        write_to_file(self.file_path, self.header + self.status_line('uid_0'))
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertTrue(full)
+        self.assertEqual(['uid_0'], [job_record.harness_uid for job_record in job_records])
+        self.assertEqual(datetime.datetime(2018, 11, 7, 9, 4), job_records[0].harness_start)
+        self.assertEqual((1, 0, 0, None), job_records[0][2:])
+
+        # Nothing new.
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertFalse(full)
+        self.assertEqual(0, len(job_records))
+
+        # Add two lines.
+        self.append_to_file(self.status_line('uid_1') + self.status_line('uid_2'))
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertFalse(full)
+        self.assertEqual(['uid_1', 'uid_2'], [job_record.harness_uid for job_record in job_records])
+
+    def test_partial_line(self):
+        """
+        Test that a line that has not been finished is left until it is.
+        """
+        write_to_file(self.file_path, self.header + self.status_line('uid_0'))
+        self.PR.parse_new_lines(self.file_path)
+
+        line = self.status_line('uid_1')
+        self.append_to_file(line[:10])
+        job_records, _ = self.PR.parse_new_lines(self.file_path)
+        self.assertEqual(0, len(job_records))
+
+        self.append_to_file(line[10:])
+        job_records, _ = self.PR.parse_new_lines(self.file_path)
+        self.assertEqual(['uid_1'], [job_record.harness_uid for job_record in job_records])
+
+    def test_no_final_newline(self):
+        """
+        Test that a last line without a newline is parsed once it has every field and only parsed again if it changes.
+        """
+        write_to_file(self.file_path, self.header + self.status_line('uid_0').rstrip('\n'))
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertTrue(full)
+        self.assertEqual(['uid_0'], [job_record.harness_uid for job_record in job_records])
+
+        # Nothing new.
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertFalse(full)
+        self.assertEqual(0, len(job_records))
+
+        # Finish the line and add another.
+        self.append_to_file('\n' + self.status_line('uid_1'))
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertFalse(full)
+        self.assertEqual(['uid_1'], [job_record.harness_uid for job_record in job_records])
+
+    def test_continued_last_line(self):
+        """
+        Test that a last line without a newline is parsed again when more is written on it.
+        """
+        write_to_file(self.file_path, self.header + "2018-11-07T09:04:00 uid_0 1 0 0 1")
+        job_records, _ = self.PR.parse_new_lines(self.file_path)
+        self.assertEqual(1, job_records[0].check_status)
+
+        self.append_to_file("7\n")
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertFalse(full)
+        self.assertEqual(['uid_0'], [job_record.harness_uid for job_record in job_records])
+        self.assertEqual(17, job_records[0].check_status)
+
+    def test_example_without_final_newline(self):
+        """
+        Test that the example status file without a final newline gives the same records as parsing the whole file.
+        """
+        file_path = os.path.join(os.path.dirname(__file__), 'test_inputs', 'database_inputs',
+                                 'example_tests_for_database', 'program_2', 'test_2_B', 'Status', 'rgt_status.txt')
+        job_records, full = self.PR.parse_new_lines(file_path)
+        self.assertTrue(full)
+        self.assertEqual(parse_file.ParseRGTStatus().parse_file(file_path), job_records)
+        self.assertEqual(1, len(job_records))
+
+    def test_rewritten_file(self):
+        """
+        Test that a truncated or rewritten file is parsed again from the start.
+        """
+        write_to_file(self.file_path, self.header + self.status_line('uid_0') + self.status_line('uid_1'))
+        self.PR.parse_new_lines(self.file_path)
+
+        # Truncate the file.
+        write_to_file(self.file_path, self.header + self.status_line('uid_0'))
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertTrue(full)
+        self.assertEqual(['uid_0'], [job_record.harness_uid for job_record in job_records])
+
+        # Rewrite the last line and make the file longer.
+        write_to_file(self.file_path, self.header + self.status_line('uid_2') + self.status_line('uid_3'))
+        job_records, full = self.PR.parse_new_lines(self.file_path)
+        self.assertTrue(full)
+        self.assertEqual(['uid_2', 'uid_3'], [job_record.harness_uid for job_record in job_records])
+
+
+class TestRecords(unittest.TestCase):
+    """
+    Class to test the records made from rgt_status.txt lines and events.
+    """
+
+    def test_rgt_status_record(self):
+        """
+        Test that the fields of an rgt_status.txt line are converted.
+        """
+        record = parse_file.ParseRGTStatus().parse_lines(["2018-10-17T00:00:00.000000 2.0 20 0 *** 1\n"])[0]
+        self.assertEqual(parse_file.RgtStatusRecord(datetime.datetime(2018, 10, 17), '2.0', 20, 0, None, 1), record)
+
+        # A record made from a dictionary is the same.
+        line_dic = {'harness_start': '2018-10-17T00:00:00.000000', 'harness_uid': '2.0', 'job_id': '20',
+                    'build_status': 0, 'submit_status': '***', 'check_status': '1'}
+        self.assertEqual(record, parse_file.RgtStatusRecord.coerce(line_dic))
+        self.assertIs(record, parse_file.RgtStatusRecord.coerce(record))
+
+    def test_bad_time(self):
+        """
+        Test that a time that can not be parsed is kept as text.
+        """
+        self.assertEqual('0000-00-01 00:00:00', parse_file.parse_time('0000-00-01T00:00:00'))
+
+    def test_event_record(self):
+        """
+        Test that only the used variables of an event are kept.
+        """
+        event = parse_file.EventRecord.from_dict({'test_id': 'uid_0', 'event_time': '2018-10-17T00:00:00',
+                                                  'unused': 'value'})
+        self.assertEqual('uid_0', event.test_id)
+        self.assertEqual(datetime.datetime(2018, 10, 17), event.event_time)
+        self.assertIsNone(event.app)
+        self.assertFalse(hasattr(event, 'unused'))
+
+
+class TestEventCache(unittest.TestCase):
+    """
+    Class to test whether event files are only parsed once.
+    """
+
+    def setUp(self):
+        """
+        Setup a directory for the event files and the cache.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'Event_140_build_start.txt')
+        self.cache = parse_file.EventCache(max_size=2)
+
+    def test_parsed_once(self):
+        """
+        Test that an unchanged event is taken from the cache.
+        """
+        write_to_file(self.file_path, "event_time=2018-11-07T09:04:00 test_id=uid_0\n")
+        event = self.cache.parse_file(self.file_path)
+        self.assertEqual(datetime.datetime(2018, 11, 7, 9, 4), event.event_time)
+        self.assertEqual('uid_0', event.test_id)
+        self.assertIsNone(event.run_archive)
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+
+        self.assertIs(event, self.cache.parse_file(self.file_path, os.stat(self.file_path)))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_changed_event(self):
+        """
+        Test that an event is parsed again once it changes.
+        """
+        write_to_file(self.file_path, "test_id=uid_0\n")
+        self.cache.parse_file(self.file_path)
+        write_to_file(self.file_path, "test_id=uid_10\n")
+        self.assertEqual('uid_10', self.cache.parse_file(self.file_path).test_id)
+        self.assertEqual(2, self.cache.misses)
+
+    def test_least_recently_used(self):
+        """
+        Test that only the most recently used events are kept.
+        """
+        paths = [os.path.join(self.directory.name, 'Event_14' + str(i) + '.txt') for i in range(3)]
+        for path in paths:
+            write_to_file(path, "test_id=uid_0\n")
+
+        self.cache.parse_file(paths[0])
+        self.cache.parse_file(paths[1])
+        # Use the first event so that the second is the least recently used.
+        self.cache.parse_file(paths[0])
+        self.cache.parse_file(paths[2])
+        self.assertEqual(2, len(self.cache.events))
+
+        self.cache.parse_file(paths[0])
+        self.assertEqual((2, 3), (self.cache.hits, self.cache.misses))
+        self.cache.parse_file(paths[1])
+        self.assertEqual(4, self.cache.misses)
+
+
 if __name__ == '__main__':
     unittest.main()
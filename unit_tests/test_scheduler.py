@@ -0,0 +1,180 @@
+from scripts import scheduler
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestUpdateScheduler(unittest.TestCase):
+    """
+    Class to test that scheduler.py updates each rgt input on time.
+    """
+
+    def setUp(self):
+        """
+        Create a scheduler for two rgt inputs with an update function that records what it was asked to update.
+        """
+        self.clock = FakeClock()
+        self.rgt_input_paths = ['input_A', 'input_B']
+        # The rgt inputs in the order they were updated.
+        self.updated = []
+        # How long each update pretends to take.
+        self.update_times = {'input_A': 1, 'input_B': 1}
+
+        def update_function(path):
+            self.updated.append(path)
+            self.clock.now += self.update_times[path]
+            return self.update_times[path], False
+
+        self.scheduler = scheduler.UpdateScheduler(self.rgt_input_paths, update_function, refresh_time=100,
+                                                   max_refresh_time=400, jitter=0, clock=self.clock)
+
+    def test_everything_due_at_start(self):
+        """
+        Test that every rgt input is updated in the first cycle and nothing is due right after.
+        """
+        self.assertEqual(self.scheduler.run_cycle(), self.rgt_input_paths)
+        self.assertEqual(self.scheduler.run_cycle(), [])
+        self.assertEqual(self.updated, self.rgt_input_paths)
+        self.assertEqual(self.scheduler.time_until_due(), 98)
+
+    def test_inputs_are_updated_again_after_refresh_time(self):
+        """
+        Test that an rgt input is updated again once its interval has passed.
+        """
+        self.scheduler.run_cycle()
+        self.clock.now += 99
+        self.assertEqual(self.scheduler.run_cycle(), self.rgt_input_paths)
+
+    def test_backoff(self):
+        """
+        Test that an rgt input that takes longer than its interval is backed off and recovers once it is fast again.
+        """
+        self.update_times['input_A'] = 150
+        self.scheduler.run_cycle()
+        self.assertEqual(self.scheduler.intervals['input_A'], 200)
+        self.assertEqual(self.scheduler.intervals['input_B'], 100)
+
+        # It can not back off past the max refresh time.
+        self.update_times['input_A'] = 1000
+        for _ in range(3):
+            self.clock.now = self.scheduler.next_update['input_A']
+            self.scheduler.run_cycle()
+        self.assertEqual(self.scheduler.intervals['input_A'], 400)
+
+        # Once it is fast again it goes back to the refresh time.
+        self.update_times['input_A'] = 1
+        self.clock.now = self.scheduler.next_update['input_A']
+        self.scheduler.run_cycle()
+        self.assertEqual(self.scheduler.intervals['input_A'], 100)
+
+    def test_jitter(self):
+        """
+        Test that jitter keeps the interval within the allowed fraction.
+        """
+        self.scheduler.jitter = 0.1
+        for _ in range(100):
+            interval = self.scheduler.jittered(100)
+            self.assertGreaterEqual(interval, 90)
+            self.assertLessEqual(interval, 110)
+
+    def test_request_update(self):
+        """
+        Test that an rgt input asked to update early is updated once the minimum refresh time has passed.
+        """
+        self.scheduler.min_refresh_time = 10
+        self.scheduler.run_cycle()
+        self.scheduler.request_update('input_A')
+        self.scheduler.request_update('input_C')
+        self.assertTrue(self.scheduler.wake_event.is_set())
+        self.assertEqual(self.scheduler.time_until_due(), 8)
+        self.clock.now = 1010
+        self.assertEqual(self.scheduler.run_cycle(), ['input_A'])
+        self.assertEqual(self.scheduler.next_update['input_A'], 1110)
+
+    def test_request_while_updating(self):
+        """
+        Test that an rgt input asked to update early while it is updating is updated again after it is done.
+        """
+        self.scheduler.min_refresh_time = 10
+
+        def update_function(path):
+            self.scheduler.request_update('input_B')
+            self.clock.now += 1
+            return 1, False
+
+        self.scheduler.update_function = update_function
+        self.scheduler.run_cycle()
+        self.assertEqual(self.scheduler.next_update['input_A'], 1100)
+        self.assertEqual(self.scheduler.next_update['input_B'], 1010)
+
+    def test_stop(self):
+        """
+        Test that run returns once stop is called.
+        """
+        def update_function(path):
+            self.scheduler.stop()
+            return 0, False
+
+        self.scheduler.update_function = update_function
+        self.scheduler.run()
+        self.assertEqual(self.scheduler.cycles, 1)
+
+    def test_failed_update(self):
+        """
+        Test that an update that raises is counted as failed and the rgt input is still scheduled again.
+        """
+        def update_function(path):
+            raise RuntimeError("Could not update " + path)
+
+        self.scheduler.update_function = update_function
+        self.assertEqual(self.scheduler.run_cycle(), self.rgt_input_paths)
+        self.assertEqual(self.scheduler.running, set())
+        self.assertEqual(self.scheduler.next_update['input_A'], 1100)
+
+    def test_slow_input_does_not_block(self):
+        """
+        Test that with an executor an rgt input is scheduled again as soon as its own update is done while another is
+        still updating.
+        """
+        release = threading.Event()
+        finished = threading.Event()
+
+        def update_function(path):
+            if path == 'input_A':
+                release.wait()
+            else:
+                finished.set()
+            return 1, False
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(release.set)
+        self.scheduler.update_function = update_function
+        self.scheduler.executor = executor
+
+        self.assertEqual(self.scheduler.run_cycle(), self.rgt_input_paths)
+        self.assertTrue(finished.wait(5))
+        executor.submit(lambda: None).result()
+        # input_B was scheduled again while input_A is still updating.
+        self.assertEqual(self.scheduler.next_update['input_B'], 1100)
+        self.assertEqual(self.scheduler.running, {'input_A'})
+        # input_A is not started again while it is updating, even when it is asked to be.
+        self.scheduler.request_update('input_A')
+        self.clock.now = 1100
+        self.assertEqual(self.scheduler.run_cycle(), ['input_B'])
+
+        release.set()
+        executor.shutdown(wait=True)
+        self.assertEqual(self.scheduler.running, set())